@@ -0,0 +1,276 @@
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+
+import density
+
+class Autocorrelation:
+    """Exact autocorrelation up to max_lag of a series streamed in blocks
+
+    Each block is correlated by FFT with itself plus the max_lag samples
+    before it, so every pair (t, t + k) is counted once, in the block holding
+    t + k. Only max_lag samples are carried between blocks. The means of the
+    two overlapping windows are kept exactly from the first and last max_lag
+    samples, so no second pass is needed.
+    """
+
+    def __init__(self, max_lag, n_channels=2):
+        self.max_lag = max_lag
+        self.lag_sums = np.zeros((n_channels, max_lag + 1))
+        self.total = np.zeros(n_channels)
+        self.head = np.zeros((n_channels, 0))
+        self.history = np.zeros((n_channels, 0))
+        self.n = 0
+
+    def add(self, block):
+        block = np.atleast_2d(block)
+        extended = np.concatenate([self.history, block], axis=1)
+        h, length = self.history.shape[1], block.shape[1]
+        size = 1 << int(np.ceil(np.log2(extended.shape[1] + max(length, self.max_lag))))
+        corr = np.fft.irfft(np.fft.rfft(extended, size) * np.conj(np.fft.rfft(block, size)), size)
+        # corr[s] = sum_i extended[i + s] * block[i], lag k sits at s = h - k
+        lags = np.arange(self.max_lag + 1)
+        self.lag_sums += corr[:, (h - lags) % size]
+
+        self.total += block.sum(axis=1)
+        if self.head.shape[1] < self.max_lag:
+            self.head = np.concatenate([self.head, block[:, :self.max_lag - self.head.shape[1]]], axis=1)
+        self.history = extended[:, -self.max_lag:] if self.max_lag else extended[:, :0]
+        self.n += length
+
+    def result(self):
+        """Normalized autocorrelation, shape (n_channels, max_lag + 1)"""
+        lags = np.arange(min(self.max_lag, self.n - 1) + 1)
+        count = self.n - lags
+        # Sums over t < n - k and over t >= k
+        head_cum = np.concatenate([np.zeros((len(self.total), 1)), np.cumsum(self.head, axis=1)], axis=1)
+        tail_cum = np.concatenate([np.zeros((len(self.total), 1)), np.cumsum(self.history[:, ::-1], axis=1)], axis=1)
+        lead_mean = (self.total[:, None] - tail_cum[:, lags]) / count
+        lag_mean = (self.total[:, None] - head_cum[:, lags]) / count
+        cov = self.lag_sums[:, lags] / count - lead_mean * lag_mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return cov / cov[:, :1]
+
+class PowerSpectrum:
+    """Welch power spectrum: Hann-windowed segments with 50% overlap, averaged"""
+
+    def __init__(self, nperseg=4096, n_channels=2):
+        self.nperseg = nperseg
+        self.hop = nperseg // 2
+        self.window = np.hanning(nperseg)
+        self.power = np.zeros((n_channels, nperseg // 2 + 1))
+        self.segments = 0
+        self.buffer = np.zeros((n_channels, 0))
+
+    def add(self, block):
+        data = np.concatenate([self.buffer, np.atleast_2d(block)], axis=1)
+        n_segments = (data.shape[1] - self.nperseg) // self.hop + 1
+        if n_segments > 0:
+            starts = np.arange(n_segments) * self.hop
+            segments = data[:, starts[:, None] + np.arange(self.nperseg)]
+            segments = segments - segments.mean(axis=2, keepdims=True)
+            self.power += (np.abs(np.fft.rfft(segments * self.window, axis=2)) ** 2).sum(axis=1)
+            self.segments += n_segments
+            data = data[:, n_segments * self.hop:]
+        self.buffer = data
+
+    def result(self):
+        """(frequencies in cycles per iteration, mean power per channel)"""
+        return np.fft.rfftfreq(self.nperseg), self.power / max(self.segments, 1)
+
+class RecurrenceRate:
+    """Fraction of point pairs closer than each eps, estimated with a grid hash
+
+    Every block is hashed onto cells of the largest eps. A random subset of
+    n_refs points per block then only measures distances to the points in
+    its 3x3 neighbourhood of cells, which is O(n log n) for the sort instead
+    of O(n^2). Since each block samples the attractor, averaging the per-block
+    estimates gives the recurrence rate of the whole run.
+    """
+
+    def __init__(self, eps=None, n_refs=200, seed=0):
+        self.eps = None if eps is None else np.sort(np.asarray(eps, dtype=np.float64))
+        self.n_refs = n_refs
+        self.rng = np.random.default_rng(seed)
+        self.hits = None
+        self.pairs = 0
+
+    def add(self, x, y):
+        ok = np.isfinite(x) & np.isfinite(y)
+        x, y = x[ok], y[ok]
+        if len(x) < 2:
+            return
+        if self.eps is None:
+            extent = max(x.max() - x.min(), y.max() - y.min(), 1e-12)
+            self.eps = extent * np.array([0.002, 0.005, 0.01, 0.02])
+        if self.hits is None:
+            self.hits = np.zeros(len(self.eps))
+        cell = self.eps[-1]
+        col = np.floor(x / cell).astype(np.int64)
+        row = np.floor(y / cell).astype(np.int64)
+        # Offset so that the +-1 neighbours never collide with another row
+        stride = col.max() - col.min() + 3
+        keys = (row - row.min() + 1) * stride + (col - col.min() + 1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        refs = self.rng.choice(len(x), min(self.n_refs, len(x)), replace=False)
+        neighbours = (keys[refs, None] + (np.arange(-1, 2)[:, None] * stride + np.arange(-1, 2)).ravel()).ravel()
+        starts = np.searchsorted(sorted_keys, neighbours, side="left")
+        ends = np.searchsorted(sorted_keys, neighbours, side="right")
+        lengths = ends - starts
+        owner = np.repeat(np.repeat(refs, 9), lengths)
+        # Positions of all candidates, one run of indices per neighbour cell
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        candidates = order[np.repeat(starts, lengths) + offsets]
+        dist = np.hypot(x[candidates] - x[owner], y[candidates] - y[owner])
+        dist = dist[candidates != owner]
+        self.hits += np.searchsorted(np.sort(dist), self.eps, side="left") / (len(x) - 1)
+        self.pairs += len(refs)
+
+    def result(self):
+        return self.eps, self.hits / max(self.pairs, 1)
+
+class ReturnMap:
+    """Histogram of (x_t, x_t+1) and the conditional entropy of the next value
+
+    A deterministic one-dimensional return map gives an entropy near zero,
+    noise or a higher-dimensional attractor spreads it out.
+    """
+
+    def __init__(self, bins=64):
+        self.bins = bins
+        self.range = None
+        self.counts = np.zeros((bins, bins))
+        self.last = None
+
+    def add(self, x):
+        x = x[np.isfinite(x)]
+        if len(x) == 0:
+            return
+        if self.range is None:
+            self.range = (x.min(), max(x.max(), x.min() + 1e-12))
+        if self.last is not None:
+            x = np.concatenate([[self.last], x])
+        self.last = x[-1]
+        low, high = self.range
+        b = np.clip(((x - low) / (high - low) * self.bins).astype(np.int64), 0, self.bins - 1)
+        self.counts += np.bincount(b[:-1] * self.bins + b[1:], minlength=self.bins**2).reshape(self.bins, self.bins)
+
+    def entropy(self):
+        """H(x_t+1 | x_t) in bits"""
+        total = self.counts.sum()
+        if total == 0:
+            return float("nan")
+        p = self.counts / total
+        row = p.sum(axis=1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            terms = np.where(p > 0, p * np.log2(p / row), 0)
+        return float(-terms.sum())
+
+def array_chunks(x, y, chunk_size=1000000):
+    """(x, y) chunks of in-memory arrays, e.g. a Trajectory"""
+    for start in range(0, len(x), chunk_size):
+        yield x[start:start + chunk_size], y[start:start + chunk_size]
+
+def file_chunks(filename, chunk_size=1000000):
+    """(x, y) chunks of a .atrj trajectory, an (n, 2) .npy array or an x,y CSV such as coasterserial.py writes"""
+    ext = os.path.splitext(filename)[1]
+    if ext == ".atrj":
+        from trajectory_codec import TrajectoryReader
+
+        with TrajectoryReader(filename) as reader:
+            yield from reader.iter_chunks(max(1, chunk_size // reader.chunk_size))
+    elif ext == ".npy":
+        points = np.load(filename, mmap_mode="r")
+        for start in range(0, len(points), chunk_size):
+            block = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+            yield block[:, 0], block[:, 1]
+    else:
+        with open(filename) as f:
+            next(f)
+            while True:
+                lines = list(itertools.islice(f, chunk_size))
+                if not lines:
+                    return
+                block = np.loadtxt(lines, delimiter=",", ndmin=2)
+                yield block[:, 0], block[:, 1]
+
+def analyze(chunks, max_lag=1000, nperseg=4096, eps=None, n_refs=200, seed=0, n_lags=32):
+    """One streaming pass over a trajectory, returns a compact summary dict
+
+    chunks yields (x, y) arrays in iteration order. The summary has per
+    coordinate the autocorrelation of the first n_lags lags, the lag where it
+    first drops below 1/e, the dominant frequency and the spectral flatness
+    (near 1 for white, broadband chaos, near 0 for periodic orbits), plus
+    the recurrence rate at each eps and the return map entropy of x.
+    """
+    acf = Autocorrelation(max_lag)
+    spectrum = PowerSpectrum(nperseg)
+    recurrence = RecurrenceRate(eps, n_refs, seed)
+    return_map = ReturnMap()
+    for x, y in chunks:
+        x = np.asarray(x, dtype=np.float64).ravel()
+        y = np.asarray(y, dtype=np.float64).ravel()
+        # Diverged tails would swamp every statistic
+        ok = np.isfinite(x) & np.isfinite(y)
+        if not ok.all():
+            x, y = x[ok], y[ok]
+        block = np.vstack([x, y])
+        acf.add(block)
+        spectrum.add(block)
+        recurrence.add(x, y)
+        return_map.add(x)
+
+    correlation = acf.result()
+    freqs, power = spectrum.result()
+    eps_values, rates = recurrence.result()
+    summary = {"n_points": acf.n}
+    for i, name in enumerate("xy"):
+        below = np.flatnonzero(np.abs(correlation[i]) < 1 / np.e)
+        p = power[i, 1:]
+        flatness = np.exp(np.mean(np.log(p + 1e-300))) / p.mean() if p.sum() > 0 else float("nan")
+        summary[name] = {
+            "mean": float(acf.total[i] / max(acf.n, 1)),
+            "autocorrelation": [float(v) for v in correlation[i, :n_lags]],
+            "decorrelation_lag": int(below[0]) if len(below) else None,
+            "peak_frequency": float(freqs[1:][np.argmax(p)]) if p.sum() > 0 else None,
+            "peak_power_fraction": float(p.max() / p.sum()) if p.sum() > 0 else None,
+            "spectral_flatness": float(flatness),
+        }
+    summary["recurrence_rate"] = {f"{e:.6g}": float(r) for e, r in zip(eps_values, rates)}
+    summary["return_map_entropy"] = return_map.entropy()
+    return summary
+
+if __name__ == "__main__":
+    from metrics import write_metadata
+    from trajectory import Trajectory
+
+    parser = argparse.ArgumentParser(description="Autocorrelation, spectrum and recurrence summary of trajectories")
+    parser.add_argument("files", nargs="*", help=".csv, .npy or .atrj trajectories")
+    parser.add_argument("--map", choices=sorted(density.maps), default=None,
+                        help="analyze a freshly iterated orbit of this map instead, e.g. simon or quadratic")
+    parser.add_argument("--params", type=float, nargs="*", default=None)
+    parser.add_argument("--points", type=int, default=1000000)
+    parser.add_argument("--max-lag", type=int, default=1000)
+    args = parser.parse_args()
+
+    runs = [(f, file_chunks(f)) for f in args.files]
+    if args.map:
+        params = args.params or density.map_params[args.map][0]
+        orbit = Trajectory(args.map, params, 0.1, 0.1)
+        print(f"Iterating {args.points} points of {args.map} {tuple(params)}...")
+        x, y = orbit.ensure(args.points)
+        runs.append((f"{args.map}_analytics", array_chunks(x, y)))
+
+    for name, chunks in runs:
+        start = time.time()
+        summary = analyze(chunks, max_lag=args.max_lag)
+        x = summary["x"]
+        print(f"{name}: {summary['n_points']} points in {time.time() - start:.2f}s, "
+              f"decorrelation lag {x['decorrelation_lag']}, flatness {x['spectral_flatness']:.3f}, "
+              f"return map entropy {summary['return_map_entropy']:.2f} bits")
+        write_metadata(f"{os.path.splitext(name)[0]}.analytics.json", source=name, **summary)
@@ -0,0 +1,31 @@
+import json
+import os
+import tempfile
+import numpy as np
+
+def save_checkpoint(path, meta, **arrays):
+    """Atomically write a checkpoint made of numpy arrays plus a JSON-able meta dict
+
+    The data goes to a uniquely named temporary file next to the target
+    which then replaces it, so a crash mid-write leaves the previous
+    checkpoint intact and concurrent writers never share a temporary file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+        try:
+            np.savez(f, _meta=np.array(json.dumps(meta)), **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    """Read back a checkpoint written by save_checkpoint, returns (meta, arrays)"""
+    with np.load(path) as data:
+        meta = json.loads(str(data["_meta"]))
+        arrays = {name: data[name] for name in data.files if name != "_meta"}
+    return meta, arrays
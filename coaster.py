@@ -30,7 +30,37 @@ def list2f(ifs):
 
     return f1, f2
 
-def generate(start_x, start_y, style_name="default", n_points=10000000):
+def generate_points_pipelined(start_x, start_y, ifs, n_points, csv_filename, chunk_size=100000):
+    """Iterate the map in chunks while a writer thread saves the previous chunk to CSV"""
+    from pipeline import run_pipeline
+
+    fx, fy = list2f(ifs)
+    points = np.zeros((n_points, 2))
+    points[0] = start_x, start_y
+
+    def chunks():
+        x, y = start_x, start_y
+        for begin in range(1, n_points, chunk_size):
+            end = min(begin + chunk_size, n_points)
+            for i in range(begin, end):
+                x_new, y_new = fx(x, y), fy(x, y)
+                if np.isinf(x_new) or np.isnan(x_new) or np.isinf(y_new) or np.isnan(y_new):
+                    yield points[begin:i]
+                    return
+                x, y = np.clip(x_new, -1e4, 1e4), np.clip(y_new, -1e4, 1e4)
+                points[i] = [x, y]
+            print(f"Progress: {end / n_points * 100:.1f}%")
+            yield points[begin:end]
+
+    with open(csv_filename, 'w', newline='') as csvfile:
+        csv_writer = csv.writer(csvfile)
+        csv_writer.writerow(['x', 'y'])
+        # Same rows as the sequential writer, only written from another thread
+        run_pipeline(chunks(), {"export": lambda chunk: csv_writer.writerows([round(x, 3), round(y, 3)] for x, y in chunk)})
+    return points
+
+def generate(start_x, start_y, style_name="default", n_points=10000000, pipelined=False):
+    """Iterate the map once and plot it in style_name, which may also be a list of styles"""
     ifs = [
         np.array([-0.28752426, 0.65608465, 0.71259527, 1.34370624, 1.01724109, 0.19113889]),
         np.array([-1.06839961, 0.29822047, 0.35672293, -0.68326573, 0.68020521, 1.18480771]),
@@ -102,67 +132,80 @@ def generate(start_x, start_y, style_name="default", n_points=10000000):
         }
     }
     
-    style = styles.get(style_name, styles["default"])
+    style_names = [style_name] if isinstance(style_name, str) else list(style_name)
+    style_name = style_names[0]
     
     csv_filename = f"coaster_{style_name}_x{start_x}_y{start_y}.csv"
     
-    with open(csv_filename, 'w', newline='') as csvfile:
-        csv_writer = csv.writer(csvfile)
-        csv_writer.writerow(['x', 'y'])
+    if pipelined:
+        print(f"Generating {style_name} fractal with starting point ({start_x}, {start_y})...")
+        points = generate_points_pipelined(start_x, start_y, ifs, n_points, csv_filename)
+    else:
+        with open(csv_filename, 'w', newline='') as csvfile:
+            csv_writer = csv.writer(csvfile)
+            csv_writer.writerow(['x', 'y'])
 
-        fx, fy = list2f(ifs)
-        points = np.zeros((n_points, 2))
-        x, y = start_x, start_y
-        points[0, 0], points[0, 1] = x, y
+            fx, fy = list2f(ifs)
+            points = np.zeros((n_points, 2))
+            x, y = start_x, start_y
+            points[0, 0], points[0, 1] = x, y
         
-        print(f"Generating {style_name} fractal with starting point ({start_x}, {start_y})...")
+            print(f"Generating {style_name} fractal with starting point ({start_x}, {start_y})...")
         
-        for i in range(1, n_points):
-            if i % (n_points/100) == 0:
-                progress = (i / n_points) * 100
-                print(f"Progress: {progress:.1f}%")
+            for i in range(1, n_points):
+                if i % (n_points/100) == 0:
+                    progress = (i / n_points) * 100
+                    print(f"Progress: {progress:.1f}%")
             
     
-            x_new, y_new = fx(x, y), fy(x, y)
+                x_new, y_new = fx(x, y), fy(x, y)
 
-            if np.isinf(x_new) or np.isnan(x_new) or np.isinf(y_new) or np.isnan(y_new):
-                break
+                if np.isinf(x_new) or np.isnan(x_new) or np.isinf(y_new) or np.isnan(y_new):
+                    break
 
-            x, y = np.clip(x_new, -1e4, 1e4), np.clip(y_new, -1e4, 1e4)
-            points[i] = [x, y]
-            csv_writer.writerow([round(x, 3), round(y, 3)])
+                x, y = np.clip(x_new, -1e4, 1e4), np.clip(y_new, -1e4, 1e4)
+                points[i] = [x, y]
+                csv_writer.writerow([round(x, 3), round(y, 3)])
 
 
-    fig, ax = plt.subplots(figsize=(15, 15))
-    fig.subplots_adjust(left=0, bottom=0, right=1, top=1, wspace=None, hspace=None)
-    fig.set_facecolor(style["background"])
-    ax.set_axis_off()
-    ax.spines["top"].set_visible(False)
-    ax.spines["right"].set_visible(False)
-    ax.spines["left"].set_visible(False)
-    ax.spines["bottom"].set_visible(False)
-    ax.set_aspect("equal", "box")
-    
-    if style["colormap"]:
-        colors = np.arange(len(points))
-        scatter = ax.scatter(points[:, 0], points[:, 1], 
-                           s=style["size"], 
-                           alpha=style["alpha"], 
-                           c=colors, 
-                           cmap=style["colormap"])
-    else:
-        ax.scatter(points[:, 0], points[:, 1], 
-                  s=style["size"], 
-                  alpha=style["alpha"], 
-                  c=style["color"])
-    
-    plot_filename = f"fractal_{style_name}_x{start_x}_y{start_y}.png"
-    plt.savefig(plot_filename, dpi=300, bbox_inches='tight', 
-                facecolor=style["background"], edgecolor='none')
-    print(f"Plot saved as {plot_filename}")
+    # Every style is plotted from the same points
+    for style_name in style_names:
+        style = styles.get(style_name, styles["default"])
+        
+        fig, ax = plt.subplots(figsize=(15, 15))
+        fig.subplots_adjust(left=0, bottom=0, right=1, top=1, wspace=None, hspace=None)
+        fig.set_facecolor(style["background"])
+        ax.set_axis_off()
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+        ax.spines["left"].set_visible(False)
+        ax.spines["bottom"].set_visible(False)
+        ax.set_aspect("equal", "box")
+        
+        if style["colormap"]:
+            colors = np.arange(len(points))
+            scatter = ax.scatter(points[:, 0], points[:, 1], 
+                               s=style["size"], 
+                               alpha=style["alpha"], 
+                               c=colors, 
+                               cmap=style["colormap"])
+        else:
+            ax.scatter(points[:, 0], points[:, 1], 
+                      s=style["size"], 
+                      alpha=style["alpha"], 
+                      c=style["color"])
+        
+        plot_filename = f"fractal_{style_name}_x{start_x}_y{start_y}.png"
+        plt.savefig(plot_filename, dpi=300, bbox_inches='tight', 
+                    facecolor=style["background"], edgecolor='none')
+        print(f"Plot saved as {plot_filename}")
+        if len(style_names) > 1:
+            # Each figure holds every point, do not keep them all open
+            plt.close(fig)
     print(f"Data saved as {csv_filename}")
     
-    plt.show()
+    if len(style_names) == 1:
+        plt.show()
     return points
 
 if __name__ == "__main__":
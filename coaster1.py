@@ -1,6 +1,7 @@
 import numpy as np
 import csv
 import random
+from results_db import ResultsDB, bad_statuses
 
 csv_filename = f"coaster.csv"
 n_points = 100000
@@ -15,7 +16,17 @@ not_repeating = 1
 
 proceed = True
 
-def generate():
+# Every tried (a, b) is stored, so reruns skip coefficients that already failed.
+# The verdicts here come from a different test than fixed_coaster (1).py, so
+# they are kept under their own family and do not steer that search.
+family = "coaster1"
+
+def generate(db=None):
+    global not_repeating, proceed
+
+    # Opened on the first call rather than on import
+    if db is None:
+        db = ResultsDB()
 
     csvfile.flush()
     x0 = 0
@@ -23,15 +34,31 @@ def generate():
     a = random.random()
     b = random.random()
 
+    known = db.nearby(family, (round(a,3), round(b,3)), statuses=bad_statuses)
+    if known:
+        print(f"Skipping {round(a,3),round(b,3)}, already known as {known[0]['status']}")
+        generate(db)
+        return 0
+
+    # Every candidate starts its own orbit from the origin
+    del x_val[1:], y_val[1:]
+
     for i in range(n_points):
         x = np.sin(x_val[i]**2 - y_val[i]**2 + round(a,3))
         y = np.cos(2*x_val[i]*y_val[i] + round(b,3))
 
         if np.isinf(x) or np.isnan(x) or np.isinf(y) or np.isnan(y):
+            db.record(family, (round(a,3), round(b,3)), "diverged", n_points=i)
             break
 
         csv_writer.writerow([round(x,3), round(y,3)])
 
+        # A point only counts as a repeat if it was visited before
+        if x in x_val:
+            x0 +=1 
+        if y in y_val:
+            y0 +=1
+
         x_val.append(x)
         y_val.append(y)
 
@@ -40,17 +67,13 @@ def generate():
             progress = (i / n_points) * 100
             print(f"Progress: {progress:.1f}%")
 
-        if x in x_val:
-            x0 +=1 
-        if y in y_val:
-            y0 +=1
-
         if x0 > repeatation_limit or y0 > repeatation_limit:
             proceed = True
 
             print("-"*40)
             print(f"Repetitive coefficients for {round(a,3),round(b,3)}\n")
-            generate()
+            db.record(family, (round(a,3), round(b,3)), "repetitive", n_points=i)
+            generate(db)
             return 0
         else:
             if i > n_points*rep_split and not_repeating == 1:
@@ -58,6 +81,7 @@ def generate():
                 not_repeating = 0
                 print("Non repetive points found")
                 print("a = ",round(a,3)," b = ",round(b,3))
+                db.record(family, (round(a,3), round(b,3)), "interesting", n_points=i)
                 
                 if i == n_points-2:
                     print("Non repetive points found")
@@ -0,0 +1,124 @@
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import density
+from image_io import parse_color, save_image
+
+# 3x5 bitmap glyphs for the tile labels, "#" is a lit pixel
+font = {
+    "0": ["###", "#.#", "#.#", "#.#", "###"],
+    "1": [".#.", "##.", ".#.", ".#.", "###"],
+    "2": ["###", "..#", "###", "#..", "###"],
+    "3": ["###", "..#", "###", "..#", "###"],
+    "4": ["#.#", "#.#", "###", "..#", "..#"],
+    "5": ["###", "#..", "###", "..#", "###"],
+    "6": ["###", "#..", "###", "#.#", "###"],
+    "7": ["###", "..#", "..#", ".#.", ".#."],
+    "8": ["###", "#.#", "###", "#.#", "###"],
+    "9": ["###", "#.#", "###", "..#", "###"],
+    ".": ["...", "...", "...", "...", ".#."],
+    "-": ["...", "...", "###", "...", "..."],
+    "=": ["...", "###", "...", "###", "..."],
+    "#": ["#.#", "###", "#.#", "###", "#.#"],
+    " ": ["...", "...", "...", "...", "..."],
+    "a": ["...", "##.", "..#", "###", "###"],
+    "b": ["#..", "#..", "###", "#.#", "###"],
+    "c": ["...", "###", "#..", "#..", "###"],
+    "d": ["..#", "..#", "###", "#.#", "###"],
+    "x": ["...", "#.#", ".#.", ".#.", "#.#"],
+}
+
+def draw_text(image, text, row, col, color, scale=2):
+    """Stamp text into an RGB float image with the bitmap font"""
+    for char in text:
+        glyph = font.get(char, font[" "])
+        for r, line in enumerate(glyph):
+            for c, pixel in enumerate(line):
+                if pixel == "#":
+                    top, left = row + r * scale, col + c * scale
+                    image[top:top + scale, left:left + scale] = color
+        col += 4 * scale
+
+def render_thumbnail(job):
+    """Render one candidate as a small RGB image, None if it diverges"""
+    attractor_type, params, size, n_points, style = job
+    try:
+        # A small probe is plenty to frame a thumbnail, the full-size one costs several times the render
+        bounds = density.estimate_bounds(attractor_type, params, n_walkers=256, skip_points=200, probe_steps=50)
+        acc = density.render_density(attractor_type, params, size, size, n_points=n_points,
+                                     n_walkers=256, skip_points=200, bounds=bounds, verbose=False)
+    except ValueError:
+        return None
+    if acc.counts.sum() == 0:
+        return None
+    return density.shade(acc, style)
+
+def contact_sheet(attractor_type, candidates, thumb_size=160, n_points=200000,
+                  style="default", columns=10, processes=None):
+    """Render every candidate in a process pool and tile them with labels
+
+    Returns the sheet as an RGB float image. Tiles are labelled with their
+    index and coefficients, diverging candidates get a crossed-out tile.
+    """
+    jobs = [(attractor_type, tuple(params), thumb_size, n_points, style) for params in candidates]
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        thumbs = list(pool.map(render_thumbnail, jobs, chunksize=4))
+    print(f"Rendered {len(jobs)} thumbnails in {time.time() - start:.1f}s")
+
+    style_dict = density.styles.get(style, density.styles["default"])
+    background = np.array(parse_color(style_dict["background"]))
+    text_color = 1 - background
+    label_height = 14
+    rows = -(-len(jobs) // columns)
+    tile_h, tile_w = thumb_size + label_height, thumb_size
+    sheet = np.empty((rows * tile_h, columns * tile_w, 3))
+    sheet[:] = background
+
+    for i, (thumb, params) in enumerate(zip(thumbs, candidates)):
+        top, left = (i // columns) * tile_h, (i % columns) * tile_w
+        if thumb is not None:
+            sheet[top:top + thumb_size, left:left + thumb_size] = thumb
+        else:
+            diag = np.arange(thumb_size)
+            sheet[top + diag, left + diag] = text_color
+            sheet[top + diag, left + thumb_size - 1 - diag] = text_color
+        label = f"#{i} " + " ".join(f"{p:.2f}" for p in params[:4])
+        draw_text(sheet, label, top + thumb_size + 2, left + 2, text_color, scale=2 if thumb_size >= 200 else 1)
+        # Thin separator so tiles stay apart on dark backgrounds
+        sheet[top:top + tile_h, left + tile_w - 1] = 0.5 * (background + text_color)
+    return sheet
+
+def random_candidates(attractor_type, count, low=-3.0, high=3.0, seed=None):
+    """Random coefficient tuples like the search loops draw"""
+    rng = random.Random(seed)
+    n_params = 2 if attractor_type == "coaster" else 4
+    return [tuple(round(rng.uniform(low, high), 3) for _ in range(n_params)) for _ in range(count)]
+
+def save_contact_sheet(attractor_type, candidates, filename=None, **kwargs):
+    filename = filename or f"{attractor_type}_contact_sheet.png"
+    save_image(filename, contact_sheet(attractor_type, candidates, **kwargs))
+    print(f"Contact sheet saved as {filename}")
+    return filename
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tile low point-count thumbnails of many candidates")
+    parser.add_argument("attractor_type", choices=sorted(density.maps))
+    parser.add_argument("--count", type=int, default=100, help="number of random candidates")
+    parser.add_argument("--thumb-size", type=int, default=160)
+    parser.add_argument("--points", type=int, default=200000)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--style", default="default")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    candidates = random_candidates(args.attractor_type, args.count, seed=args.seed)
+    save_contact_sheet(args.attractor_type, candidates, args.output, thumb_size=args.thumb_size,
+                       n_points=args.points, style=args.style, columns=args.columns,
+                       processes=args.processes)
@@ -0,0 +1,110 @@
+import numpy as np
+
+class DensitySampler:
+    """Streaming stratified sampler that keeps a fixed-size, density-faithful subset
+
+    Points are binned on a grid x grid lattice over bounds. Every point gets a
+    random key and each cell only keeps its lowest-keyed points, which is a
+    uniform sample of that cell. At the end the n_samples are shared out
+    between cells in proportion to how many points each cell received, so the
+    subset follows the spatial density of the whole stream without the
+    correlated picks of a fixed stride.
+
+    A kept point's rank in its cell only grows as the stream goes on, so a
+    cell can drop everything past its final quota. quota[cell] bounds that
+    quota: n_samples by default, which holds whatever order the points come
+    in, or the exact allocation() of the final counts when they are known
+    up front (see density_sample).
+    """
+
+    def __init__(self, n_samples, bounds, grid=64, seed=0):
+        self.n_samples = n_samples
+        self.bounds = tuple(bounds)
+        self.grid = grid
+        self.rng = np.random.default_rng(seed)
+        self.quota = np.full(grid * grid, n_samples, dtype=np.int64)
+        self.counts = np.zeros(grid * grid, dtype=np.int64)
+        self.seen = 0
+        self.index = np.empty(0, dtype=np.int64)
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.cell = np.empty(0, dtype=np.int64)
+        self.key = np.empty(0)
+
+    def cells(self, x, y):
+        x_min, x_max, y_min, y_max = self.bounds
+        col = np.clip(((x - x_min) / (x_max - x_min) * self.grid).astype(np.int64), 0, self.grid - 1)
+        row = np.clip(((y - y_min) / (y_max - y_min) * self.grid).astype(np.int64), 0, self.grid - 1)
+        return row * self.grid + col
+
+    def _keep(self, limit):
+        """Keep the limit[cell] lowest-keyed points of every cell"""
+        order = np.lexsort((self.key, self.cell))
+        cell = self.cell[order]
+        starts = np.searchsorted(cell, cell, side="left")
+        rank = np.arange(len(cell)) - starts
+        keep = order[rank < limit[cell]]
+        self.index, self.x, self.y = self.index[keep], self.x[keep], self.y[keep]
+        self.cell, self.key = self.cell[keep], self.key[keep]
+
+    def add(self, x, y):
+        """Feed the next chunk of the stream"""
+        x = np.ravel(x)
+        y = np.ravel(y)
+        ok = np.isfinite(x) & np.isfinite(y)
+        index = np.arange(self.seen, self.seen + len(x))[ok]
+        x, y = x[ok], y[ok]
+        cell = self.cells(x, y)
+        self.counts += np.bincount(cell, minlength=self.grid * self.grid)
+        self.seen += len(ok)
+
+        self.index = np.concatenate([self.index, index])
+        self.x = np.concatenate([self.x, x])
+        self.y = np.concatenate([self.y, y])
+        self.cell = np.concatenate([self.cell, cell])
+        self.key = np.concatenate([self.key, self.rng.random(len(x))])
+        self._keep(self.quota)
+
+    def allocation(self, counts=None):
+        """Samples per cell, proportional to the cell counts (largest remainder), by default the counts so far"""
+        counts = self.counts if counts is None else counts
+        total = counts.sum()
+        if total == 0:
+            return np.zeros_like(counts)
+        n = min(self.n_samples, total)
+        share = n * counts / total
+        alloc = np.floor(share).astype(np.int64)
+        remainder = n - alloc.sum()
+        if remainder > 0:
+            alloc[np.argsort(alloc - share)[:remainder]] += 1
+        return alloc
+
+    def result(self):
+        """Stream indices and coordinates of the sample, in stream order"""
+        self._keep(self.allocation())
+        order = np.argsort(self.index)
+        return self.index[order], self.x[order], self.y[order]
+
+def density_sample(x, y, n_samples, grid=64, chunk_size=1000000, seed=0):
+    """Indices of a density-preserving subset of n_samples points of (x, y)
+
+    The arrays are fed through a DensitySampler chunk by chunk, so indexing
+    any other per-point array (colors, ages) with the result works too.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    ok = np.isfinite(x) & np.isfinite(y)
+    if len(x) <= n_samples or not ok.any():
+        return np.arange(len(x))
+    bounds = (x[ok].min(), x[ok].max() + 1e-12, y[ok].min(), y[ok].max() + 1e-12)
+    sampler = DensitySampler(n_samples, bounds, grid=grid, seed=seed)
+    # Count the cells first, then no cell holds more than its final quota
+    totals = np.zeros(grid * grid, dtype=np.int64)
+    for start in range(0, len(x), chunk_size):
+        chunk = ok[start:start + chunk_size]
+        cells = sampler.cells(x[start:start + chunk_size][chunk], y[start:start + chunk_size][chunk])
+        totals += np.bincount(cells, minlength=grid * grid)
+    sampler.quota = sampler.allocation(totals)
+    for start in range(0, len(x), chunk_size):
+        sampler.add(x[start:start + chunk_size], y[start:start + chunk_size])
+    return sampler.result()[0]
@@ -0,0 +1,731 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from checkpoint import load_checkpoint, save_checkpoint
+from fast_trig import fast_cos, fast_sin
+from fractal_generator import default_params, styles
+from image_io import apply_lut, parse_color, save_image, style_lut
+
+
+# Vectorized single steps of the maps, each one advances a whole array of walkers
+# The trig maps take sin and cos as arguments so Ensemble can swap in fast_trig
+def clifford_step(x, y, params, sin=np.sin, cos=np.cos):
+    a, b, c, d = params[:4]
+    return sin(a * y) + c * cos(a * x), sin(b * x) + d * cos(b * y)
+
+def dejong_step(x, y, params, sin=np.sin, cos=np.cos):
+    a, b, c, d = params[:4]
+    return sin(a * y) - cos(b * x), sin(c * x) - cos(d * y)
+
+def svensson_step(x, y, params, sin=np.sin, cos=np.cos):
+    a, b, c, d = params[:4]
+    return d * sin(a * x) - sin(b * y), c * cos(a * x) + cos(b * y)
+
+def coaster_step(x, y, params, sin=np.sin, cos=np.cos):
+    """The sin/cos map from fixed_coaster (1).py, only a and b are used"""
+    a, b = params[:2]
+    return sin(x * x - y * y + a), cos(2 * x * y + b)
+
+def simon_step(x, y, params):
+    """The Simon map from simon_attractor.py, params is (a, b) with b = 0.3 there"""
+    a, b = params[:2]
+    return a - x**2 + b * y, x
+
+def quadratic_step(x, y, params):
+    """The list2f map from coaster.py, params holds the 12 ifs coefficients"""
+    p = params
+    x_new = p[0] + p[1] * x + p[2] * x**2 + p[3] * x * y + p[4] * y + p[5] * y**2
+    y_new = p[6] + p[7] * x + p[8] * x**2 + p[9] * x * y + p[10] * y + p[11] * y**2
+    return np.clip(x_new, -1e4, 1e4), np.clip(y_new, -1e4, 1e4)
+
+# Known good parameters for the maps that do not live in fractal_generator.py
+map_params = dict(default_params)
+map_params["coaster"] = [(3.69, 4.51), (3.61, -4.24), (0.29, 4.0), (5.92, -2.89)]
+map_params["simon"] = [(1.1, 0.3), (1.3, 0.3), (1.4, 0.3)]
+map_params["quadratic"] = [(
+    -0.28752426, 0.65608465, 0.71259527, 1.34370624, 1.01724109, 0.19113889,
+    -1.06839961, 0.29822047, 0.35672293, -0.68326573, 0.68020521, 1.18480771,
+)]
+
+maps = {
+    "clifford": clifford_step,
+    "dejong": dejong_step,
+    "svensson": svensson_step,
+    "coaster": coaster_step,
+    "simon": simon_step,
+    "quadratic": quadratic_step,
+}
+trig_maps = ("clifford", "dejong", "svensson", "coaster")
+
+
+class Ensemble:
+    """A batch of walkers iterating the same map in lockstep
+
+    fast_trig=True evaluates sin and cos of the trig maps in single
+    precision (see fast_trig.py for the error bound), other maps ignore it.
+    """
+
+    def __init__(self, attractor_type, params, n_walkers=4096, seed=0, spread=0.5, fast_trig=False):
+        self.attractor_type = attractor_type
+        self.step_fn = maps[attractor_type]
+        if fast_trig and attractor_type in trig_maps:
+            step = self.step_fn
+            self.step_fn = lambda x, y, params: step(x, y, params, fast_sin, fast_cos)
+        self.params = tuple(params)
+        self.rng = np.random.default_rng(seed)
+        self.x = self.rng.uniform(-spread, spread, n_walkers)
+        self.y = self.rng.uniform(-spread, spread, n_walkers)
+        self.steps = 0
+
+    def skip(self, n_steps):
+        """Iterate without keeping the points (transient removal)"""
+        x, y = self.x, self.y
+        for _ in range(n_steps):
+            x, y = self.step_fn(x, y, self.params)
+        self.x, self.y = x, y
+        self.steps += n_steps
+
+    def advance(self, n_steps):
+        """Iterate n_steps and return the visited points as (n_steps, n_walkers) arrays"""
+        xs = np.empty((n_steps, len(self.x)))
+        ys = np.empty((n_steps, len(self.y)))
+        x, y = self.x, self.y
+        for i in range(n_steps):
+            x, y = self.step_fn(x, y, self.params)
+            xs[i] = x
+            ys[i] = y
+        self.x, self.y = x, y
+        self.steps += n_steps
+        return xs, ys
+
+
+def estimate_bounds(attractor_type, params, n_walkers=1024, skip_points=1000, probe_steps=200, margin=0.05, seed=1):
+    """Estimate the attractor extent from a short probe run"""
+    probe = Ensemble(attractor_type, params, n_walkers=n_walkers, seed=seed)
+    probe.skip(skip_points)
+    xs, ys = probe.advance(probe_steps)
+    ok = np.isfinite(xs) & np.isfinite(ys)
+    if not ok.any():
+        raise ValueError(f"{attractor_type} with params {params} diverged during the probe run")
+    x_min, x_max = xs[ok].min(), xs[ok].max()
+    y_min, y_max = ys[ok].min(), ys[ok].max()
+    x_pad = max(x_max - x_min, 1e-9) * margin
+    y_pad = max(y_max - y_min, 1e-9) * margin
+    return (x_min - x_pad, x_max + x_pad, y_min - y_pad, y_max + y_pad)
+
+
+class DensityAccumulator:
+    """Fixed-extent 2D histogram of attractor hits, row 0 is the top of the image
+
+    Besides the hit counts it can keep per-bin sums of extra channels, so
+    colorings like "by iteration order" only need the per-bin mean instead
+    of a color value for every point.
+    """
+
+    def __init__(self, width, height, bounds, channels=(), splat="nearest", splat_sigma=0.5):
+        self.width = width
+        self.height = height
+        self.bounds = tuple(bounds)
+        self.counts = np.zeros((height, width), dtype=np.float64)
+        self.sums = {name: np.zeros((height, width), dtype=np.float64) for name in channels}
+        self.splat = splat
+        self.splat_sigma = splat_sigma
+        self.n_points = 0
+
+    def bin_index(self, x, y):
+        """Flat bin index of every point, plus the mask of points that landed inside"""
+        x_min, x_max, y_min, y_max = self.bounds
+        col = np.floor((x - x_min) / (x_max - x_min) * self.width)
+        row = np.floor((y_max - y) / (y_max - y_min) * self.height)
+        inside = (col >= 0) & (col < self.width) & (row >= 0) & (row < self.height)
+        return row[inside].astype(np.intp) * self.width + col[inside].astype(np.intp), inside
+
+    def splat_terms(self, x, y):
+        """(col, row, weight) triples each point is spread over, according to self.splat
+
+        "nearest" drops the whole point into one bin, "bilinear" shares it
+        between the four closest pixel centres and "gaussian" over a 3x3
+        neighbourhood with a sigma of splat_sigma pixels.
+        """
+        x_min, x_max, y_min, y_max = self.bounds
+        col = (x - x_min) / (x_max - x_min) * self.width
+        row = (y_max - y) / (y_max - y_min) * self.height
+        if self.splat == "nearest":
+            return [(np.floor(col), np.floor(row), None)]
+
+        # Pixel centres sit at i + 0.5
+        col -= 0.5
+        row -= 0.5
+        if self.splat == "bilinear":
+            c0, r0 = np.floor(col), np.floor(row)
+            fx, fy = col - c0, row - r0
+            return [
+                (c0, r0, (1 - fx) * (1 - fy)),
+                (c0 + 1, r0, fx * (1 - fy)),
+                (c0, r0 + 1, (1 - fx) * fy),
+                (c0 + 1, r0 + 1, fx * fy),
+            ]
+        if self.splat == "gaussian":
+            c0, r0 = np.round(col), np.round(row)
+            terms = []
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    dist2 = (c0 + dc - col) ** 2 + (r0 + dr - row) ** 2
+                    terms.append((c0 + dc, r0 + dr, np.exp(-dist2 / (2 * self.splat_sigma**2))))
+            total = sum(w for _, _, w in terms)
+            return [(c, r, w / total) for c, r, w in terms]
+        raise ValueError(f"Unknown splat mode {self.splat!r}")
+
+    def add(self, x, y, weights=None, **values):
+        """Bin the points, values holds the per-point weights of each channel
+
+        weights makes each point count that many times (e.g. a voxel count),
+        the channel values are scaled by it too.
+        """
+        x = np.ravel(x)
+        y = np.ravel(y)
+        weights = None if weights is None else np.ravel(weights)
+        values = {name: np.ravel(v) for name, v in values.items()}
+        size = self.width * self.height
+        shape = (self.height, self.width)
+        for col, row, weight in self.splat_terms(x, y):
+            inside = (col >= 0) & (col < self.width) & (row >= 0) & (row < self.height)
+            idx = row[inside].astype(np.intp) * self.width + col[inside].astype(np.intp)
+            w = None if weight is None else weight[inside]
+            if weights is not None:
+                w = weights[inside] if w is None else weights[inside] * w
+            self.counts += np.bincount(idx, weights=w, minlength=size).reshape(shape)
+            for name, v in values.items():
+                v = v[inside] if w is None else v[inside] * w
+                self.sums[name] += np.bincount(idx, weights=v, minlength=size).reshape(shape)
+        self.n_points += len(x)
+
+    def downsampled(self, factor, method="box"):
+        """A new accumulator reduced by factor along both axes, see downsample()"""
+        small = DensityAccumulator(self.width // factor, self.height // factor, self.bounds,
+                                   splat=self.splat, splat_sigma=self.splat_sigma)
+        small.counts = downsample(self.counts, factor, method)
+        for name, values in self.sums.items():
+            sums = downsample(values, factor, method)
+            if method != "box":
+                # Negative lobes can leave a bin with almost no count but some
+                # channel sum, keep the mean within the range it had before
+                means = self.channel(name)
+                if np.isfinite(means).any():
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        mean = np.clip(sums / small.counts, np.nanmin(means), np.nanmax(means))
+                    sums = np.where(small.counts > 0, mean * small.counts, 0)
+            small.sums[name] = sums
+        small.n_points = self.n_points
+        return small
+
+    def resized(self, width, height):
+        """A new accumulator resampled to any size, see resample()"""
+        resized = DensityAccumulator(width, height, self.bounds, splat=self.splat, splat_sigma=self.splat_sigma)
+        resized.counts = resample(self.counts, height, width)
+        resized.sums = {name: resample(values, height, width) for name, values in self.sums.items()}
+        resized.n_points = self.n_points
+        return resized
+
+    def normalized(self):
+        total = self.counts.sum()
+        return self.counts / total if total > 0 else self.counts.copy()
+
+    def channel(self, name):
+        """Per-bin mean of a channel, NaN where nothing landed"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.counts > 0, self.sums[name] / self.counts, np.nan)
+
+
+class AutoRangeAccumulator(DensityAccumulator):
+    """DensityAccumulator that widens its extent instead of dropping points
+
+    It starts from an estimated extent (a short probe run is enough). When a
+    chunk lands outside, the grid doubles its extent along that axis towards
+    the stray points and merges pairs of bins in place, so a single streaming
+    pass ends up framed around everything it saw without keeping the points.
+    With nearest splatting the merged bins are exactly what binning on the
+    final extent would have given. Points further out than max_growth times
+    the starting extent are treated as diverging and dropped as usual.
+    """
+
+    def __init__(self, width, height, bounds, channels=(), splat="nearest", splat_sigma=0.5, max_growth=64):
+        if width % 2 or height % 2:
+            raise ValueError("AutoRangeAccumulator needs an even width and height to merge bins")
+        super().__init__(width, height, bounds, channels, splat, splat_sigma)
+        x_min, x_max, y_min, y_max = self.bounds
+        self.max_span = ((x_max - x_min) * max_growth, (y_max - y_min) * max_growth)
+        self.regrids = 0
+
+    def _merge(self, image, axis, towards_low):
+        """Halve the resolution of image along axis and place it in the half away from the growth"""
+        grown = np.zeros_like(image)
+        if axis == 1:
+            half = self.width // 2
+            pairs = image.reshape(self.height, half, 2).sum(axis=2)
+            if towards_low:
+                grown[:, half:] = pairs
+            else:
+                grown[:, :half] = pairs
+        else:
+            # Row 0 is the top, growing towards low y adds rows at the bottom
+            half = self.height // 2
+            pairs = image.reshape(half, 2, self.width).sum(axis=1)
+            if towards_low:
+                grown[:half] = pairs
+            else:
+                grown[half:] = pairs
+        return grown
+
+    def grow(self, axis, towards_low):
+        """Double the extent along axis (1 for x, 0 for y) on one side"""
+        x_min, x_max, y_min, y_max = self.bounds
+        if axis == 1:
+            span = x_max - x_min
+            x_min, x_max = (x_min - span, x_max) if towards_low else (x_min, x_max + span)
+        else:
+            span = y_max - y_min
+            y_min, y_max = (y_min - span, y_max) if towards_low else (y_min, y_max + span)
+        self.bounds = (x_min, x_max, y_min, y_max)
+        self.counts = self._merge(self.counts, axis, towards_low)
+        self.sums = {name: self._merge(values, axis, towards_low) for name, values in self.sums.items()}
+        self.regrids += 1
+
+    def fit(self, x_lo, x_hi, y_lo, y_hi):
+        """Grow until the given extent is covered or max_growth is reached"""
+        while True:
+            x_min, x_max, y_min, y_max = self.bounds
+            x_room = 2 * (x_max - x_min) <= self.max_span[0]
+            y_room = 2 * (y_max - y_min) <= self.max_span[1]
+            if x_room and (x_lo < x_min or x_hi >= x_max):
+                self.grow(1, x_lo < x_min)
+            elif y_room and (y_lo <= y_min or y_hi > y_max):
+                self.grow(0, y_lo <= y_min)
+            else:
+                return
+
+    def add(self, x, y, weights=None, **values):
+        x = np.ravel(x)
+        y = np.ravel(y)
+        ok = np.isfinite(x) & np.isfinite(y)
+        if ok.any():
+            self.fit(x[ok].min(), x[ok].max(), y[ok].min(), y[ok].max())
+        super().add(x, y, weights, **values)
+
+    def cropped(self, margin=2, multiple=1):
+        """Plain DensityAccumulator trimmed to the occupied bins plus margin bins
+
+        The crop is widened to a multiple of multiple bins on both axes, so a
+        supersampled buffer still reduces without trimming.
+        """
+        rows = np.flatnonzero(self.counts.any(axis=1))
+        cols = np.flatnonzero(self.counts.any(axis=0))
+        if not len(rows):
+            return self
+        r0, r1 = _aligned(max(rows[0] - margin, 0), min(rows[-1] + 1 + margin, self.height), self.height, multiple)
+        c0, c1 = _aligned(max(cols[0] - margin, 0), min(cols[-1] + 1 + margin, self.width), self.width, multiple)
+        x_min, x_max, y_min, y_max = self.bounds
+        bin_w = (x_max - x_min) / self.width
+        bin_h = (y_max - y_min) / self.height
+        bounds = (x_min + c0 * bin_w, x_min + c1 * bin_w, y_max - r1 * bin_h, y_max - r0 * bin_h)
+        small = DensityAccumulator(c1 - c0, r1 - r0, bounds, splat=self.splat, splat_sigma=self.splat_sigma)
+        small.counts = self.counts[r0:r1, c0:c1].copy()
+        small.sums = {name: values[r0:r1, c0:c1].copy() for name, values in self.sums.items()}
+        small.n_points = self.n_points
+        return small
+
+
+def _aligned(start, stop, size, multiple):
+    """Grow [start, stop) within [0, size) until its length is a multiple of multiple"""
+    stop = min(start + -(-(stop - start) // multiple) * multiple, size)
+    start = max(stop - -(-(stop - start) // multiple) * multiple, 0)
+    return start, stop
+
+
+def lanczos_taps(factor, lobes=3):
+    """Offsets and weights of a 1D Lanczos filter reducing by factor"""
+    centre = (factor - 1) / 2
+    offsets = np.arange(int(np.ceil(centre - lobes * factor)), int(np.floor(centre + lobes * factor)) + 1)
+    dist = (offsets - centre) / factor
+    weights = np.sinc(dist) * np.sinc(dist / lobes)
+    weights[np.abs(dist) >= lobes] = 0
+    return offsets, weights / weights.sum()
+
+
+def downsample(image, factor, method="box"):
+    """Reduce a supersampled buffer by an integer factor, keeping the total counts
+
+    "box" sums each factor x factor block, "lanczos" uses a separable
+    Lanczos-3 filter (sharper, negative lobes are clipped at zero).
+    """
+    if factor == 1:
+        return image.copy()
+    height, width = image.shape[0] // factor, image.shape[1] // factor
+    image = image[:height * factor, :width * factor]
+    if method == "box":
+        return image.reshape(height, factor, width, factor).sum(axis=(1, 3))
+    if method != "lanczos":
+        raise ValueError(f"Unknown downsample filter {method!r}")
+
+    offsets, weights = lanczos_taps(factor)
+    pad = max(-offsets.min(), offsets.max() - factor + 1, 0)
+    for axis, n_out in ((0, height), (1, width)):
+        padded = np.pad(image, [(pad, pad) if a == axis else (0, 0) for a in range(2)], mode="edge")
+        out = np.zeros((n_out, image.shape[1]) if axis == 0 else (image.shape[0], n_out))
+        for offset, weight in zip(offsets, weights):
+            start = pad + offset
+            taken = np.take(padded, np.arange(start, start + n_out * factor, factor), axis=axis)
+            out += weight * taken
+        image = out * factor
+    return np.clip(image, 0, None)
+
+
+def resample(image, height, width):
+    """Area-weighted resize of a count buffer to any size, keeping the total counts
+
+    Bins are treated as evenly filled and each output bin gets the part of
+    the input its footprint covers, read off the cumulative sums along each
+    axis. Integer reductions give exactly the "box" downsample.
+    """
+    for axis, n_out in ((0, height), (1, width)):
+        n_in = image.shape[axis]
+        if n_out == n_in:
+            continue
+        zero = np.zeros_like(np.take(image, [0], axis=axis))
+        cumulative = np.concatenate([zero, np.cumsum(image, axis=axis)], axis=axis)
+        edges = np.linspace(0, n_in, n_out + 1)
+        i = np.minimum(np.floor(edges).astype(np.intp), n_in - 1)
+        frac = np.expand_dims(edges - i, 1 - axis)
+        low = np.take(cumulative, i, axis=axis)
+        at_edges = low + frac * (np.take(cumulative, i + 1, axis=axis) - low)
+        image = np.diff(at_edges, axis=axis)
+    return np.clip(image, 0, None)
+
+
+# Channels that can be streamed next to the hit counts, see step_channels()
+channel_names = {
+    "age": ("age",),
+    "speed": ("speed",),
+    "heading": ("heading_cos", "heading_sin"),
+}
+
+
+def step_channels(names, xs, ys, prev_x, prev_y, first_step):
+    """Per-point channel weights for a block of points returned by Ensemble.advance
+
+    age is the iteration number, speed the length of the step that led to the
+    point and heading the direction of that step (kept as cos/sin sums so the
+    per-bin mean is a proper circular mean).
+    """
+    values = {}
+    if "age" in names:
+        ages = np.arange(first_step, first_step + len(xs), dtype=np.float64)
+        values["age"] = np.broadcast_to(ages[:, None], xs.shape)
+    if "speed" in names or "heading" in names:
+        dx = np.diff(xs, axis=0, prepend=prev_x[None, :])
+        dy = np.diff(ys, axis=0, prepend=prev_y[None, :])
+        if "speed" in names:
+            values["speed"] = np.hypot(dx, dy)
+        if "heading" in names:
+            angle = np.arctan2(dy, dx)
+            values["heading_cos"] = np.cos(angle)
+            values["heading_sin"] = np.sin(angle)
+    return values
+
+
+def channel_image(acc, name):
+    """Per-bin channel means scaled to [0, 1] for colormap lookup"""
+    if name == "heading":
+        angle = np.arctan2(acc.channel("heading_sin"), acc.channel("heading_cos"))
+        return (angle + np.pi) / (2 * np.pi)
+    values = acc.channel(name)
+    if name == "age":
+        # Same scale as np.linspace(0, 1, len(x)) over the whole run
+        last = np.nanmax(values) if np.isfinite(values).any() else 1.0
+        return values / max(last, 1.0)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return values
+    low, high = np.percentile(values[finite], [1, 99])
+    return np.clip((values - low) / max(high - low, 1e-12), 0, 1)
+
+
+def density_change(previous, current):
+    """Total variation distance between two normalized density images"""
+    return 0.5 * np.abs(current - previous).sum()
+
+
+def render_density(attractor_type="clifford", params=None, width=1024, height=1024,
+                   n_points=10000000, tolerance=None, check_every=1000000,
+                   n_walkers=4096, skip_points=None, seed=0, channels=(),
+                   splat="nearest", supersample=1, downsample_filter="box",
+                   checkpoint=None, checkpoint_every=60, resume=False, auto_range=False, fast_trig=False,
+                   bounds=None, verbose=True):
+    """Accumulate a density image of an attractor from an ensemble of walkers
+
+    With tolerance=None exactly n_points are binned. Otherwise the normalized
+    image is compared with the previous one every check_every points and the
+    run stops once the change drops below tolerance, n_points being the ceiling.
+    channels picks extra per-bin channels ("age", "speed", "heading") to stream.
+    splat sets how points are deposited ("nearest", "bilinear", "gaussian") and
+    supersample accumulates at a multiple of the size, reduced at the end with
+    downsample_filter ("box" or "lanczos").
+
+    With a checkpoint path the full iteration state is saved there at most
+    every checkpoint_every seconds and at the end. resume=True continues from
+    it and gives the same result as an uninterrupted run.
+    auto_range=True frames the image from a much shorter probe and lets an
+    AutoRangeAccumulator widen it as the walkers explore. If it had to
+    widen, the result is cropped to the occupied bins, so it can come out
+    smaller than width x height.
+    skip_points=None detects per walker when it has settled onto the
+    attractor (see transient.TransientDetector) and only bins from there,
+    an integer drops that many steps of every walker instead.
+    bounds=(x_min, x_max, y_min, y_max) frames the image directly instead of
+    from a probe run, only with an integer skip_points.
+    fast_trig=True iterates the sin/cos maps with single precision trig.
+    verbose=False silences the progress output (thumbnails, services).
+    """
+    log = print if verbose else (lambda *args: None)
+    if params is None:
+        params = map_params[attractor_type][0]
+
+    acc_channels = [c for name in channels for c in channel_names[name]]
+    detector = None
+    if skip_points is None:
+        from transient import TransientDetector, settle_probe
+
+        bounds, reference = settle_probe(attractor_type, params, margin=0.01 if auto_range else 0.05)
+        detector = TransientDetector(reference, bounds, n_walkers)
+    elif bounds is not None:
+        bounds = tuple(bounds)
+    elif auto_range:
+        bounds = estimate_bounds(attractor_type, params, n_walkers=256, skip_points=skip_points, probe_steps=20, margin=0.01)
+    else:
+        bounds = estimate_bounds(attractor_type, params, skip_points=skip_points)
+    accumulator = AutoRangeAccumulator if auto_range else DensityAccumulator
+    acc = accumulator(width * supersample, height * supersample, bounds, acc_channels, splat)
+    walkers = Ensemble(attractor_type, params, n_walkers=n_walkers, seed=seed, fast_trig=fast_trig)
+
+    chunk_steps = max(1, check_every // n_walkers)
+    previous = None
+    acc.change_history = []
+    done = False
+
+    # Everything that has to match for a checkpoint to be resumed
+    run = {
+        "attractor_type": attractor_type, "params": list(params), "width": width,
+        "height": height, "n_points": n_points, "tolerance": tolerance,
+        "check_every": check_every, "n_walkers": n_walkers, "skip_points": skip_points,
+        "seed": seed, "channels": list(channels), "splat": splat, "supersample": supersample,
+        "auto_range": auto_range, "fast_trig": fast_trig,
+    }
+
+    if resume and checkpoint and os.path.exists(checkpoint):
+        meta, arrays = load_checkpoint(checkpoint)
+        if meta["run"] != run:
+            raise ValueError(f"Checkpoint {checkpoint} was written by a different render: {meta['run']}")
+        walkers.x, walkers.y = arrays["walker_x"], arrays["walker_y"]
+        walkers.steps = meta["steps"]
+        walkers.rng.bit_generator.state = meta["rng_state"]
+        acc.bounds = tuple(meta["bounds"])
+        acc.counts = arrays["counts"]
+        acc.sums = {name: arrays[f"sum_{name}"] for name in acc.sums}
+        acc.n_points = meta["n_points_done"]
+        acc.change_history = [tuple(item) for item in meta["change_history"]]
+        previous = arrays.get("previous")
+        done = meta["done"]
+        if detector is not None:
+            detector.streak, detector.settled = arrays["streak"], arrays["settled"]
+            detector.settled_at, detector.steps = arrays["settled_at"], meta["steps"]
+        log(f"Resuming from {checkpoint} at {acc.n_points} points")
+    elif detector is None:
+        walkers.skip(skip_points)
+
+    def save():
+        arrays = {"walker_x": walkers.x, "walker_y": walkers.y, "counts": acc.counts}
+        arrays.update({f"sum_{name}": values for name, values in acc.sums.items()})
+        if previous is not None:
+            arrays["previous"] = previous
+        if detector is not None:
+            arrays.update(streak=detector.streak, settled=detector.settled, settled_at=detector.settled_at)
+        meta = {
+            "run": run, "steps": walkers.steps, "rng_state": walkers.rng.bit_generator.state,
+            "bounds": [float(v) for v in acc.bounds], "n_points_done": acc.n_points,
+            "change_history": acc.change_history, "done": done,
+        }
+        save_checkpoint(checkpoint, meta, **arrays)
+
+    last_save = time.time()
+
+    log(f"Rendering {attractor_type} density with parameters {params}")
+    while not done and acc.n_points < n_points:
+        steps = min(chunk_steps, -(-(n_points - acc.n_points) // n_walkers))
+        prev_x, prev_y, first_step = walkers.x, walkers.y, walkers.steps + 1
+        xs, ys = walkers.advance(steps)
+        values = step_channels(channels, xs, ys, prev_x, prev_y, first_step)
+        if detector is not None:
+            keep = detector.keep(xs, ys)
+            if not keep.all():
+                xs, ys = xs[keep], ys[keep]
+                values = {name: v[keep] for name, v in values.items()}
+        excess = acc.n_points + xs.size - n_points
+        if excess > 0:
+            # The last step of the walkers overshoots, bin exactly n_points
+            xs, ys = xs.ravel()[:-excess], ys.ravel()[:-excess]
+            values = {name: v.ravel()[:-excess] for name, v in values.items()}
+        acc.add(xs, ys, **values)
+
+        if tolerance is None:
+            log(f"Progress: {min(acc.n_points / n_points, 1) * 100:.1f}%")
+        else:
+            current = acc.normalized()
+            if previous is not None:
+                change = float(density_change(previous, current))
+                acc.change_history.append((acc.n_points, change))
+                log(f"{acc.n_points} points - change since last check: {change:.2e}")
+                if change < tolerance:
+                    log(f"Converged after {acc.n_points} points")
+                    done = True
+            previous = current
+
+        if checkpoint and time.time() - last_save >= checkpoint_every:
+            save()
+            last_save = time.time()
+
+    if tolerance is not None and not done:
+        log(f"Reached the ceiling of {n_points} points before converging")
+    done = True
+    if checkpoint:
+        save()
+
+    history = acc.change_history
+    if auto_range and acc.regrids:
+        # Growing doubles the extent, trim the empty border it leaves
+        acc = acc.cropped(multiple=supersample)
+    if supersample > 1:
+        acc = acc.downsampled(supersample, downsample_filter)
+    acc.change_history = history
+    return acc
+
+
+def shade(acc, style_name="default", channel=None, lut_size=1024):
+    """Turn an accumulator into an RGB float image
+
+    Without a channel the colormap runs over the log density. With a channel
+    the colormap is applied to the per-bin channel mean and the log density
+    only sets how strongly each pixel stands out from the background.
+    """
+    style = style_name if isinstance(style_name, dict) else styles.get(style_name, styles["default"])
+    intensity = np.log1p(acc.counts)
+    if intensity.max() > 0:
+        intensity /= intensity.max()
+
+    if channel is None:
+        return apply_lut(style_lut(style, lut_size, with_background=True), intensity)
+
+    colored = apply_lut(style_lut(style, lut_size), channel_image(acc, channel))
+    background = np.array(parse_color(style["background"]))
+    return background * (1 - intensity[..., None]) + colored * intensity[..., None]
+
+
+def save_density_image(acc, filename, style_name="default", channel=None, bit_depth=8, verbose=True):
+    """Save a shaded density image (.png, .jpg or .npy) at exactly the accumulator size"""
+    save_image(filename, shade(acc, style_name, channel), bit_depth)
+    if verbose:
+        print(f"Density image saved as {filename}")
+
+
+def render_outputs(acc, style_names, sizes, filename_base, channel=None, bit_depth=8, ext="png", workers=None):
+    """Shade and save every style at every size from one accumulator
+
+    sizes are output widths, the height follows the aspect ratio of acc.
+    Each size is resampled once and shared by all styles. The shading and
+    encoding of the (style, size) pairs run in a thread pool, numpy and zlib
+    release the GIL for the heavy parts. Returns the filenames written as
+    {filename_base}_{style}_{size}.{ext}.
+    """
+    resized = {}
+    for size in sizes:
+        height = max(1, round(size * acc.height / acc.width))
+        resized[size] = acc if (size, height) == (acc.width, acc.height) else acc.resized(size, height)
+
+    def save(style_name, size):
+        filename = f"{filename_base}_{style_name}_{size}.{ext}"
+        save_image(filename, shade(resized[size], style_name, channel), bit_depth)
+        return filename
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(save, style_name, size) for style_name in style_names for size in sizes]
+        filenames = [future.result() for future in futures]
+    print(f"{len(filenames)} images saved as {filename_base}_*.{ext} in {time.time() - start:.1f}s")
+    return filenames
+
+
+def render_fan_out(attractor_type="clifford", params=None, style_names=("default",), sizes=(1024,),
+                   filename_base=None, channel=None, bit_depth=8, ext="png", workers=None, **options):
+    """Simulate once at the largest size and write every style at every size
+
+    options go to render_density (n_points, tolerance, splat, supersample, ...).
+    Returns the accumulator and the filenames written.
+    """
+    size = max(sizes)
+    acc = render_density(attractor_type, params, size, size, channels=[channel] if channel else (), **options)
+    filename_base = filename_base or f"{attractor_type}_density"
+    return acc, render_outputs(acc, style_names, sizes, filename_base, channel, bit_depth, ext, workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render an attractor as a density image")
+    parser.add_argument("attractor_type", choices=sorted(maps))
+    parser.add_argument("params", type=float, nargs="*")
+    parser.add_argument("--style", nargs="+", default=["default"], help="one or more styles, all shaded from the same run")
+    parser.add_argument("--size", type=int, nargs="+", default=[1024], help="one or more output sizes")
+    parser.add_argument("--points", type=int, default=10000000, help="number of points, or the ceiling with --tolerance")
+    parser.add_argument("--tolerance", type=float, default=None, help="stop once the image changes less than this between checks")
+    parser.add_argument("--check-every", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-points", type=int, default=None, help="fixed transient to drop, detected per walker by default")
+    parser.add_argument("--color-by", choices=sorted(channel_names), default=None,
+                        help="color pixels by a per-bin channel instead of the density")
+    parser.add_argument("--splat", choices=["nearest", "bilinear", "gaussian"], default="nearest")
+    parser.add_argument("--supersample", type=int, default=1)
+    parser.add_argument("--filter", choices=["box", "lanczos"], default="box")
+    parser.add_argument("--output", default=None, help="output file, .png, .jpg or .npy")
+    parser.add_argument("--bit-depth", type=int, choices=[8, 16], default=8)
+    parser.add_argument("--checkpoint", default=None, help="file to periodically save the render state to")
+    parser.add_argument("--checkpoint-every", type=float, default=60, help="seconds between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="continue from --checkpoint if it exists")
+    parser.add_argument("--auto-range", action="store_true", help="grow the framing during the render instead of probing first")
+    parser.add_argument("--fast-trig", action="store_true", help="single precision sin/cos for the trig maps")
+    args = parser.parse_args()
+
+    size = max(args.size)
+    acc = render_density(args.attractor_type, args.params or None, size, size,
+                         n_points=args.points, tolerance=args.tolerance,
+                         check_every=args.check_every, skip_points=args.skip_points, seed=args.seed,
+                         channels=[args.color_by] if args.color_by else (),
+                         splat=args.splat, supersample=args.supersample,
+                         downsample_filter=args.filter, checkpoint=args.checkpoint,
+                         checkpoint_every=args.checkpoint_every, resume=args.resume,
+                         auto_range=args.auto_range, fast_trig=args.fast_trig)
+    if len(args.style) == 1 and len(args.size) == 1:
+        style = args.style[0]
+        output = args.output or f"{args.attractor_type}_{style}_density.png"
+        save_density_image(acc, output, style, args.color_by, args.bit_depth)
+    else:
+        # Several outputs, --output is the base name and its extension the format
+        style = args.style
+        output = args.output or f"{args.attractor_type}_density.png"
+        base, ext = os.path.splitext(output)
+        render_outputs(acc, args.style, args.size, base, args.color_by, args.bit_depth, ext.lstrip(".") or "png")
+
+    from metrics import dimensions_from_counts, write_metadata
+    write_metadata(os.path.splitext(output)[0] + ".json", attractor_type=args.attractor_type,
+                   params=args.params or map_params[args.attractor_type][0], style=style,
+                   n_points=acc.n_points, bounds=acc.bounds, **dimensions_from_counts(acc.counts))
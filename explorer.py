@@ -0,0 +1,176 @@
+import argparse
+import threading
+import time
+
+import matplotlib.pyplot as plt
+from matplotlib.widgets import Button, RadioButtons, Slider
+
+import density
+
+# (image size, points) of each refinement pass, the first one has to stay
+# around 100 ms so dragging a slider feels live
+levels = [(256, 200000), (512, 2000000), (1024, 12000000)]
+chunk_points = 1000000
+
+class Explorer:
+    """Slider-driven attractor explorer with progressive refinement
+
+    Every parameter change restarts from a small, fast preview. While the
+    parameters stay still a timer keeps adding points chunk by chunk and
+    moves on to larger images, so the view sharpens without blocking the UI.
+    Exports run in a background thread for the same reason.
+    """
+
+    def __init__(self, attractor_type="clifford", style="purple_dream"):
+        self.attractor_type = attractor_type
+        self.style = style
+        self.params = list(density.map_params[attractor_type][0])[:4]
+        while len(self.params) < 4:
+            self.params.append(0.0)
+
+        self.fig = plt.figure(figsize=(11, 8))
+        self.fig.patch.set_facecolor("black")
+        self.ax = self.fig.add_axes([0.25, 0.3, 0.7, 0.65])
+        self.ax.set_axis_off()
+        self.image = None
+        # Last finished level, kept so a style change can re-shade it
+        self.completed = None
+        self.export_thread = None
+        self.export_message = None
+
+        self.sliders = []
+        for i, name in enumerate("abcd"):
+            slider_ax = self.fig.add_axes([0.3, 0.2 - i * 0.045, 0.6, 0.03])
+            slider = Slider(slider_ax, name, -3.0, 3.0, valinit=self.params[i])
+            slider.label.set_color("white")
+            slider.valtext.set_color("white")
+            slider.on_changed(self.on_change)
+            self.sliders.append(slider)
+
+        families = [name for name in ("clifford", "dejong", "svensson", "coaster") if name in density.maps]
+        self.family_buttons = RadioButtons(self.fig.add_axes([0.02, 0.65, 0.18, 0.25]), families,
+                                           active=families.index(attractor_type))
+        self.family_buttons.on_clicked(self.on_family)
+        style_names = list(density.styles)
+        self.style_buttons = RadioButtons(self.fig.add_axes([0.02, 0.3, 0.18, 0.32]), style_names,
+                                          active=style_names.index(style))
+        self.style_buttons.on_clicked(self.on_style)
+        self.export_button = Button(self.fig.add_axes([0.02, 0.1, 0.18, 0.06]), "Export full quality")
+        self.export_button.on_clicked(self.export)
+
+        self.timer = self.fig.canvas.new_timer(interval=50)
+        self.timer.add_callback(self.refine)
+        self.restart()
+        self.timer.start()
+
+    def restart(self):
+        """Throw away the current render and start again from the preview level"""
+        self.level = 0
+        self.acc = None
+        self.completed = None
+        self.refine()
+
+    def start_level(self):
+        size, _ = levels[self.level]
+        params = tuple(self.params)
+        bounds = density.estimate_bounds(self.attractor_type, params, n_walkers=256, skip_points=100, probe_steps=100)
+        self.acc = density.DensityAccumulator(size, size, bounds)
+        self.walkers = density.Ensemble(self.attractor_type, params, n_walkers=4096)
+        self.walkers.skip(100)
+
+    def refine(self):
+        """Timer tick: add one chunk of points to the current level"""
+        if self.export_message is not None:
+            # Set by the export thread, matplotlib is only touched from here
+            self.fig.suptitle(self.export_message, color="white")
+            self.export_message = None
+            self.fig.canvas.draw_idle()
+        if self.level >= len(levels):
+            return
+        try:
+            if self.acc is None:
+                self.start_level()
+            size, target = levels[self.level]
+            # The first level is rendered in one go, later ones in chunks
+            budget = target if self.level == 0 else chunk_points
+            steps = max(1, min(budget, target - self.acc.n_points) // len(self.walkers.x))
+            xs, ys = self.walkers.advance(steps)
+            self.acc.add(xs, ys)
+        except ValueError:
+            self.ax.set_title("diverges", color="white")
+            self.level = len(levels)
+            self.fig.canvas.draw_idle()
+            return
+
+        self.show(self.acc)
+        if self.acc.n_points >= target:
+            self.level += 1
+            self.completed = self.acc
+            self.acc = None
+
+    def show(self, acc):
+        rgb = density.shade(acc, self.style)
+        if self.image is None or self.image.get_array().shape != rgb.shape:
+            self.ax.clear()
+            self.ax.set_axis_off()
+            self.image = self.ax.imshow(rgb, interpolation="bilinear")
+        else:
+            self.image.set_data(rgb)
+        a, b, c, d = self.params
+        self.ax.set_title(f"{self.attractor_type}  a={a:.3f} b={b:.3f} c={c:.3f} d={d:.3f}  "
+                          f"({acc.n_points:,} points)", color="white")
+        self.fig.canvas.draw_idle()
+
+    def on_change(self, _):
+        self.params = [slider.val for slider in self.sliders]
+        self.restart()
+
+    def on_family(self, label):
+        self.attractor_type = label
+        self.restart()
+
+    def on_style(self, label):
+        self.style = label
+        # Re-shade whatever is on screen, the one being refined or the last finished one
+        acc = self.acc if self.acc is not None and self.acc.n_points else self.completed
+        if acc is not None:
+            self.show(acc)
+        else:
+            self.restart()
+
+    def export(self, _=None, size=2048, n_points=20000000):
+        """Render the current view at full quality and save it, in a background thread"""
+        if self.export_thread is not None and self.export_thread.is_alive():
+            self.fig.suptitle("Export already running", color="white")
+            self.fig.canvas.draw_idle()
+            return
+        attractor_type, params, style = self.attractor_type, tuple(self.params), self.style
+        self.fig.suptitle("Exporting...", color="white")
+        self.fig.canvas.draw_idle()
+        self.export_thread = threading.Thread(target=self.run_export,
+                                              args=(attractor_type, params, style, size, n_points), daemon=True)
+        self.export_thread.start()
+
+    def run_export(self, attractor_type, params, style, size, n_points):
+        a, b, c, d = params
+        filename = f"{attractor_type}_{style}_a{a:.3f}_b{b:.3f}_c{c:.3f}_d{d:.3f}.png"
+        start = time.time()
+        try:
+            acc = density.render_density(attractor_type, params, size, size, n_points=n_points,
+                                         splat="bilinear", supersample=2, verbose=False)
+            density.save_density_image(acc, filename, style)
+        except (ValueError, OSError) as error:
+            self.export_message = f"Export failed: {error}"
+            print(self.export_message)
+            return
+        self.export_message = f"Exported {filename} in {time.time() - start:.1f}s"
+        print(self.export_message)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interactive attractor parameter explorer")
+    parser.add_argument("attractor_type", nargs="?", default="clifford", choices=["clifford", "dejong", "svensson", "coaster"])
+    parser.add_argument("--style", default="purple_dream", choices=list(density.styles))
+    args = parser.parse_args()
+
+    explorer = Explorer(args.attractor_type, args.style)
+    plt.show()
@@ -0,0 +1,121 @@
+import argparse
+import time
+import numpy as np
+
+from image_io import save_image
+
+
+def error_bound(x_max):
+    """Documented bound on |fast_sin(x) - sin(x)| and |fast_cos(x) - cos(x)| for |x| <= x_max
+
+    It is the float32 rounding of the argument (relative 2^-24) plus a few
+    float32 ulps from the kernel itself. The arguments in the maps stay
+    below about 20, where this is under 1.5e-6.
+    """
+    return 2.5e-7 + 2.0**-24 * x_max
+
+
+def fast_sin(x):
+    """sin in single precision, returned as float64
+
+    numpy evaluates float32 sin/cos with range-reduced SIMD polynomial
+    kernels, several times faster than its float64 ones. The walker state
+    stays float64, only the trig calls are approximate, see error_bound.
+    """
+    return np.sin(np.asarray(x, dtype=np.float32)).astype(np.float64)
+
+def fast_cos(x):
+    """cos in single precision, returned as float64, see fast_sin"""
+    return np.cos(np.asarray(x, dtype=np.float32)).astype(np.float64)
+
+
+def measure_error(x_max=32.0, n=4000000):
+    """Largest deviation of fast_sin/fast_cos from np.sin/np.cos on a dense grid over [-x_max, x_max]"""
+    x = np.linspace(-x_max, x_max, n)
+    return {
+        "sin": float(np.abs(fast_sin(x) - np.sin(x)).max()),
+        "cos": float(np.abs(fast_cos(x) - np.cos(x)).max()),
+        "bound": error_bound(x_max),
+    }
+
+
+def step_throughput(attractor_type, params, fast_trig, n_walkers=4096, n_steps=200):
+    """Walker steps per second of an ensemble"""
+    import density
+
+    walkers = density.Ensemble(attractor_type, params, n_walkers=n_walkers, fast_trig=fast_trig)
+    walkers.skip(10)
+    start = time.perf_counter()
+    walkers.skip(n_steps)
+    return n_walkers * n_steps / (time.perf_counter() - start)
+
+
+def validate(attractor_type="clifford", params=None, size=512, n_points=10000000, style_name="default", output=None):
+    """Compare exact and fast-trig renders of the same attractor
+
+    The fast render is measured against the exact one, and the exact one
+    against a second exact render with another seed. Both distances are
+    the total variation between the normalized densities plus the mean
+    absolute difference of the shaded 8-bit images. If fast vs exact is no
+    larger than the seed-to-seed sampling noise, the approximation can not
+    be told apart from a different run.
+    """
+    import density
+
+    if params is None:
+        params = density.map_params[attractor_type][0]
+
+    def render(fast_trig, seed):
+        start = time.perf_counter()
+        acc = density.render_density(attractor_type, params, size, size, n_points=n_points, seed=seed,
+                                     skip_points=1000, fast_trig=fast_trig, verbose=False)
+        return acc, time.perf_counter() - start
+
+    exact, exact_time = render(False, 0)
+    fast, fast_time = render(True, 0)
+    # The framing comes from an exact probe with a fixed seed, so the pixels line up
+    other, _ = render(False, 1)
+
+    def distance(a, b):
+        pixels = np.abs(np.round(density.shade(a, style_name) * 255) - np.round(density.shade(b, style_name) * 255))
+        return float(density.density_change(a.normalized(), b.normalized())), float(pixels.mean())
+
+    report = {
+        "attractor_type": attractor_type,
+        "params": list(params),
+        "error": measure_error(),
+        "steps_per_second": {
+            "exact": step_throughput(attractor_type, params, False),
+            "fast": step_throughput(attractor_type, params, True),
+        },
+        "render_seconds": {"exact": exact_time, "fast": fast_time},
+        "fast_vs_exact": distance(fast, exact),
+        "seed_noise": distance(other, exact),
+    }
+    if output:
+        side_by_side = np.concatenate([density.shade(exact, style_name), density.shade(fast, style_name)], axis=1)
+        save_image(output, side_by_side)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the fast trig mode against exact trig")
+    parser.add_argument("attractor_type", nargs="?", default="clifford", choices=["clifford", "dejong", "svensson", "coaster"])
+    parser.add_argument("params", type=float, nargs="*")
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--points", type=int, default=10000000)
+    parser.add_argument("--style", default="default")
+    parser.add_argument("--output", default=None, help="write the exact and fast renders side by side to this image")
+    args = parser.parse_args()
+
+    report = validate(args.attractor_type, args.params or None, args.size, args.points, args.style, args.output)
+    error = report["error"]
+    print(f"Max error on [-32, 32]: sin {error['sin']:.2e}, cos {error['cos']:.2e} (bound {error['bound']:.2e})")
+    rates = report["steps_per_second"]
+    print(f"Ensemble steps/s: exact {rates['exact']:.3g}, fast {rates['fast']:.3g} "
+          f"({rates['fast'] / rates['exact']:.2f}x)")
+    times = report["render_seconds"]
+    print(f"Render: exact {times['exact']:.2f}s, fast {times['fast']:.2f}s")
+    for name in ("fast_vs_exact", "seed_noise"):
+        tv, pixels = report[name]
+        print(f"{name}: density TV distance {tv:.4f}, mean 8-bit pixel difference {pixels:.3f}")
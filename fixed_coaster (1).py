@@ -3,46 +3,61 @@ import csv
 import random
 import matplotlib.pyplot as plt
 from matplotlib.colors import LinearSegmentedColormap
+from lyapunov_atlas import lyapunov_tile
+from metrics import fractal_dimensions, write_metadata
+from results_db import ResultsDB
+from trajectory import Trajectory, sliding_range
+from trajectory_codec import save_trajectory
 
-def generate_fractal_attractor(a, b, n_points=5000000, max_iterations_check=100000):
+# Orbits kept by find_interesting_attractors, rendering one of them later
+# only iterates the points that are still missing
+trajectories = {}
+
+def generate_fractal_attractor(a, b, n_points=5000000, max_iterations_check=100000, chunk=10000, trajectory=None):
     """Generate fractal attractor using modified equations"""
     
-    # Initialize arrays
-    x_vals = [0.0]
-    y_vals = [0.0]
+    # Reuse the orbit if this (a, b) has already been iterated
+    if trajectory is None:
+        trajectory = trajectories.get((a, b)) or Trajectory("coaster", (a, b), 0.0, 0.0)
     
-    # Track if the system escapes to infinity or gets stuck
-    for i in range(1, n_points):
-        x_prev = x_vals[i-1]
-        y_prev = y_vals[i-1]
-        
-        # Your original style equations (they actually work well for attractors!)
-        x_new = np.sin(x_prev*x_prev - y_prev*y_prev + a)
-        y_new = np.cos(2*x_prev*y_prev + b)
+    # Extend the orbit a chunk at a time so a bad orbit stops early, the
+    # checks see every point in the same order as a point by point loop
+    done = 1
+    while done < n_points:
+        end = min(done + chunk, n_points)
+        x_vals, y_vals = trajectory.ensure(end)
+        new_x, new_y = x_vals[done:end], y_vals[done:end]
         
-        # Check for invalid values
-        if np.isinf(x_new) or np.isnan(x_new) or np.isinf(y_new) or np.isnan(y_new):
-            print(f"System diverged at iteration {i}")
-            break
-            
-        # Check if system is exploding (values too large)
-        if abs(x_new) > 100 or abs(y_new) > 100:
-            print(f"System escaped to infinity at iteration {i}")
-            break
-            
-        x_vals.append(x_new)
-        y_vals.append(y_new)
+        # Check for invalid values and for the system exploding (values too large)
+        invalid = ~np.isfinite(new_x) | ~np.isfinite(new_y)
+        with np.errstate(invalid="ignore"):
+            bad = invalid | (np.abs(new_x) > 100) | (np.abs(new_y) > 100)
+        stop = done + int(np.argmax(bad)) if bad.any() else end
         
-        # Early check for boring attractors (stuck at fixed point)
-        if i > max_iterations_check:
-            recent_x = x_vals[-1000:]
-            recent_y = y_vals[-1000:]
-            if (max(recent_x) - min(recent_x) < 0.001 and 
-                max(recent_y) - min(recent_y) < 0.001):
+        # Check for boring attractors (stuck at fixed point): past the first
+        # check, every point ends a window of the last 1000 points
+        first = max(done, max_iterations_check + 1)
+        if first < stop:
+            window_start = max(first - 999, 0)
+            # Windows near the start are shorter, repeating the first point does not change their range
+            pad = max(999 - first, 0)
+            window_x = np.concatenate([np.full(pad, x_vals[0]), x_vals[window_start:stop]])
+            window_y = np.concatenate([np.full(pad, y_vals[0]), y_vals[window_start:stop]])
+            stuck = (sliding_range(window_x, 1000) < 0.001) & (sliding_range(window_y, 1000) < 0.001)
+            if stuck.any():
                 print(f"System converged to fixed point")
                 return None, None
+        
+        if stop < end:
+            if invalid[stop - done]:
+                print(f"System diverged at iteration {stop}")
+            else:
+                print(f"System escaped to infinity at iteration {stop}")
+            return x_vals[:stop].copy(), y_vals[:stop].copy()
+        done = end
     
-    return np.array(x_vals), np.array(y_vals)
+    x_vals, y_vals = trajectory.ensure(n_points)
+    return x_vals.copy(), y_vals.copy()
 
 def create_beautiful_plot(x_vals, y_vals, a, b, style_name="default"):
     """Create beautiful plots like your reference images"""
@@ -139,8 +154,12 @@ def create_beautiful_plot(x_vals, y_vals, a, b, style_name="default"):
     plt.tight_layout()
     return fig, ax
 
-def find_interesting_attractors(num_attempts=50):
-    """Find interesting attractor parameters"""
+def find_interesting_attractors(num_attempts=50, db=None):
+    """Find interesting attractor parameters, ranked by correlation dimension
+
+    With a ResultsDB every outcome is stored, and candidates close to a
+    known divergent, fixed-point or dull result are skipped untested.
+    """
     
     # Some known good parameter ranges based on your examples
     interesting_params = []
@@ -152,21 +171,39 @@ def find_interesting_attractors(num_attempts=50):
         a = random.uniform(-6, 6)
         b = random.uniform(-6, 6)
         
+        if db is not None and db.should_skip("coaster", (a, b)):
+            print(f"Skipping a={a:.3f}, b={b:.3f}, too close to a known dud ({attempt+1}/{num_attempts})")
+            continue
+        
         print(f"Testing a={a:.3f}, b={b:.3f} ({attempt+1}/{num_attempts})")
         
-        # Generate the attractor
-        x_vals, y_vals = generate_fractal_attractor(a, b, n_points=500000)
+        # Generate the attractor, its orbit is only cached below if it turns out interesting
+        trajectory = Trajectory("coaster", (a, b), 0.0, 0.0)
+        x_vals, y_vals = generate_fractal_attractor(a, b, n_points=500000, trajectory=trajectory)
+        status, result = "fixed_point" if x_vals is None else "diverged", {}
         
         if x_vals is not None and len(x_vals) > 10000:
             # Check if it's interesting (good spread, not too chaotic)
             x_range = x_vals.max() - x_vals.min()
             y_range = y_vals.max() - y_vals.min()
+            status, result = "dull", {"extent": max(x_range, y_range), "n_points": len(x_vals)}
             
             if (0.5 < x_range < 20 and 0.5 < y_range < 20 and 
                 len(x_vals) > 20000):
-                interesting_params.append((a, b, len(x_vals)))
-                print(f"  ✓ Found interesting attractor! Range: {x_range:.2f} x {y_range:.2f}")
+                dims = fractal_dimensions(x_vals, y_vals)
+                trajectories[(a, b)] = trajectory
+                interesting_params.append((a, b, len(x_vals), dims["correlation_dimension"]))
+                status = "interesting"
+                result["dimension"] = dims["correlation_dimension"]
+                print(f"  ✓ Found interesting attractor! Range: {x_range:.2f} x {y_range:.2f}, "
+                      f"dimension: {dims['correlation_dimension']:.3f}")
+        
+        if db is not None:
+            lyapunov, _ = lyapunov_tile("coaster", (a, b))
+            db.record("coaster", (a, b), status, lyapunov=lyapunov, **result)
     
+    # Space-filling attractors first, near-periodic ones last
+    interesting_params.sort(key=lambda item: -item[3])
     return interesting_params
 
 def main():
@@ -206,6 +243,16 @@ def main():
                     writer.writerow([f"{x:.6f}", f"{y:.6f}"])
             print(f"Saved data as {csv_filename}")
             
+            # Same points about 40x smaller than the CSV, predicted from the map itself
+            trajectory_filename = f"attractor_data_a{a:.2f}_b{b:.2f}.atrj"
+            save_trajectory(trajectory_filename, x_vals, y_vals, attractor_type="coaster", params=(a, b))
+            print(f"Saved compact data as {trajectory_filename}")
+            
+            dims = fractal_dimensions(x_vals, y_vals)
+            write_metadata(f"attractor_a{a:.2f}_b{b:.2f}.json", a=a, b=b, n_points=len(x_vals),
+                           box_dimension=dims["box_dimension"],
+                           correlation_dimension=dims["correlation_dimension"])
+            
             plt.show()
         else:
             print("Failed to generate stable attractor")
@@ -213,11 +260,32 @@ def main():
     # Optionally search for new interesting parameters
     search_new = input("\nSearch for new interesting parameters? (y/n): ").lower().strip()
     if search_new == 'y':
-        interesting = find_interesting_attractors(20)
+        db = ResultsDB()
+        interesting = find_interesting_attractors(20, db)
         if interesting:
             print(f"\nFound {len(interesting)} interesting parameter sets:")
-            for a, b, points in interesting:
-                print(f"  a={a:.3f}, b={b:.3f} ({points} points)")
+            for a, b, points, dimension in interesting:
+                print(f"  a={a:.3f}, b={b:.3f} ({points} points, dimension {dimension:.3f})")
+            
+            best = input("\nRender the best 3 at full resolution? (y/n): ").lower().strip()
+            if best == 'y':
+                for a, b, *_ in interesting[:3]:
+                    # Continues the 500k point orbits from the search instead of starting over
+                    x_vals, y_vals = generate_fractal_attractor(a, b, n_points=5000000)
+                    if x_vals is not None:
+                        create_beautiful_plot(x_vals, y_vals, a, b)
+                        filename = f"attractor_a{a:.2f}_b{b:.2f}.png"
+                        plt.savefig(filename, dpi=300, bbox_inches='tight', 
+                                   facecolor='white', edgecolor='none')
+                        print(f"Saved plot as {filename}")
+                        for row in db.nearby("coaster", (a, b), tolerance=0):
+                            db.update(row["id"], thumbnail=filename)
+                plt.show()
+            
+            sheet = input("\nRender a contact sheet of the results? (y/n): ").lower().strip()
+            if sheet == 'y':
+                import contact_sheet
+                contact_sheet.save_contact_sheet("coaster", [(a, b) for a, b, *_ in interesting])
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,27 @@
 import numpy as np
 import csv
 import random
+import os
 import coasterplot
+from checkpoint import load_checkpoint, save_checkpoint
+from results_db import ResultsDB
 
-def generate_fractal():
+def save_sheet(sheet, tried):
+    """Tile every coefficient set the search tried into a contact sheet"""
+    if sheet and tried:
+        import contact_sheet
+        contact_sheet.save_contact_sheet("clifford", tried, sheet)
+
+def generate_fractal(checkpoint=None, resume=False, db=None, sheet=None):
+    """Search random Clifford coefficients until a non-repetitive sequence is found
+
+    With a checkpoint path the search progress (attempt number and random
+    state) is saved before every attempt, resume=True picks it up again.
+    With a ResultsDB every attempt is recorded and coefficients close to an
+    earlier failure are skipped without iterating them. With a sheet filename
+    the coefficients of every attempt this run are tiled into a contact sheet
+    once the search ends, so the failures can be eyeballed side by side.
+    """
     csv_filename = "coaster.csv"
     n_points = 100000
     repetition_limit = 100000
@@ -11,8 +29,19 @@ def generate_fractal():
     tolerance = 1e-6  # For floating point comparison
     
     max_attempts = 100  # Prevent infinite loops
+    first_attempt = 0
+    tried = []
     
-    for attempt in range(max_attempts):
+    if resume and checkpoint and os.path.exists(checkpoint):
+        meta, _ = load_checkpoint(checkpoint)
+        version, internal, gauss_next = meta["random_state"]
+        random.setstate((version, tuple(internal), gauss_next))
+        first_attempt = meta["attempt"]
+        print(f"Resuming search from {checkpoint} at attempt {first_attempt + 1}")
+    
+    for attempt in range(first_attempt, max_attempts):
+        if checkpoint:
+            save_checkpoint(checkpoint, {"attempt": attempt, "random_state": random.getstate()})
         print(f"\nAttempt {attempt + 1}/{max_attempts}")
         
         # Generate random coefficients for Clifford Attractor
@@ -21,7 +50,11 @@ def generate_fractal():
         b = random.uniform(-2.0, 2.0) 
         c = random.uniform(-2.0, 2.0)
         d = random.uniform(-2.0, 2.0)
+        if db is not None and db.should_skip("clifford", (a, b, c, d)):
+            print(f"Skipping a={round(a,3)}, b={round(b,3)}, c={round(c,3)}, d={round(d,3)}, close to a known failure")
+            continue
         print(f"Testing coefficients: a={round(a,3)}, b={round(b,3)}, c={round(c,3)}, d={round(d,3)}")
+        tried.append((a, b, c, d))
         
         # Initialize starting values
         x_val = [0.0]
@@ -30,6 +63,7 @@ def generate_fractal():
         # Counters for repetition detection
         repetition_count = 0
         is_valid_sequence = True
+        failure = "dull"
         
         # Open CSV file for this attempt
         with open(csv_filename, 'w', newline='') as csvfile:
@@ -48,6 +82,7 @@ def generate_fractal():
                 if np.isinf(x) or np.isnan(x) or np.isinf(y) or np.isnan(y):
                     print(f"Invalid values encountered at iteration {i}")
                     is_valid_sequence = False
+                    failure = "diverged"
                     break
                 
                 # Check for repetition (with tolerance for floating point comparison)
@@ -62,6 +97,7 @@ def generate_fractal():
                 if repetition_count > repetition_limit and i < n_points * rep_split:
                     print(f"Too many repetitions ({repetition_count}) found early at iteration {i}")
                     is_valid_sequence = False
+                    failure = "repetitive"
                     break
                 
                 # Add the new point
@@ -88,12 +124,22 @@ def generate_fractal():
                 print(f"Total repetitions: {repetition_count}")
                 print(f"Repetition rate: {final_repetition_rate:.2f}%")
                 print(f"Data saved to: {csv_filename}")
+                if db is not None:
+                    db.record("clifford", (a, b, c, d), "interesting", n_points=len(x_val),
+                              extent=max(max(x_val) - min(x_val), max(y_val) - min(y_val)))
                 coasterplot.coasterplot(csv_filename)
+                # The search is over, a later --resume should start a new one
+                if checkpoint and os.path.exists(checkpoint):
+                    os.remove(checkpoint)
+                save_sheet(sheet, tried)
                 return a, b, c, d, x_val, y_val
             
+            if db is not None:
+                db.record("clifford", (a, b, c, d), failure, n_points=len(x_val))
             print(f"Attempt {attempt + 1} failed - trying new coefficients...")
     
     print("Maximum attempts reached. Could not find suitable coefficients.")
+    save_sheet(sheet, tried)
     return None, None, None, None, None, None
 
 def plot_fractal(x_val, y_val, a, b, c, d):
@@ -125,12 +171,16 @@ def plot_fractal(x_val, y_val, a, b, c, d):
         print("Matplotlib not available for plotting")
 
 if __name__ == "__main__":
+    import sys
+    
     print("Starting fractal generation...")
-    a, b, x_points, y_points = generate_fractal()
+    a, b, c, d, x_points, y_points = generate_fractal("coaster_search.npz", resume="--resume" in sys.argv,
+                                                      db=ResultsDB(),
+                                                      sheet="clifford_contact_sheet.png" if "--sheet" in sys.argv else None)
     
     if a is not None:
         # Uncomment the next line if you want to plot the results
-        # plot_fractal(x_points, y_points, a, b)
+        # plot_fractal(x_points, y_points, a, b, c, d)
         print("\nFractal generation completed successfully!")
     else:
         print("\nFractal generation failed after all attempts.")
\ No newline at end of file
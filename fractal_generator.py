@@ -1,7 +1,7 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import csv
-from matplotlib.colors import LinearSegmentedColormap
+from decimate import density_sample
+from metrics import fractal_dimensions, write_metadata
 
 def clifford_attractor(a, b, c, d, x0=0, y0=0, n_points=10000000):
     """Generate Clifford attractor points"""
@@ -39,75 +39,86 @@ def svensson_attractor(a, b, c, d, x0=0, y0=0, n_points=10000000):
     
     return x, y
 
-def generate_fractal(attractor_type="clifford", params=None, style_name="default", n_points=10000000, skip_points=1000):
-    """Generate fractal attractor with various styles"""
-    
-    # Default parameters for different attractors
-    default_params = {
-        "clifford": [
-            (-1.4, 1.6, 1.0, 0.7),    # Purple spiral
-            (-2.0, -2.0, -1.2, 2.0),  # Complex pattern
-            (1.7, 1.7, 0.6, 1.2),     # Circular pattern
-            (-1.8, -2.0, -0.5, -0.9), # Dense spiral
-            (1.5, -1.8, 1.6, 0.9),    # Flowing pattern
-        ],
-        "dejong": [
-            (2.01, -2.53, 1.61, -0.33),  # Classic De Jong
-            (-2.7, -0.09, -0.86, -2.2),  # Butterfly-like
-            (1.641, 1.902, 0.316, 1.525), # Symmetric
-            (-2.24, 0.43, -0.65, -2.43),  # Complex web
-        ],
-        "svensson": [
-            (1.4, 1.56, 1.4, -6.56),     # Flowing curves
-            (-1.78, -1.93, -1.44, -2.33), # Dense pattern
-            (1.7, 1.8, 0.0, 1.0),        # Simple curves
-        ]
-    }
-    
-    styles = {
-        "purple_dream": {
-            "colors": ["#000033", "#4B0082", "#9370DB", "#DDA0DD"],
-            "alpha": 0.15,
-            "size": 0.1,
-            "background": "black"
-        },
-        "sunset": {
-            "colors": ["#8B0000", "#FF4500", "#FFD700", "#FFF8DC"],
-            "alpha": 0.12,
-            "size": 0.1,
-            "background": "black"
-        },
-        "ocean": {
-            "colors": ["#000080", "#0000FF", "#00BFFF", "#87CEEB"],
-            "alpha": 0.15,
-            "size": 0.1,
-            "background": "black"
-        },
-        "fire": {
-            "colors": ["#8B0000", "#DC143C", "#FF6347", "#FFD700"],
-            "alpha": 0.1,
-            "size": 0.1,
-            "background": "black"
-        },
-        "forest": {
-            "colors": ["#013220", "#228B22", "#32CD32", "#90EE90"],
-            "alpha": 0.12,
-            "size": 0.1,
-            "background": "black"
-        },
-        "monochrome": {
-            "colors": ["white"],
-            "alpha": 0.05,
-            "size": 0.1,
-            "background": "black"
-        },
-        "default": {
-            "colors": ["#FF4500", "#FFD700"],
-            "alpha": 0.1,
-            "size": 0.1,
-            "background": "black"
-        }
+# Default parameters for different attractors
+default_params = {
+    "clifford": [
+        (-1.4, 1.6, 1.0, 0.7),    # Purple spiral
+        (-2.0, -2.0, -1.2, 2.0),  # Complex pattern
+        (1.7, 1.7, 0.6, 1.2),     # Circular pattern
+        (-1.8, -2.0, -0.5, -0.9), # Dense spiral
+        (1.5, -1.8, 1.6, 0.9),    # Flowing pattern
+    ],
+    "dejong": [
+        (2.01, -2.53, 1.61, -0.33),  # Classic De Jong
+        (-2.7, -0.09, -0.86, -2.2),  # Butterfly-like
+        (1.641, 1.902, 0.316, 1.525), # Symmetric
+        (-2.24, 0.43, -0.65, -2.43),  # Complex web
+    ],
+    "svensson": [
+        (1.4, 1.56, 1.4, -6.56),     # Flowing curves
+        (-1.78, -1.93, -1.44, -2.33), # Dense pattern
+        (1.7, 1.8, 0.0, 1.0),        # Simple curves
+    ]
+}
+
+styles = {
+    "purple_dream": {
+        "colors": ["#000033", "#4B0082", "#9370DB", "#DDA0DD"],
+        "alpha": 0.15,
+        "size": 0.1,
+        "background": "black"
+    },
+    "sunset": {
+        "colors": ["#8B0000", "#FF4500", "#FFD700", "#FFF8DC"],
+        "alpha": 0.12,
+        "size": 0.1,
+        "background": "black"
+    },
+    "ocean": {
+        "colors": ["#000080", "#0000FF", "#00BFFF", "#87CEEB"],
+        "alpha": 0.15,
+        "size": 0.1,
+        "background": "black"
+    },
+    "fire": {
+        "colors": ["#8B0000", "#DC143C", "#FF6347", "#FFD700"],
+        "alpha": 0.1,
+        "size": 0.1,
+        "background": "black"
+    },
+    "forest": {
+        "colors": ["#013220", "#228B22", "#32CD32", "#90EE90"],
+        "alpha": 0.12,
+        "size": 0.1,
+        "background": "black"
+    },
+    "monochrome": {
+        "colors": ["white"],
+        "alpha": 0.05,
+        "size": 0.1,
+        "background": "black"
+    },
+    "default": {
+        "colors": ["#FF4500", "#FFD700"],
+        "alpha": 0.1,
+        "size": 0.1,
+        "background": "black"
     }
+}
+
+def generate_fractal(attractor_type="clifford", params=None, style_name="default", n_points=10000000, skip_points=None):
+    """Generate fractal attractor with various styles
+
+    style_name may also be a list of styles, the points are then generated
+    once and plotted in each of them.
+    skip_points=None drops the transient up to where the orbit has settled
+    onto the attractor, an integer drops exactly that many points.
+    """
+    # Imported here so the density renderers can share the tables above
+    # without pulling in matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LinearSegmentedColormap
+    from transient import transient_length
     
     # Use provided parameters or default ones
     if params is None:
@@ -116,7 +127,7 @@ def generate_fractal(attractor_type="clifford", params=None, style_name="default
     else:
         a, b, c, d = params
     
-    style = styles.get(style_name, styles["default"])
+    style_names = [style_name] if isinstance(style_name, str) else list(style_name)
     
     print(f"Generating {attractor_type} attractor with parameters: a={a}, b={b}, c={c}, d={d}")
     
@@ -132,47 +143,65 @@ def generate_fractal(attractor_type="clifford", params=None, style_name="default
         x, y = clifford_attractor(a, b, c, d, n_points=n_points)
     
     # Skip initial points to avoid transient behavior
+    if skip_points is None:
+        skip_points = transient_length(x, y)
+        print(f"Transient detected: skipping the first {skip_points} points")
     x = x[skip_points:]
     y = y[skip_points:]
     
-    # Create figure
-    fig, ax = plt.subplots(figsize=(12, 12))
-    fig.patch.set_facecolor(style["background"])
-    ax.set_facecolor(style["background"])
-    ax.set_aspect('equal')
-    ax.axis('off')
-    
-    # Create custom colormap if multiple colors
-    if len(style["colors"]) > 1:
-        cmap = LinearSegmentedColormap.from_list("custom", style["colors"])
-        colors = np.linspace(0, 1, len(x))
-        scatter = ax.scatter(x, y, s=style["size"], alpha=style["alpha"], 
-                           c=colors, cmap=cmap, rasterized=True)
-    else:
-        ax.scatter(x, y, s=style["size"], alpha=style["alpha"], 
-                  c=style["colors"][0], rasterized=True)
-    
-    # Remove margins
-    plt.subplots_adjust(left=0, bottom=0, right=1, top=1)
+    for style_name in style_names:
+        style = styles.get(style_name, styles["default"])
+        
+        # Create figure
+        fig, ax = plt.subplots(figsize=(12, 12))
+        fig.patch.set_facecolor(style["background"])
+        ax.set_facecolor(style["background"])
+        ax.set_aspect('equal')
+        ax.axis('off')
+        
+        # Create custom colormap if multiple colors
+        if len(style["colors"]) > 1:
+            cmap = LinearSegmentedColormap.from_list("custom", style["colors"])
+            colors = np.linspace(0, 1, len(x))
+            scatter = ax.scatter(x, y, s=style["size"], alpha=style["alpha"], 
+                               c=colors, cmap=cmap, rasterized=True)
+        else:
+            ax.scatter(x, y, s=style["size"], alpha=style["alpha"], 
+                      c=style["colors"][0], rasterized=True)
+        
+        # Remove margins
+        plt.subplots_adjust(left=0, bottom=0, right=1, top=1)
+        
+        filename_base = f"{attractor_type}_{style_name}_a{a}_b{b}_c{c}_d{d}"
+        plot_filename = f"{filename_base}.png"
+        plt.savefig(plot_filename, dpi=300, bbox_inches='tight', 
+                    facecolor=style["background"], edgecolor='none', pad_inches=0)
+        print(f"Plot saved as {plot_filename}")
+        if len(style_names) > 1:
+            # Each figure holds every point, do not keep them all open
+            plt.close(fig)
     
-    # Save files
-    filename_base = f"{attractor_type}_{style_name}_a{a}_b{b}_c{c}_d{d}"
-    plot_filename = f"{filename_base}.png"
+    # The data does not depend on the style, save it once under the first one
+    filename_base = f"{attractor_type}_{style_names[0]}_a{a}_b{b}_c{c}_d{d}"
     csv_filename = f"{filename_base}.csv"
     
-    plt.savefig(plot_filename, dpi=300, bbox_inches='tight', 
-                facecolor=style["background"], edgecolor='none', pad_inches=0)
-    print(f"Plot saved as {plot_filename}")
-    
     # Save to CSV
     with open(csv_filename, 'w', newline='') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['x', 'y'])
-        for i in range(0, len(x), 100):  # Save every 100th point to reduce file size
+        # Keep 1% of the points, picked so the saved subset has the same density as the full set
+        for i in density_sample(x, y, len(x) // 100):
             writer.writerow([round(float(x[i]), 6), round(float(y[i]), 6)])
     print(f"Data saved as {csv_filename}")
     
-    plt.show()
+    dims = fractal_dimensions(x, y)
+    write_metadata(f"{filename_base}.json", attractor_type=attractor_type, params=(a, b, c, d),
+                   style=style_names[0] if len(style_names) == 1 else style_names, n_points=len(x), skip_points=skip_points,
+                   box_dimension=dims["box_dimension"],
+                   correlation_dimension=dims["correlation_dimension"])
+    
+    if len(style_names) == 1:
+        plt.show()
     return x, y
 
 # Predefined beautiful parameter sets
@@ -197,8 +226,9 @@ if __name__ == "__main__":
     print("1. Generate beautiful preset fractals")
     print("2. Generate custom fractal")
     print("3. Generate all presets")
+    print("4. Render all presets as density images until converged")
     
-    choice = input("\nEnter choice (1, 2, or 3): ").strip()
+    choice = input("\nEnter choice (1, 2, 3 or 4): ").strip()
     
     if choice == "1":
         print("\nAvailable presets:")
@@ -256,6 +286,18 @@ if __name__ == "__main__":
                 generate_fractal(attractor_type, (a, b, c, d), style)
                 print("-" * 50)
     
+    elif choice == "4":
+        import density
+        
+        tolerance = float(input("Convergence tolerance (default 0.001): ") or "0.001")
+        max_points = int(input("Maximum number of points (default 50000000): ") or "50000000")
+        for attractor_type, param_list in beautiful_sets.items():
+            for params in param_list:
+                a, b, c, d, style = params
+                acc = density.render_density(attractor_type, (a, b, c, d), n_points=max_points, tolerance=tolerance)
+                density.save_density_image(acc, f"{attractor_type}_{style}_a{a}_b{b}_c{c}_d{d}_density.png", style)
+                print("-" * 50)
+    
     else:
         print("Invalid choice, generating default fractal")
         generate_fractal()
\ No newline at end of file
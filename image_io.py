@@ -0,0 +1,112 @@
+import os
+import struct
+import zlib
+import numpy as np
+
+# The color names used by the styles in this repo, anything else goes
+# through matplotlib when it is installed
+named_colors = {
+    "black": "#000000",
+    "white": "#FFFFFF",
+    "lightgray": "#D3D3D3",
+    "red": "#FF0000",
+    "orange": "#FFA500",
+    "yellow": "#FFFF00",
+    "purple": "#800080",
+    "brown": "#A52A2A",
+    "cyan": "#00FFFF",
+}
+
+# Anchor colors of the matplotlib colormaps the coaster.py styles refer to
+named_colormaps = {
+    "plasma": ["#0D0887", "#5302A3", "#8B0AA5", "#B83289", "#DB5C68", "#F48849", "#FEBC2A", "#F0F921"],
+    "viridis": ["#440154", "#46327E", "#365C8D", "#277F8E", "#1FA187", "#4AC16D", "#A0DA39", "#FDE725"],
+}
+
+def parse_color(color):
+    """RGB floats in [0, 1] for a hex string or a color name"""
+    color = named_colors.get(color, color)
+    if isinstance(color, str) and color.startswith("#") and len(color) == 7:
+        return tuple(int(color[i:i + 2], 16) / 255 for i in (1, 3, 5))
+    from matplotlib.colors import to_rgb
+    return to_rgb(color)
+
+def color_lut(colors, n=256):
+    """(n, 3) lookup table interpolating linearly through the colors"""
+    anchors = np.array([parse_color(c) for c in colors])
+    if len(anchors) == 1:
+        return np.repeat(anchors, n, axis=0)
+    positions = np.linspace(0, 1, len(anchors))
+    samples = np.linspace(0, 1, n)
+    return np.stack([np.interp(samples, positions, anchors[:, i]) for i in range(3)], axis=1)
+
+def style_lut(style, n=256, with_background=False):
+    """Lookup table for a style dict from fractal_generator.py or coaster.py
+
+    with_background prepends the style background, which is what a density
+    image needs so that empty pixels blend into the background.
+    """
+    if style.get("colors"):
+        colors = list(style["colors"])
+    elif style.get("colormap") not in (None, "none"):
+        colors = named_colormaps.get(style["colormap"])
+        if colors is None:
+            from matplotlib import colormaps
+            return colormaps[style["colormap"]](np.linspace(0, 1, n))[:, :3]
+    else:
+        colors = [style["color"]]
+    if with_background:
+        colors = [style["background"]] + colors
+    return color_lut(colors, n)
+
+def apply_lut(lut, values):
+    """Map values in [0, 1] through a lookup table"""
+    idx = np.clip(np.nan_to_num(values) * (len(lut) - 1), 0, len(lut) - 1).round().astype(np.intp)
+    return lut[idx]
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+def write_png(filename, image, bit_depth=8):
+    """Write a grayscale (h, w) or RGB (h, w, 3) float image in [0, 1] as PNG"""
+    image = np.clip(np.asarray(image, dtype=np.float64), 0, 1)
+    height, width = image.shape[:2]
+    color_type = 2 if image.ndim == 3 else 0
+    if bit_depth == 16:
+        pixels = (image * 65535).round().astype(">u2")
+    elif bit_depth == 8:
+        pixels = (image * 255).round().astype(np.uint8)
+    else:
+        raise ValueError("PNG bit depth must be 8 or 16")
+
+    # Filter type 0 (none) in front of every scanline
+    rows = pixels.reshape(height, -1).view(np.uint8).reshape(height, -1)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rows]).tobytes()
+
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", header))
+        f.write(_png_chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(_png_chunk(b"IEND", b""))
+
+def write_jpeg(filename, image, quality=95):
+    """Write a float image as JPEG, needs Pillow"""
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("Pillow is needed for JPEG output, use .png or .npy instead")
+    pixels = (np.clip(image, 0, 1) * 255).round().astype(np.uint8)
+    Image.fromarray(pixels).save(filename, quality=quality)
+
+def save_image(filename, image, bit_depth=8):
+    """Save a float image by extension: .png (8 or 16 bit), .jpg/.jpeg or .npy (raw floats)"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".png":
+        write_png(filename, image, bit_depth)
+    elif ext in (".jpg", ".jpeg"):
+        write_jpeg(filename, image)
+    elif ext == ".npy":
+        np.save(filename, np.asarray(image, dtype=np.float32))
+    else:
+        raise ValueError(f"Unsupported image format {ext!r}")
@@ -0,0 +1,171 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import density
+from image_io import apply_lut, color_lut, named_colormaps, write_png
+
+# Jacobians [[dx'/dx, dx'/dy], [dy'/dx, dy'/dy]] of the maps that have one
+# written out, the others fall back to finite differences
+def clifford_jacobian(x, y, params):
+    a, b, c, d = params[:4]
+    return -c * a * np.sin(a * x), a * np.cos(a * y), b * np.cos(b * x), -d * b * np.sin(b * y)
+
+def dejong_jacobian(x, y, params):
+    a, b, c, d = params[:4]
+    return b * np.sin(b * x), a * np.cos(a * y), c * np.cos(c * x), d * np.sin(d * y)
+
+def svensson_jacobian(x, y, params):
+    a, b, c, d = params[:4]
+    return d * a * np.cos(a * x), -b * np.cos(b * y), -c * a * np.sin(a * x), -b * np.sin(b * y)
+
+jacobians = {
+    "clifford": clifford_jacobian,
+    "dejong": dejong_jacobian,
+    "svensson": svensson_jacobian,
+}
+
+def lyapunov_tile(attractor_type, params, transient=200, n_iter=500, escape=1e6):
+    """Largest Lyapunov exponent and extent for arrays of parameters, one orbit per element
+
+    params is a tuple whose entries are scalars or equally shaped arrays, so
+    every element is a separate (a, b, ...) point iterated in lockstep. The
+    exponent is the mean log growth of a tangent vector renormalized every
+    step. Escaped orbits give NaN for both.
+    """
+    step = density.maps[attractor_type]
+    jacobian = jacobians.get(attractor_type)
+    shape = np.broadcast(*params).shape
+    params = tuple(np.broadcast_to(p, shape).ravel() for p in params)
+    n = params[0].size
+    # Slightly different starts so symmetric parameter sets do not sit on an
+    # unstable fixed point together
+    x = np.full(n, 0.1) + np.linspace(0, 1e-3, n)
+    y = np.full(n, 0.1)
+    vx, vy = np.ones(n), np.zeros(n)
+    log_growth = np.zeros(n)
+    low_x, high_x = np.full(n, np.inf), np.full(n, -np.inf)
+    low_y, high_y = np.full(n, np.inf), np.full(n, -np.inf)
+
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        for i in range(transient + n_iter):
+            if jacobian is not None:
+                j11, j12, j21, j22 = jacobian(x, y, params)
+                vx, vy = j11 * vx + j12 * vy, j21 * vx + j22 * vy
+                x, y = step(x, y, params)
+            else:
+                h = 1e-7
+                nx, ny = step(x, y, params)
+                hx, hy = step(x + h * vx, y + h * vy, params)
+                vx, vy = (hx - nx) / h, (hy - ny) / h
+                x, y = nx, ny
+            norm = np.hypot(vx, vy)
+            vx, vy = vx / norm, vy / norm
+            if i >= transient:
+                log_growth += np.log(norm)
+                low_x, high_x = np.minimum(low_x, x), np.maximum(high_x, x)
+                low_y, high_y = np.minimum(low_y, y), np.maximum(high_y, y)
+            escaped = ~(np.abs(x) < escape) | ~(np.abs(y) < escape)
+            x[escaped], y[escaped] = np.nan, np.nan
+
+    lyapunov = log_growth / n_iter
+    extent = np.maximum(high_x - low_x, high_y - low_y)
+    bad = ~np.isfinite(x) | ~np.isfinite(lyapunov)
+    lyapunov[bad], extent[bad] = np.nan, np.nan
+    return lyapunov.reshape(shape), extent.reshape(shape)
+
+def _tile_job(args):
+    return lyapunov_tile(*args)
+
+def lyapunov_atlas(attractor_type="clifford", base_params=None, axes=("a", "b"), ranges=((-3, 3), (-3, 3)),
+                   size=2048, transient=200, n_iter=500, tile_rows=32, workers=None):
+    """Sweep two coefficients over a size x size grid, the others fixed at base_params
+
+    axes names the coefficients (letters in order, a for params[0]) on the
+    horizontal and vertical axis. Rows run from the top of the image, that
+    is the top of the vertical range. Tiles of tile_rows rows are computed
+    in a process pool. Returns a dict with the lyapunov and extent arrays
+    and the parameter values along each axis.
+    """
+    if base_params is None:
+        base_params = density.map_params[attractor_type][0]
+    base_params = [float(p) for p in base_params]
+    i, j = ("abcdefghijkl".index(name) for name in axes)
+    col_values = np.linspace(*ranges[0], size)
+    row_values = np.linspace(*ranges[1], size)[::-1]
+
+    jobs = []
+    for start in range(0, size, tile_rows):
+        params = list(base_params)
+        params[i] = col_values[None, :]
+        params[j] = row_values[start:start + tile_rows, None]
+        jobs.append((attractor_type, tuple(params), transient, n_iter))
+
+    lyapunov = np.empty((size, size))
+    extent = np.empty((size, size))
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for k, (lyap, ext) in enumerate(pool.map(_tile_job, jobs)):
+            rows = slice(k * tile_rows, k * tile_rows + lyap.shape[0])
+            lyapunov[rows], extent[rows] = lyap, ext
+            print(f"Tile {k + 1}/{len(jobs)} done ({time.time() - start_time:.1f}s)")
+
+    return {"attractor_type": attractor_type, "axes": axes, "base_params": base_params,
+            "lyapunov": lyapunov, "extent": extent, "col_values": col_values, "row_values": row_values}
+
+def atlas_image(lyapunov):
+    """Chaotic points (exponent > 0) in plasma by exponent, regular ones in grays, escaped ones black"""
+    image = np.zeros(lyapunov.shape + (3,))
+    chaotic = lyapunov > 0
+    regular = lyapunov <= 0
+    if chaotic.any():
+        top = np.nanpercentile(lyapunov[chaotic], 99)
+        image[chaotic] = apply_lut(color_lut(named_colormaps["plasma"], 1024), lyapunov[chaotic] / top)
+    if regular.any():
+        # Exponents of exactly 0 (e.g. quasi-periodic orbits) would make this a division by zero
+        bottom = min(np.nanpercentile(lyapunov[regular], 1), -1e-12)
+        shade = 0.15 + 0.35 * (1 - np.clip(lyapunov[regular] / bottom, 0, 1))
+        image[regular] = shade[:, None]
+    return image
+
+def save_atlas(atlas, filename_base):
+    """Write the atlas as filename_base.png and all arrays as filename_base.npz"""
+    write_png(f"{filename_base}.png", atlas_image(atlas["lyapunov"]))
+    np.savez_compressed(f"{filename_base}.npz", lyapunov=atlas["lyapunov"], extent=atlas["extent"],
+                        col_values=atlas["col_values"], row_values=atlas["row_values"],
+                        base_params=np.array(atlas["base_params"]), axes=np.array(atlas["axes"]))
+    print(f"Atlas saved as {filename_base}.png and {filename_base}.npz")
+
+def pick_chaotic(atlas, n=10, min_extent=0.5, seed=0):
+    """Random parameter sets from the chaotic, bounded part of the atlas"""
+    good = np.argwhere((atlas["lyapunov"] > 0) & (atlas["extent"] > min_extent))
+    rng = np.random.default_rng(seed)
+    i, j = ("abcdefghijkl".index(name) for name in atlas["axes"])
+    picks = []
+    for row, col in good[rng.choice(len(good), min(n, len(good)), replace=False)]:
+        params = list(atlas["base_params"])
+        params[i], params[j] = float(atlas["col_values"][col]), float(atlas["row_values"][row])
+        picks.append((tuple(params), float(atlas["lyapunov"][row, col])))
+    return picks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Largest Lyapunov exponent over a 2D slice of parameter space")
+    parser.add_argument("attractor_type", nargs="?", default="clifford", choices=sorted(density.maps))
+    parser.add_argument("params", type=float, nargs="*", help="fixed values of all coefficients")
+    parser.add_argument("--axes", default="ab", help="the two coefficients to sweep, e.g. ab or cd")
+    parser.add_argument("--range", type=float, nargs=4, default=[-3, 3, -3, 3], metavar=("X0", "X1", "Y0", "Y1"))
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--transient", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    atlas = lyapunov_atlas(args.attractor_type, args.params or None, tuple(args.axes),
+                           (args.range[:2], args.range[2:]), args.size, args.transient,
+                           args.iterations, workers=args.workers)
+    save_atlas(atlas, args.output or f"{args.attractor_type}_{args.axes}_atlas")
+    for params, lyap in pick_chaotic(atlas, 5):
+        print(f"Chaotic: {tuple(round(p, 3) for p in params)}  exponent {lyap:.3f}")
@@ -0,0 +1,103 @@
+import json
+import numpy as np
+
+def _grid_cells(x, y, level, bounds):
+    """Hashed cell id of every point on a 2^level x 2^level grid"""
+    x_min, x_max, y_min, y_max = bounds
+    n = 1 << level
+    col = np.minimum(((x - x_min) / (x_max - x_min) * n).astype(np.int64), n - 1)
+    row = np.minimum(((y - y_min) / (y_max - y_min) * n).astype(np.int64), n - 1)
+    return row * n + col
+
+def _slope(levels, values):
+    """Least-squares slope of log2(values) against the grid level, NaN with fewer than 3 levels"""
+    if len(levels) < 3:
+        return float("nan")
+    return float(np.polyfit(levels, np.log2(values), 1)[0])
+
+def fractal_dimensions(x, y, min_level=3, max_level=None, max_points=4000000, seed=0):
+    """Box-counting (D0) and correlation (D2) dimension of a point set
+
+    Each scale hashes the points onto a grid and counts cells with np.unique,
+    so the cost is O(n log n) per scale instead of pairwise distances. D0 is
+    the slope of log(occupied cells) and D2 the slope of log(sum p_i^2)
+    against log(1/cell size). The finest level defaults to where there are
+    still about 10 points per occupied cell, so sparse sampling does not
+    flatten the curves.
+    """
+    x = np.asarray(x, dtype=np.float64).ravel()
+    y = np.asarray(y, dtype=np.float64).ravel()
+    ok = np.isfinite(x) & np.isfinite(y)
+    x, y = x[ok], y[ok]
+    if len(x) < 1000:
+        return {"box_dimension": float("nan"), "correlation_dimension": float("nan"), "n_points": len(x)}
+    if len(x) > max_points:
+        pick = np.random.default_rng(seed).choice(len(x), max_points, replace=False)
+        x, y = x[pick], y[pick]
+
+    # Square box so both axes are cut at the same scale
+    span = max(x.max() - x.min(), y.max() - y.min(), 1e-12) * (1 + 1e-9)
+    bounds = (x.min(), x.min() + span, y.min(), y.min() + span)
+    if max_level is None:
+        max_level = max(min_level + 2, int(np.log2(len(x) / 10) / 2) + 2)
+
+    levels, occupied, collision = [], [], []
+    for level in range(min_level, max_level + 1):
+        _, counts = np.unique(_grid_cells(x, y, level, bounds), return_counts=True)
+        p = counts / len(x)
+        levels.append(level)
+        occupied.append(len(counts))
+        collision.append(np.sum(p * p))
+        if len(counts) * 10 > len(x):
+            break
+
+    return {
+        "box_dimension": _slope(levels, occupied),
+        "correlation_dimension": -_slope(levels, collision),
+        "n_points": len(x),
+        "levels": levels,
+    }
+
+def dimensions_from_counts(counts, min_size=8):
+    """Same estimates from a density buffer, by pooling 2x2 blocks down to min_size
+
+    Useful for density renders that never keep the points. A buffer too
+    small to give 3 levels between its size and min_size has no slope to fit,
+    both estimates are NaN then.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    size = 1 << int(np.log2(min(counts.shape)))
+    counts = counts[:size, :size]
+    levels, occupied, collision = [], [], []
+    level = int(np.log2(size))
+    total = counts.sum()
+    if total == 0:
+        return {"box_dimension": float("nan"), "correlation_dimension": float("nan")}
+    while counts.shape[0] >= min_size:
+        p = counts / total
+        levels.append(level)
+        occupied.append(np.count_nonzero(counts))
+        collision.append(np.sum(p * p))
+        counts = counts.reshape(counts.shape[0] // 2, 2, counts.shape[1] // 2, 2).sum(axis=(1, 3))
+        level -= 1
+    return {
+        "box_dimension": _slope(levels, occupied),
+        "correlation_dimension": -_slope(levels, collision),
+    }
+
+def write_metadata(filename, **info):
+    """Write render metadata (parameters, metrics, ...) as a JSON sidecar file"""
+    def plain(value):
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, (tuple, np.ndarray)):
+            return [plain(v) for v in value]
+        if isinstance(value, list):
+            return [plain(v) for v in value]
+        if isinstance(value, dict):
+            return {k: plain(v) for k, v in value.items()}
+        return value
+
+    with open(filename, "w") as f:
+        json.dump(plain(info), f, indent=2)
+    print(f"Metadata saved as {filename}")
@@ -0,0 +1,127 @@
+import argparse
+import queue
+import threading
+import time
+
+import numpy as np
+
+import density
+
+_done = object()
+
+def run_pipeline(chunks, consumers, queue_size=4):
+    """Feed every chunk to all consumers, each consumer running in its own thread
+
+    chunks is an iterable (usually a generator doing the iteration) and
+    consumers maps a stage name to a function called with each chunk.
+    Bounded queues keep a fast producer from running away from slow
+    consumers, so memory stays at queue_size chunks per stage. Returns the
+    busy time of every stage, the wall time ends up close to the slowest.
+    """
+    queues = {name: queue.Queue(maxsize=queue_size) for name in consumers}
+    busy = {name: 0.0 for name in ["produce"] + list(consumers)}
+    errors = []
+
+    def work(name, consume, q):
+        try:
+            while True:
+                item = q.get()
+                if item is _done:
+                    return
+                start = time.perf_counter()
+                consume(item)
+                busy[name] += time.perf_counter() - start
+        except BaseException as e:
+            errors.append(e)
+            # Keep draining so the producer never blocks on this queue
+            while q.get() is not _done:
+                pass
+
+    threads = [threading.Thread(target=work, args=(name, consume, queues[name]), daemon=True)
+               for name, consume in consumers.items()]
+    for thread in threads:
+        thread.start()
+
+    try:
+        iterator = iter(chunks)
+        while not errors:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            busy["produce"] += time.perf_counter() - start
+            for q in queues.values():
+                q.put(chunk)
+    finally:
+        for q in queues.values():
+            q.put(_done)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return busy
+
+def ensemble_chunks(walkers, n_points, chunk_steps):
+    """Generator of (xs, ys) chunks from an Ensemble until n_points are produced"""
+    produced = 0
+    while produced < n_points:
+        steps = min(chunk_steps, -(-(n_points - produced) // len(walkers.x)))
+        xs, ys = walkers.advance(steps)
+        produced += xs.size
+        yield xs, ys
+
+def render_pipelined(attractor_type="clifford", params=None, size=1024, n_points=10000000,
+                     n_walkers=4096, chunk_points=500000, csv_filename=None, queue_size=4):
+    """Density render with iteration, accumulation and CSV export overlapped
+
+    The calling thread iterates the walkers while one thread bins the chunks
+    and another, if csv_filename is given, appends them to the CSV file.
+    """
+    if params is None:
+        params = density.map_params[attractor_type][0]
+    bounds = density.estimate_bounds(attractor_type, params)
+    acc = density.DensityAccumulator(size, size, bounds)
+    walkers = density.Ensemble(attractor_type, params, n_walkers=n_walkers)
+    walkers.skip(1000)
+
+    consumers = {"accumulate": lambda chunk: acc.add(*chunk)}
+    csvfile = None
+    if csv_filename:
+        csvfile = open(csv_filename, "w", newline="")
+        csvfile.write("x,y\n")
+
+        def export(chunk):
+            xs, ys = chunk
+            # Walker-major order so every walker's points stay consecutive
+            np.savetxt(csvfile, np.column_stack([xs.T.ravel(), ys.T.ravel()]), fmt="%.6f", delimiter=",")
+
+        consumers["export"] = export
+
+    print(f"Rendering {attractor_type} with parameters {params} through the pipeline...")
+    start = time.perf_counter()
+    try:
+        busy = run_pipeline(ensemble_chunks(walkers, n_points, max(1, chunk_points // n_walkers)),
+                            consumers, queue_size)
+    finally:
+        if csvfile:
+            csvfile.close()
+    wall = time.perf_counter() - start
+
+    print(f"Wall time {wall:.2f}s, stage busy times: " + ", ".join(f"{k} {v:.2f}s" for k, v in busy.items()))
+    print(f"Sequential would have taken about {sum(busy.values()):.2f}s")
+    return acc
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipelined render with overlapping compute and export")
+    parser.add_argument("attractor_type", choices=sorted(density.maps))
+    parser.add_argument("params", type=float, nargs="*")
+    parser.add_argument("--points", type=int, default=10000000)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--style", default="default")
+    parser.add_argument("--csv", default=None, help="also export every point to this CSV file")
+    args = parser.parse_args()
+
+    acc = render_pipelined(args.attractor_type, args.params or None, args.size, args.points, csv_filename=args.csv)
+    density.save_density_image(acc, f"{args.attractor_type}_{args.style}_pipelined.png", args.style)
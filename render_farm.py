@@ -0,0 +1,302 @@
+import argparse
+import collections
+import io
+import itertools
+import json
+import multiprocessing
+import socket
+import socketserver
+import struct
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+import density
+
+# Messages are a 4-byte length, a JSON header and header["payload"] bytes of
+# binary data (a compressed npz for density buffers), never pickles, so a
+# worker can not make the coordinator run code
+
+def send_message(sock, header, payload=b""):
+    data = json.dumps(dict(header, payload=len(payload))).encode()
+    sock.sendall(struct.pack("<I", len(data)) + data + payload)
+
+def _recv_exact(sock, n):
+    buffer = bytearray()
+    while len(buffer) < n:
+        part = sock.recv(n - len(buffer))
+        if not part:
+            raise ConnectionError("connection closed")
+        buffer += part
+    return bytes(buffer)
+
+def recv_message(sock):
+    """Returns (header, payload), raises ValueError for a malformed header"""
+    (length,) = struct.unpack("<I", _recv_exact(sock, 4))
+    header = json.loads(_recv_exact(sock, length))
+    if not isinstance(header, dict) or not isinstance(header.get("type"), str) \
+            or not isinstance(header.get("payload"), int) or header["payload"] < 0:
+        raise ValueError(f"malformed message header {header!r:.200}")
+    return header, _recv_exact(sock, header["payload"])
+
+def pack_counts(counts):
+    # float32 is exact for counts below 2^24, far above what one unit puts in a bin
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, counts=counts.astype(np.float32))
+    return buffer.getvalue()
+
+def unpack_counts(payload):
+    """Counts array of a result payload, raises ValueError if it is not a valid npz"""
+    try:
+        with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+            return data["counts"].astype(np.float64)
+    except (OSError, KeyError, EOFError, zipfile.BadZipFile) as e:
+        raise ValueError(f"unreadable result payload: {e}")
+
+def render_unit(unit, chunk_steps=250):
+    """Density buffer of one work unit, the walkers are seeded from the unit seed"""
+    walkers = density.Ensemble(unit["attractor_type"], unit["params"], n_walkers=unit["n_walkers"], seed=unit["seed"])
+    walkers.skip(unit["skip_points"])
+    acc = density.DensityAccumulator(unit["size"], unit["size"], unit["bounds"])
+    while acc.n_points < unit["n_points"]:
+        steps = min(chunk_steps, -(-(unit["n_points"] - acc.n_points) // unit["n_walkers"]))
+        xs, ys = walkers.advance(steps)
+        # The last step may overshoot, keep exactly the points asked for
+        remaining = unit["n_points"] - acc.n_points
+        acc.add(xs.ravel()[:remaining], ys.ravel()[:remaining])
+    return acc.counts, acc.n_points
+
+def run_worker(host, port, retry_for=10.0):
+    """Pull work units from a coordinator until it says it is done, returns the number rendered"""
+    deadline = time.time() + retry_for
+    while True:
+        try:
+            sock = socket.create_connection((host, port))
+            break
+        except ConnectionRefusedError:
+            # The coordinator may still be starting up
+            if time.time() > deadline:
+                raise
+            time.sleep(0.2)
+
+    rendered = 0
+    with sock:
+        send_message(sock, {"type": "ready"})
+        while True:
+            header, _ = recv_message(sock)
+            if header["type"] == "done":
+                return rendered
+            if header["type"] == "wait":
+                time.sleep(header["seconds"])
+                send_message(sock, {"type": "ready"})
+                continue
+            unit = header["unit"]
+            counts, n_points = render_unit(unit)
+            send_message(sock, {"type": "result", "unit_id": unit["unit_id"], "n_points": n_points},
+                         pack_counts(counts))
+            rendered += 1
+
+class Coordinator:
+    """Hands out work units to connected workers and merges their density buffers
+
+    Every job (one attractor render) is split into units of unit_points
+    points, each unit a different walker seed over the same bounds, so the
+    merged histogram is just the sum. A unit whose worker disconnects, sends
+    a result that does not fit the unit or is not back within unit_timeout
+    seconds goes back in the queue, a late duplicate result is ignored.
+    """
+
+    def __init__(self, jobs, unit_points=2000000, n_walkers=1024, skip_points=1000, host="127.0.0.1", port=0,
+                 unit_timeout=600.0):
+        self.jobs = []
+        self.pending = collections.deque()
+        for job_id, job in enumerate(jobs):
+            params = [float(p) for p in job.get("params") or density.map_params[job["attractor_type"]][0]]
+            bounds = density.estimate_bounds(job["attractor_type"], params)
+            size = job.get("size", 1024)
+            self.jobs.append(dict(job, params=params, bounds=bounds, size=size,
+                                  counts=np.zeros((size, size)), n_points=0))
+            for start in range(0, job["n_points"], unit_points):
+                self.pending.append({
+                    "unit_id": f"{job_id}:{start // unit_points}", "job_id": job_id,
+                    "attractor_type": job["attractor_type"], "params": params, "bounds": bounds,
+                    "size": size, "seed": start // unit_points, "n_walkers": n_walkers,
+                    "skip_points": skip_points, "n_points": min(unit_points, job["n_points"] - start),
+                })
+        self.n_units = len(self.pending)
+        self.completed = set()
+        # Units out with a worker: unit_id -> (lease number, deadline, unit)
+        self.unit_timeout = unit_timeout
+        self.leases = {}
+        self.lease_numbers = itertools.count()
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        if not self.pending:
+            self.finished.set()
+        self.server = socketserver.ThreadingTCPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+
+    def take(self):
+        """Next unit to hand out and its lease number, (None, None) if all are handed out"""
+        with self.lock:
+            while self.pending:
+                unit = self.pending.popleft()
+                # A unit requeued after its deadline may have come back late in the meantime
+                if unit["unit_id"] not in self.completed:
+                    lease = next(self.lease_numbers)
+                    self.leases[unit["unit_id"]] = (lease, time.time() + self.unit_timeout, unit)
+                    return unit, lease
+            return None, None
+
+    def give_back(self, unit, lease, reason="lost with its worker"):
+        """Queue a unit again, unless it is done or was already handed to another worker"""
+        with self.lock:
+            held = self.leases.get(unit["unit_id"])
+            if held is None or held[0] != lease:
+                return
+            del self.leases[unit["unit_id"]]
+            if unit["unit_id"] not in self.completed:
+                self.pending.appendleft(unit)
+                print(f"Unit {unit['unit_id']} {reason}, queued again")
+
+    def requeue_expired(self):
+        """Queue again the units whose worker has not answered within unit_timeout"""
+        now = time.time()
+        with self.lock:
+            expired = [(unit, lease) for lease, deadline, unit in self.leases.values() if deadline < now]
+        for unit, lease in expired:
+            self.give_back(unit, lease, f"not back after {self.unit_timeout:g}s")
+
+    def merge(self, unit, counts, n_points):
+        """Add a unit result to its job, raises ValueError if it does not fit the unit"""
+        job = self.jobs[unit["job_id"]]
+        if counts.shape != job["counts"].shape:
+            raise ValueError(f"result of shape {counts.shape} for a {job['counts'].shape} job")
+        if not np.isfinite(counts).all() or counts.min(initial=0) < 0:
+            raise ValueError("result with negative or non-finite counts")
+        if n_points != unit["n_points"] or counts.sum() > n_points:
+            raise ValueError(f"result of {n_points} points, {counts.sum():.0f} binned, for a unit of {unit['n_points']}")
+        with self.lock:
+            self.leases.pop(unit["unit_id"], None)
+            if unit["unit_id"] in self.completed:
+                return
+            job["counts"] += counts
+            job["n_points"] += n_points
+            self.completed.add(unit["unit_id"])
+            done = len(self.completed)
+        print(f"Merged unit {unit['unit_id']} ({done}/{self.n_units})")
+        if done == self.n_units:
+            self.finished.set()
+
+    def make_handler(self):
+        coordinator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                unit = lease = None
+                try:
+                    while True:
+                        header, payload = recv_message(self.request)
+                        if header["type"] == "result" and unit is not None:
+                            if not isinstance(header.get("n_points"), int):
+                                raise ValueError(f"result without a point count: {header!r:.200}")
+                            coordinator.merge(unit, unpack_counts(payload), header["n_points"])
+                            unit = None
+                        if coordinator.finished.is_set():
+                            return send_message(self.request, {"type": "done"})
+                        unit, lease = coordinator.take()
+                        if unit is None:
+                            # Others are still busy, one of their units may come back
+                            send_message(self.request, {"type": "wait", "seconds": 0.5})
+                        else:
+                            send_message(self.request, {"type": "work", "unit": unit})
+                except (ConnectionError, OSError, ValueError, KeyError, TypeError) as e:
+                    if unit is not None:
+                        print(f"Worker {self.client_address} failed: {e}")
+                        coordinator.give_back(unit, lease)
+
+        return Handler
+
+    def run(self):
+        """Serve until every unit is merged, returns one DensityAccumulator per job"""
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        print(f"Coordinator listening on {self.address[0]}:{self.address[1]}, {self.n_units} work units")
+        try:
+            while not self.finished.wait(timeout=1.0):
+                self.requeue_expired()
+            # Give connected workers a moment to hear that we are done
+            time.sleep(1.0)
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+
+        results = []
+        for job in self.jobs:
+            acc = density.DensityAccumulator(job["size"], job["size"], job["bounds"])
+            acc.counts = job["counts"]
+            acc.n_points = job["n_points"]
+            results.append(acc)
+        return results
+
+def start_local_workers(n, host, port):
+    """Worker processes on this machine, a stand-in for remote hosts"""
+    workers = [multiprocessing.Process(target=run_worker, args=(host, port), daemon=True) for _ in range(n)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+def sweep_jobs(n_points, size):
+    """One job per preset in fractal_generator.beautiful_sets"""
+    from fractal_generator import beautiful_sets
+
+    jobs = []
+    for attractor_type, param_list in beautiful_sets.items():
+        for i, (*params, style) in enumerate(param_list):
+            jobs.append({"attractor_type": attractor_type, "params": params, "style": style,
+                         "size": size, "n_points": n_points, "name": f"{attractor_type}_{style}_{i}_farm"})
+    return jobs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split density renders across worker machines over TCP")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    coord = sub.add_parser("coordinator", help="hand out work and merge the results")
+    coord.add_argument("attractor_type", nargs="?", default="clifford", choices=sorted(density.maps))
+    coord.add_argument("params", type=float, nargs="*")
+    coord.add_argument("--sweep", action="store_true", help="render every preset in beautiful_sets instead")
+    coord.add_argument("--host", default="0.0.0.0")
+    coord.add_argument("--port", type=int, default=9123)
+    coord.add_argument("--points", type=int, default=100000000)
+    coord.add_argument("--size", type=int, default=2048)
+    coord.add_argument("--style", default="default")
+    coord.add_argument("--unit-points", type=int, default=5000000)
+    coord.add_argument("--unit-timeout", type=float, default=600.0,
+                       help="seconds before a unit whose worker has not answered is handed out again")
+    coord.add_argument("--local-workers", type=int, default=0, help="also start this many workers on this machine")
+
+    work = sub.add_parser("worker", help="render work units for a coordinator")
+    work.add_argument("--host", default="127.0.0.1")
+    work.add_argument("--port", type=int, default=9123)
+
+    args = parser.parse_args()
+    if args.mode == "worker":
+        print(f"Rendered {run_worker(args.host, args.port)} work units")
+    else:
+        if args.sweep:
+            jobs = sweep_jobs(args.points, args.size)
+        else:
+            jobs = [{"attractor_type": args.attractor_type, "params": args.params or None, "style": args.style,
+                     "size": args.size, "n_points": args.points, "name": f"{args.attractor_type}_{args.style}_farm"}]
+        coordinator = Coordinator(jobs, args.unit_points, host=args.host, port=args.port,
+                                  unit_timeout=args.unit_timeout)
+        if args.local_workers:
+            start_local_workers(args.local_workers, "127.0.0.1", coordinator.address[1])
+        start = time.time()
+        results = coordinator.run()
+        print(f"All work merged in {time.time() - start:.1f}s")
+        for job, acc in zip(jobs, results):
+            density.save_density_image(acc, f"{job['name']}.png", job["style"])
@@ -0,0 +1,279 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import density
+from checkpoint import load_checkpoint, save_checkpoint
+
+# Defaults filled into every job so that equivalent requests hash the same
+job_defaults = {
+    "attractor_type": "clifford",
+    "params": None,
+    "style": "default",
+    "size": 512,
+    "n_points": 2000000,
+    "tolerance": None,
+    "channel": None,
+    "splat": "nearest",
+    "supersample": 1,
+}
+
+splat_modes = ("nearest", "bilinear", "gaussian")
+
+def normalize_job(request):
+    """Fill in defaults, cast and check every field, returns the canonical job dict
+
+    Values are cast to their canonical types so that e.g. "supersample": "2"
+    and "supersample": 2 hash the same, and bad values are rejected here as
+    a ValueError instead of failing later in a worker.
+    """
+    unknown = set(request) - set(job_defaults)
+    if unknown:
+        raise ValueError(f"Unknown job fields: {sorted(unknown)}")
+    job = dict(job_defaults, **request)
+    if job["attractor_type"] not in density.maps:
+        raise ValueError(f"Unknown attractor type {job['attractor_type']!r}")
+    if job["params"] is None:
+        job["params"] = list(density.map_params[job["attractor_type"]][0])
+    job["params"] = [float(p) for p in job["params"]]
+    if len(job["params"]) != len(density.map_params[job["attractor_type"]][0]):
+        raise ValueError(f"{job['attractor_type']} takes {len(density.map_params[job['attractor_type']][0])} parameters")
+    job["size"] = int(job["size"])
+    job["n_points"] = int(job["n_points"])
+    job["supersample"] = int(job["supersample"])
+    if job["size"] < 1 or job["n_points"] < 1 or job["supersample"] < 1:
+        raise ValueError("size, n_points and supersample must be positive")
+    if job["tolerance"] is not None:
+        job["tolerance"] = float(job["tolerance"])
+        if not job["tolerance"] > 0:
+            raise ValueError("tolerance must be positive")
+    if job["style"] not in density.styles:
+        raise ValueError(f"Unknown style {job['style']!r}")
+    if job["channel"] is not None and job["channel"] not in density.channel_names:
+        raise ValueError(f"Unknown channel {job['channel']!r}")
+    if job["splat"] not in splat_modes:
+        raise ValueError(f"Unknown splat mode {job['splat']!r}")
+    return job
+
+def job_key(job):
+    return hashlib.sha1(json.dumps(job, sort_keys=True).encode()).hexdigest()[:16]
+
+def simulation_key(job):
+    """Key of the accumulator behind a job, the style only affects the shading"""
+    return job_key({name: value for name, value in job.items() if name != "style"})
+
+def load_accumulator(path):
+    meta, arrays = load_checkpoint(path)
+    acc = density.DensityAccumulator(meta["width"], meta["height"], meta["bounds"], channels=meta["channels"])
+    acc.counts = arrays["counts"]
+    acc.sums = {name: arrays[f"sum_{name}"] for name in meta["channels"]}
+    acc.n_points = meta["n_points"]
+    return acc
+
+def save_accumulator(path, acc):
+    meta = {
+        "width": acc.width, "height": acc.height, "bounds": [float(v) for v in acc.bounds],
+        "channels": list(acc.sums), "n_points": acc.n_points,
+    }
+    save_checkpoint(path, meta, counts=acc.counts, **{f"sum_{name}": values for name, values in acc.sums.items()})
+
+def run_job(job, cache_dir):
+    """Render one job into the cache, runs in a worker process
+
+    The accumulator is cached under the simulation parameters alone, so a
+    job that only changes the style reuses it and just shades again.
+    """
+    key = job_key(job)
+    acc_path = os.path.join(cache_dir, f"{simulation_key(job)}.acc.npz")
+    if os.path.exists(acc_path):
+        acc = load_accumulator(acc_path)
+    else:
+        acc = density.render_density(
+            job["attractor_type"], job["params"], job["size"], job["size"],
+            n_points=job["n_points"], tolerance=job["tolerance"],
+            channels=[job["channel"]] if job["channel"] else (),
+            splat=job["splat"], supersample=job["supersample"], verbose=False,
+        )
+        save_accumulator(acc_path, acc)
+    # Write under a temporary name first so readers never see half a file
+    np.save(os.path.join(cache_dir, f"{key}.tmp.npy"), acc.counts.astype(np.float32))
+    os.replace(os.path.join(cache_dir, f"{key}.tmp.npy"), os.path.join(cache_dir, f"{key}.npy"))
+    density.save_density_image(acc, os.path.join(cache_dir, f"{key}.tmp.png"), job["style"], job["channel"], verbose=False)
+    os.replace(os.path.join(cache_dir, f"{key}.tmp.png"), os.path.join(cache_dir, f"{key}.png"))
+    return acc.n_points
+
+class RenderService:
+    """Job bookkeeping: deduplication of in-flight jobs, bounded pool and result cache"""
+
+    def __init__(self, cache_dir="render_cache", max_workers=2, max_pending=32):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.pool = ProcessPoolExecutor(max_workers=max_workers)
+        self.max_pending = max_pending
+        self.jobs = {}
+        # Future of the job currently simulating each accumulator, by simulation_key
+        self.simulations = {}
+        self.lock = threading.Lock()
+
+    def prune(self):
+        """Forget finished jobs, their results live in the cache, and keep only the latest failures"""
+        failed = [key for key, (future, _) in self.jobs.items() if future.done() and future.exception() is not None]
+        for key in [key for key, (future, _) in self.jobs.items() if future.done() and key not in failed]:
+            del self.jobs[key]
+        for key in failed[:-self.max_pending]:
+            del self.jobs[key]
+        for sim in [sim for sim, future in self.simulations.items() if future.done()]:
+            del self.simulations[sim]
+
+    def cached(self, key):
+        return os.path.exists(os.path.join(self.cache_dir, f"{key}.png"))
+
+    def submit(self, request):
+        """Queue a job unless it is cached or already running, returns its key"""
+        job = normalize_job(request)
+        key = job_key(job)
+        with self.lock:
+            self.prune()
+            entry = self.jobs.get(key)
+            failed = entry is not None and entry[0].done() and entry[0].exception() is not None
+            if self.cached(key) or (entry is not None and not failed):
+                return key
+            pending = sum(not future.done() for future, _ in self.jobs.values())
+            if pending >= self.max_pending:
+                raise RuntimeError("Render queue is full, try again later")
+            sim = simulation_key(job)
+            running = self.simulations.get(sim)
+            if running is not None and not running.done():
+                # A style variant of a running simulation only shades its accumulator once it is cached
+                future = Future()
+                running.add_done_callback(lambda done: self.after(done, future, job))
+            else:
+                future = self.pool.submit(run_job, job, self.cache_dir)
+                self.simulations[sim] = future
+            self.jobs[key] = (future, job)
+        print(f"Queued job {key}: {job}")
+        return key
+
+    def after(self, simulation, future, job):
+        """Run job once the simulation it shares has finished, reporting through future"""
+        if simulation.cancelled():
+            future.cancel()
+        if not future.set_running_or_notify_cancel():
+            return
+        if simulation.exception() is not None:
+            return future.set_exception(simulation.exception())
+        try:
+            shading = self.pool.submit(run_job, job, self.cache_dir)
+        except RuntimeError as e:
+            return future.set_exception(e)
+
+        def finish(done):
+            if done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+        shading.add_done_callback(finish)
+
+    def status(self, key):
+        if self.cached(key):
+            return {"job": key, "status": "done", "image": f"/images/{key}.png", "density": f"/density/{key}.npy"}
+        with self.lock:
+            entry = self.jobs.get(key)
+        if entry is None:
+            return None
+        future, job = entry
+        if future.done() and future.exception() is not None:
+            return {"job": key, "status": "failed", "error": str(future.exception())}
+        return {"job": key, "status": "running" if future.running() else "queued", "request": job}
+
+    def wait(self, key, timeout=None):
+        with self.lock:
+            entry = self.jobs.get(key)
+        if entry is not None:
+            try:
+                entry[0].result(timeout=timeout)
+            except Exception:
+                pass
+        return self.status(key)
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_file(self, path, content_type):
+            with open(path, "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path.split("?")[0] != "/render":
+                return self.send_json(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("The request body must be a JSON object")
+                wait = bool(request.pop("wait", False))
+                key = service.submit(request)
+            except (ValueError, TypeError) as e:
+                return self.send_json(400, {"error": str(e)})
+            except RuntimeError as e:
+                return self.send_json(503, {"error": str(e)})
+            status = service.wait(key) if wait else service.status(key)
+            self.send_json(200, status)
+
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if len(parts) != 2:
+                return self.send_json(404, {"error": "not found"})
+            kind, name = parts
+            if kind == "jobs":
+                status = service.status(name)
+                return self.send_json(200, status) if status else self.send_json(404, {"error": "unknown job"})
+            files = {"images": (".png", "image/png"), "density": (".npy", "application/octet-stream")}
+            if kind in files:
+                ext, content_type = files[kind]
+                key = name[:-len(ext)] if name.endswith(ext) else name
+                path = os.path.join(service.cache_dir, f"{key}{ext}")
+                if key.isalnum() and os.path.exists(path):
+                    return self.send_file(path, content_type)
+            self.send_json(404, {"error": "not found"})
+
+    return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local attractor render service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=32)
+    parser.add_argument("--cache-dir", default="render_cache")
+    args = parser.parse_args()
+
+    service = RenderService(args.cache_dir, args.workers, args.max_pending)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Render service listening on http://{args.host}:{args.port}")
+    print('POST /render {"attractor_type": "dejong", "style": "sunset", "size": 512, "wait": true}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down")
+    finally:
+        server.server_close()
+        service.pool.shutdown(cancel_futures=True)
@@ -0,0 +1,164 @@
+import argparse
+import itertools
+import json
+import math
+import sqlite3
+import time
+
+# Outcomes that make a region of parameter space not worth sampling again
+bad_statuses = ("diverged", "fixed_point", "repetitive", "dull")
+
+# Named parameters that get their own column for range queries
+param_columns = ("a", "b", "c", "d")
+
+schema = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    family TEXT NOT NULL,
+    params TEXT NOT NULL,
+    a REAL, b REAL, c REAL, d REAL,
+    cell TEXT NOT NULL,
+    status TEXT NOT NULL,
+    lyapunov REAL,
+    extent REAL,
+    dimension REAL,
+    n_points INTEGER,
+    thumbnail TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_cell ON results (family, cell);
+CREATE INDEX IF NOT EXISTS results_a ON results (family, a);
+CREATE INDEX IF NOT EXISTS results_dimension ON results (family, status, dimension);
+CREATE INDEX IF NOT EXISTS results_lyapunov ON results (family, status, lyapunov);
+"""
+
+class ResultsDB:
+    """SQLite store of every evaluated parameter set and what came out of it
+
+    Each row is also filed under a grid cell of side cell_size in parameter
+    space, the cell index turns "is there a known result within tolerance"
+    into a lookup of the 3^k neighbouring cells instead of a table scan.
+    Tolerances spanning many cells fall back to a box query on the a to d
+    columns.
+    """
+
+    def __init__(self, path="attractor_results.db", cell_size=0.01):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(schema)
+        # The grid only works if every writer of the file uses the same cell size
+        self.db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        row = self.db.execute("SELECT value FROM settings WHERE key = 'cell_size'").fetchone()
+        if row is None:
+            self.db.execute("INSERT INTO settings VALUES ('cell_size', ?)", (repr(cell_size),))
+            self.db.commit()
+            self.cell_size = cell_size
+        else:
+            self.cell_size = float(row["value"])
+
+    def cell_of(self, params):
+        return tuple(math.floor(p / self.cell_size) for p in params)
+
+    @staticmethod
+    def cell_key(cell):
+        return ",".join(str(i) for i in cell)
+
+    def record(self, family, params, status, lyapunov=None, extent=None, dimension=None,
+               n_points=None, thumbnail=None):
+        """Store one evaluated parameter set, returns its row id"""
+        params = [float(p) for p in params]
+        named = (params + [None] * len(param_columns))[:len(param_columns)]
+        cursor = self.db.execute(
+            "INSERT INTO results (family, params, a, b, c, d, cell, status, lyapunov, extent, dimension,"
+            " n_points, thumbnail, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (family, json.dumps(params), *named, self.cell_key(self.cell_of(params)), status,
+             _real(lyapunov), _real(extent), _real(dimension), n_points, thumbnail, time.time()))
+        self.db.commit()
+        return cursor.lastrowid
+
+    def update(self, row_id, **fields):
+        """Change stored fields of a row, e.g. the thumbnail once it is rendered"""
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self.db.execute(f"UPDATE results SET {columns} WHERE id = ?", (*fields.values(), row_id))
+        self.db.commit()
+
+    def nearby(self, family, params, tolerance=None, statuses=None):
+        """Stored results whose parameters are all within tolerance (default one cell size)"""
+        tolerance = self.cell_size if tolerance is None else tolerance
+        reach = max(1, math.ceil(tolerance / self.cell_size))
+        center = self.cell_of(params)
+        if (2 * reach + 1) ** len(center) <= 729:
+            keys = [self.cell_key(tuple(c + o for c, o in zip(center, offset)))
+                    for offset in itertools.product(range(-reach, reach + 1), repeat=len(center))]
+            query = f"SELECT * FROM results WHERE family = ? AND cell IN ({','.join('?' * len(keys))})"
+            args = [family, *keys]
+        else:
+            query = "SELECT * FROM results WHERE family = ?"
+            args = [family]
+            for name, p in zip(param_columns, params):
+                query += f" AND {name} BETWEEN ? AND ?"
+                args += [p - tolerance, p + tolerance]
+        if statuses:
+            query += f" AND status IN ({','.join('?' * len(statuses))})"
+            args += list(statuses)
+        rows = []
+        for row in self.db.execute(query, args):
+            stored = json.loads(row["params"])
+            if len(stored) == len(params) and max(abs(s - p) for s, p in zip(stored, params)) <= tolerance:
+                rows.append(row)
+        return rows
+
+    def should_skip(self, family, params, tolerance=None):
+        """True if a known-bad result lies within tolerance of params"""
+        return bool(self.nearby(family, [float(p) for p in params], tolerance, bad_statuses))
+
+    def top(self, family, by="dimension", n=50, status="interesting", ranges=None):
+        """Best n results by a metric, ranges maps a parameter name to a (low, high) interval"""
+        if by not in ("dimension", "lyapunov", "extent", "n_points"):
+            raise ValueError(f"Can not rank by {by!r}")
+        query = f"SELECT * FROM results WHERE family = ? AND status = ? AND {by} IS NOT NULL"
+        args = [family, status]
+        for name, (low, high) in (ranges or {}).items():
+            if name not in param_columns:
+                raise ValueError(f"Unknown parameter {name!r}, ranges work on {param_columns}")
+            query += f" AND {name} BETWEEN ? AND ?"
+            args += [low, high]
+        query += f" ORDER BY {by} DESC LIMIT ?"
+        return self.db.execute(query, args + [n]).fetchall()
+
+    def counts(self, family=None):
+        """Number of results per status"""
+        query = "SELECT status, COUNT(*) AS n FROM results"
+        args = []
+        if family:
+            query += " WHERE family = ?"
+            args.append(family)
+        return {row["status"]: row["n"] for row in self.db.execute(query + " GROUP BY status", args)}
+
+    def close(self):
+        self.db.close()
+
+def _real(value):
+    """None for missing or non-finite metrics, SQLite has no NaN"""
+    if value is None:
+        return None
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the database of explored attractor parameters")
+    parser.add_argument("family", nargs="?", default="coaster")
+    parser.add_argument("--db", default="attractor_results.db")
+    parser.add_argument("--by", default="dimension", choices=["dimension", "lyapunov", "extent", "n_points"])
+    parser.add_argument("-n", type=int, default=50)
+    parser.add_argument("--range", nargs=3, action="append", default=[], metavar=("NAME", "LOW", "HIGH"),
+                        help="restrict a parameter, e.g. --range a 3 4")
+    args = parser.parse_args()
+
+    db = ResultsDB(args.db)
+    print(f"{args.family}: " + ", ".join(f"{n} {status}" for status, n in db.counts(args.family).items()))
+    ranges = {name: (float(low), float(high)) for name, low, high in args.range}
+    for row in db.top(args.family, args.by, args.n, ranges=ranges):
+        params = ", ".join(f"{p:.3f}" for p in json.loads(row["params"]))
+        print(f"({params})  {args.by} {row[args.by]:.3f}" + (f"  {row['thumbnail']}" if row["thumbnail"] else ""))
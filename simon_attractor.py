@@ -1,5 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from decimate import density_sample
+from trajectory import Trajectory
+from transient import transient_length
 
 def simon_attractor(a=1.1, num_points=200000, dt=0.01):
     """
@@ -29,16 +32,25 @@ def simon_attractor(a=1.1, num_points=200000, dt=0.01):
     
     return x, y
 
+def simon_trajectory(a):
+    """Extendable Simon orbit from the same initial conditions as simon_attractor"""
+    if a not in trajectories:
+        trajectories[a] = Trajectory("simon", (a, 0.3), 0.1, 0.1)
+    return trajectories[a]
+
+# Orbits computed so far, asking for more points of one only iterates the new ones
+trajectories = {}
+
 # Generate the attractor with parameters that create beautiful patterns
 print("Generating Simon attractor...")
-x, y = simon_attractor(a=1.1, num_points=150000, dt=0.01)
+x, y = simon_trajectory(1.1).ensure(150000)
 
 # Create the main 2D plot
 plt.figure(figsize=(12, 10))
 plt.style.use('dark_background')
 
-# Skip transient behavior
-skip = 1000
+# Skip transient behavior, as long as this orbit actually needs
+skip = transient_length(x, y)
 x_plot = x[skip:]
 y_plot = y[skip:]
 
@@ -46,8 +58,9 @@ y_plot = y[skip:]
 n_points = len(x_plot)
 colors = np.linspace(0, 1, n_points)
 
-# Plot with varying colors to show the flow
-plt.scatter(x_plot[::20], y_plot[::20], c=colors[::20], 
+# Plot with varying colors to show the flow, on a 5% subset that keeps the density
+sample = density_sample(x_plot, y_plot, n_points // 20)
+plt.scatter(x_plot[sample], y_plot[sample], c=colors[sample], 
            cmap='plasma', s=0.1, alpha=0.8)
 
 plt.title('Simon Attractor - 2D Chaos Plot', fontsize=18, fontweight='bold', color='white')
@@ -68,11 +81,18 @@ titles = ['a = 1.1', 'a = 1.3', 'a = 1.4', 'a = 1.5']
 
 for i, (a_param, title) in enumerate(zip(parameters, titles)):
     row, col = i // 2, i % 2
-    x_param, y_param = simon_attractor(a=a_param, num_points=50000)
+    x_param, y_param = simon_trajectory(a_param).ensure(50000)
     
-    skip = 500
-    axes[row, col].scatter(x_param[skip::10], y_param[skip::10], 
-                          c=np.arange(len(x_param[skip::10])), 
+    try:
+        skip = transient_length(x_param, y_param)
+    except ValueError:
+        # This orbit escapes to infinity, leave the panel empty but say so
+        axes[row, col].set_title(f"{title} (diverges)", fontsize=14, color='white', fontweight='bold')
+        axes[row, col].set_facecolor('black')
+        continue
+    sample = density_sample(x_param[skip:], y_param[skip:], (len(x_param) - skip) // 10)
+    axes[row, col].scatter(x_param[skip:][sample], y_param[skip:][sample], 
+                          c=sample, 
                           cmap='plasma', s=0.2, alpha=0.8)
     axes[row, col].set_title(title, fontsize=14, color='white', fontweight='bold')
     axes[row, col].set_xlabel('X', color='white')
@@ -90,13 +110,14 @@ plt.figure(figsize=(14, 10))
 plt.style.use('dark_background')
 
 # Generate high-resolution data
-x_hires, y_hires = simon_attractor(a=1.1, num_points=300000)
-skip = 2000
+x_hires, y_hires = simon_trajectory(1.1).ensure(300000)
+skip = transient_length(x_hires, y_hires)
 
 # Create the beautiful flowing pattern
 plt.plot(x_hires[skip:], y_hires[skip:], color='cyan', alpha=0.6, linewidth=0.1)
-plt.scatter(x_hires[skip::100], y_hires[skip::100], 
-           c=np.arange(len(x_hires[skip::100])), 
+sample = density_sample(x_hires[skip:], y_hires[skip:], (len(x_hires) - skip) // 100)
+plt.scatter(x_hires[skip:][sample], y_hires[skip:][sample], 
+           c=sample, 
            cmap='plasma', s=0.5, alpha=0.8)
 
 plt.title('Simon Attractor - High Resolution Flow', fontsize=18, fontweight='bold', color='white')
@@ -0,0 +1,127 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+def simon_bifurcation(a_min=0.2, a_max=1.42, n_a=2000, height=1200, n_iter=2000,
+                      transient=1000, n_walkers=4, lyapunov=False, b=0.3):
+    """Bifurcation diagram of the Simon map for n_a values of a at once
+
+    Every column is one value of a iterated by n_walkers walkers side by side.
+    After the transient the x values are binned into a (height, n_a) density
+    image. With lyapunov=True the largest Lyapunov exponent of every column is
+    estimated from the tangent map along the way.
+    """
+    a = np.linspace(a_min, a_max, n_a)
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0.0, 0.2, (n_walkers, n_a))
+    y = rng.uniform(0.0, 0.2, (n_walkers, n_a))
+
+    def step(x, y):
+        x_new = a - x * x + b * y
+        # Escaped walkers are parked at NaN so they drop out of the histogram
+        x_new[np.abs(x_new) > 1e3] = np.nan
+        return x_new, x
+
+    print(f"Discarding {transient} transient iterations for {n_a} values of a...")
+    with np.errstate(invalid="ignore", over="ignore"):
+        for _ in range(transient):
+            x, y = step(x, y)
+
+    # Frame the x axis with the first post-transient iterations
+    probe_x, probe_y = x.copy(), y.copy()
+    seen = []
+    with np.errstate(invalid="ignore", over="ignore"):
+        for _ in range(min(100, n_iter)):
+            probe_x, probe_y = step(probe_x, probe_y)
+            seen.append(probe_x)
+    seen = np.array(seen)
+    if not np.isfinite(seen).any():
+        raise ValueError("Every walker escaped, try a smaller a range")
+    x_min, x_max = np.nanmin(seen), np.nanmax(seen)
+    pad = 0.02 * (x_max - x_min)
+    x_min, x_max = x_min - pad, x_max + pad
+
+    density = np.zeros((height, n_a))
+    columns = np.broadcast_to(np.arange(n_a), x.shape).ravel()
+
+    # Tangent vectors for the Lyapunov exponent
+    vx, vy = np.ones_like(x), np.zeros_like(x)
+    log_growth = np.zeros_like(x)
+
+    # Bin a block of iterations at a time, one bincount per block is much
+    # cheaper than one per iteration for large images
+    block = 100
+    pending = []
+
+    def flush():
+        if pending:
+            idx = np.concatenate(pending)
+            density.ravel()[:] += np.bincount(idx, minlength=height * n_a)
+            pending.clear()
+
+    print(f"Accumulating {n_iter} iterations...")
+    with np.errstate(invalid="ignore", over="ignore"):
+        for i in range(n_iter):
+            if lyapunov:
+                # Jacobian of (a - x^2 + b*y, x) is [[-2x, b], [1, 0]]
+                vx, vy = -2 * x * vx + b * vy, vx
+                norm = np.hypot(vx, vy)
+                log_growth += np.log(norm)
+                vx, vy = vx / norm, vy / norm
+            x, y = step(x, y)
+
+            row = np.floor((x_max - x) / (x_max - x_min) * height).ravel()
+            inside = (row >= 0) & (row < height)
+            pending.append(row[inside].astype(np.intp) * n_a + columns[inside])
+            if (i + 1) % block == 0:
+                flush()
+    flush()
+
+    lyap = None
+    if lyapunov:
+        lyap = np.nanmean(log_growth / n_iter, axis=0)
+    return density, a, (x_min, x_max), lyap
+
+def plot_bifurcation(density, a, x_bounds, lyap=None, filename="simon_bifurcation.png"):
+    """Save the bifurcation diagram, optionally with the Lyapunov exponents on top"""
+    image = np.log1p(density)
+    if image.max() > 0:
+        image /= image.max()
+
+    if lyap is None:
+        # No overlay, write the density at exactly one pixel per bin
+        plt.imsave(filename, image, cmap='plasma', vmin=0, vmax=1)
+        print(f"Bifurcation diagram saved as {filename}")
+        return
+
+    plt.style.use('dark_background')
+    fig, ax = plt.subplots(figsize=(16, 9))
+    ax.imshow(image, cmap='plasma', aspect='auto', interpolation='nearest',
+              extent=(a[0], a[-1], x_bounds[0], x_bounds[1]))
+    ax.set_xlabel('a', fontsize=14, color='white')
+    ax.set_ylabel('x', fontsize=14, color='white')
+    ax.set_title('Simon Map - Bifurcation Diagram', fontsize=18, fontweight='bold', color='white')
+
+    ax2 = ax.twinx()
+    ax2.plot(a, lyap, color='cyan', linewidth=0.6, alpha=0.8)
+    ax2.axhline(0, color='white', linewidth=0.5, alpha=0.5)
+    ax2.set_ylabel('Largest Lyapunov exponent', color='cyan')
+    ax2.tick_params(colors='cyan')
+
+    plt.tight_layout()
+    plt.savefig(filename, dpi=200, facecolor='black', edgecolor='none')
+    print(f"Bifurcation diagram saved as {filename}")
+    plt.show()
+
+if __name__ == "__main__":
+    import time
+
+    start = time.time()
+    density, a, x_bounds, lyap = simon_bifurcation(n_a=3000, height=1600, lyapunov=True)
+    print(f"Computed in {time.time() - start:.1f}s")
+
+    chaotic = a[lyap > 0]
+    if len(chaotic):
+        print(f"Chaotic (positive exponent) for {len(chaotic)} of {len(a)} values of a, first at a = {chaotic[0]:.4f}")
+
+    plot_bifurcation(density, a, x_bounds, filename="simon_bifurcation.png")
+    plot_bifurcation(density, a, x_bounds, lyap, filename="simon_bifurcation_lyapunov.png")
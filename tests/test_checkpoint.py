@@ -0,0 +1,24 @@
+import os
+
+import numpy as np
+
+from checkpoint import load_checkpoint, save_checkpoint
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "state.ckpt")
+    meta = {"steps": 12, "rng_state": {"state": 2**70}, "history": [[1, 0.5]]}
+    counts = np.arange(12, dtype=np.float64).reshape(3, 4)
+    save_checkpoint(path, meta, counts=counts, flags=np.array([True, False]))
+    loaded_meta, arrays = load_checkpoint(path)
+    assert loaded_meta == meta
+    assert np.array_equal(arrays["counts"], counts)
+    assert arrays["flags"].tolist() == [True, False]
+
+
+def test_overwriting_leaves_no_temporary_files(tmp_path):
+    path = str(tmp_path / "state.ckpt")
+    for step in range(3):
+        save_checkpoint(path, {"step": step}, x=np.full(4, step))
+    assert os.listdir(tmp_path) == ["state.ckpt"]
+    assert load_checkpoint(path)[0] == {"step": 2}
@@ -0,0 +1,47 @@
+import numpy as np
+
+from decimate import DensitySampler, density_sample
+
+
+def region_ordered(n=20000, seed=1):
+    """A skewed cloud sorted by x, so the dense cells only arrive at the end"""
+    rng = np.random.default_rng(seed)
+    x = np.concatenate([rng.random(n // 4), 0.8 + 0.2 * rng.random(3 * n // 4)])
+    y = rng.random(n)
+    order = np.argsort(x)
+    return x[order], y[order]
+
+
+def test_sampler_keeps_proportions_for_region_ordered_stream():
+    x, y = region_ordered()
+    sampler = DensitySampler(1000, (0.0, 1.0 + 1e-12, 0.0, 1.0 + 1e-12), grid=8, seed=0)
+    for start in range(0, len(x), 500):
+        sampler.add(x[start:start + 500], y[start:start + 500])
+    index, sx, sy = sampler.result()
+    assert len(index) == 1000
+    assert np.all(np.diff(index) > 0)
+    np.testing.assert_array_equal(np.bincount(sampler.cells(sx, sy), minlength=64), sampler.allocation())
+
+
+def test_chunking_does_not_change_the_sample():
+    x, y = region_ordered()
+    bounds = (0.0, 1.0 + 1e-12, 0.0, 1.0 + 1e-12)
+    whole = DensitySampler(1000, bounds, grid=8, seed=0)
+    whole.add(x, y)
+    chunked = DensitySampler(1000, bounds, grid=8, seed=0)
+    for start in range(0, len(x), 100):
+        chunked.add(x[start:start + 100], y[start:start + 100])
+    np.testing.assert_array_equal(chunked.result()[0], whole.result()[0])
+
+
+def test_density_sample_follows_density_of_region_ordered_stream():
+    x, y = region_ordered()
+    index = density_sample(x, y, 1000, grid=8, chunk_size=500)
+    assert len(index) == 1000
+    dense = np.mean(x[index] >= 0.8)
+    assert abs(dense - np.mean(x >= 0.8)) < 0.01
+
+
+def test_density_sample_returns_everything_when_short():
+    x = np.arange(10.0)
+    np.testing.assert_array_equal(density_sample(x, x, 100), np.arange(10))
@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+
+import density
+from checkpoint import load_checkpoint
+
+
+def test_without_tolerance_exactly_n_points_are_binned():
+    acc = density.render_density("dejong", width=32, height=32, n_points=100003, n_walkers=512,
+                                 skip_points=100, verbose=False)
+    assert acc.n_points == 100003
+    assert acc.counts.sum() == 100003
+    assert acc.change_history == []
+
+
+def test_tolerance_stops_once_the_image_settles():
+    options = dict(attractor_type="clifford", width=32, height=32, n_points=20000000,
+                   check_every=100000, n_walkers=1024, skip_points=100, verbose=False)
+    acc = density.render_density(tolerance=1e-2, **options)
+    assert acc.n_points < 20000000
+    assert acc.change_history[-1][1] < 1e-2
+    assert all(change >= 1e-2 for _, change in acc.change_history[:-1])
+    # The same run checked against a finer tolerance goes on for longer
+    assert density.render_density(tolerance=1e-3, **options).n_points > acc.n_points
+
+
+def test_density_change_is_total_variation():
+    a = np.array([[0.5, 0.5], [0.0, 0.0]])
+    b = np.array([[0.0, 0.5], [0.5, 0.0]])
+    assert density.density_change(a, a) == 0
+    assert density.density_change(a, b) == pytest.approx(0.5)
+
+
+@pytest.fixture
+def counts():
+    return np.random.default_rng(0).poisson(3.0, size=(60, 90)).astype(np.float64)
+
+
+@pytest.mark.parametrize("factor", [1, 2, 3, 5])
+def test_box_downsample_keeps_counts(counts, factor):
+    reduced = density.downsample(counts, factor)
+    assert reduced.shape == (60 // factor, 90 // factor)
+    assert reduced.sum() == pytest.approx(counts.sum(), rel=1e-12)
+
+
+@pytest.mark.parametrize("factor", [2, 3])
+def test_lanczos_downsample_keeps_counts(counts, factor):
+    # Only the clipped negative lobes can change the total
+    reduced = density.downsample(counts, factor, "lanczos")
+    assert reduced.shape == (60 // factor, 90 // factor)
+    assert reduced.min() >= 0
+    assert reduced.sum() == pytest.approx(counts.sum(), rel=1e-2)
+
+
+@pytest.mark.parametrize("splat", ["nearest", "bilinear", "gaussian"])
+def test_splats_deposit_one_count_per_point(splat):
+    rng = np.random.default_rng(1)
+    x, y = rng.uniform(0.1, 0.9, 5000), rng.uniform(0.1, 0.9, 5000)
+    acc = density.DensityAccumulator(40, 30, (0, 1, 0, 1), channels=("age",), splat=splat)
+    acc.add(x, y, age=np.full(5000, 2.0))
+    assert acc.counts.sum() == pytest.approx(5000)
+    assert np.allclose(acc.channel("age")[acc.counts > 0], 2.0)
+
+
+def test_supersampled_render_keeps_the_point_count():
+    acc = density.render_density("clifford", width=40, height=40, n_points=100000, skip_points=100,
+                                 splat="bilinear", supersample=3, verbose=False)
+    assert acc.counts.shape == (40, 40)
+    assert acc.counts.sum() == pytest.approx(100000, rel=1e-3)
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupted_render(monkeypatch, path, after, **options):
+    """Render with a checkpoint after every chunk and stop it after a few chunks"""
+    advance = density.Ensemble.advance
+    calls = []
+
+    def failing_advance(self, n_steps):
+        calls.append(n_steps)
+        if len(calls) > after:
+            raise Interrupted
+        return advance(self, n_steps)
+
+    monkeypatch.setattr(density.Ensemble, "advance", failing_advance)
+    with pytest.raises(Interrupted):
+        density.render_density(checkpoint=path, checkpoint_every=0, verbose=False, **options)
+    monkeypatch.setattr(density.Ensemble, "advance", advance)
+
+
+@pytest.mark.parametrize("options", [
+    dict(skip_points=100),
+    dict(skip_points=None, channels=("age", "heading")),
+    dict(skip_points=100, tolerance=1e-9, splat="bilinear", supersample=2),
+    dict(skip_points=100, auto_range=True),
+])
+def test_resume_matches_uninterrupted_render(tmp_path, monkeypatch, options):
+    options = dict(attractor_type="dejong", width=48, height=32, n_points=300000,
+                   check_every=20000, n_walkers=512, **options)
+    path = str(tmp_path / "render.ckpt")
+    interrupted_render(monkeypatch, path, after=6, **options)
+    meta, _ = load_checkpoint(path)
+    assert 0 < meta["n_points_done"] < options["n_points"]
+
+    resumed = density.render_density(checkpoint=path, resume=True, verbose=False, **options)
+    uninterrupted = density.render_density(verbose=False, **options)
+    assert resumed.n_points == uninterrupted.n_points
+    assert resumed.bounds == uninterrupted.bounds
+    assert np.array_equal(resumed.counts, uninterrupted.counts)
+    for name, sums in uninterrupted.sums.items():
+        assert np.array_equal(resumed.sums[name], sums)
+    assert resumed.change_history == uninterrupted.change_history
+
+
+def test_resume_rejects_a_different_render(tmp_path, monkeypatch):
+    path = str(tmp_path / "render.ckpt")
+    options = dict(width=32, height=32, check_every=10000, skip_points=100)
+    interrupted_render(monkeypatch, path, after=2, n_points=100000, **options)
+    with pytest.raises(ValueError):
+        density.render_density(n_points=200000, checkpoint=path, resume=True, verbose=False, **options)
+
+
+@pytest.mark.parametrize("height, width", [(60, 90), (17, 33), (1, 1), (128, 200), (45, 7)])
+def test_resample_keeps_counts(counts, height, width):
+    resized = density.resample(counts, height, width)
+    assert resized.shape == (height, width)
+    assert resized.min() >= 0
+    assert resized.sum() == pytest.approx(counts.sum(), rel=1e-9)
+
+
+def test_resample_integer_reduction_is_box_downsample(counts):
+    assert np.allclose(density.resample(counts, 20, 30), density.downsample(counts, 3))
+
+
+def test_resized_accumulator_keeps_counts():
+    acc = density.render_density("clifford", width=64, height=64, n_points=200000, skip_points=100, verbose=False)
+    resized = acc.resized(40, 25)
+    assert resized.counts.shape == (25, 40)
+    assert resized.counts.sum() == pytest.approx(acc.counts.sum(), rel=1e-9)
+
+
+def test_render_outputs_writes_every_style_and_size(tmp_path):
+    acc = density.render_density("clifford", width=64, height=32, n_points=50000, skip_points=100, verbose=False)
+    filenames = density.render_outputs(acc, ["default", "sunset"], [64, 20], str(tmp_path / "out"), ext="npy")
+    assert len(filenames) == 4
+    for filename in filenames:
+        size = int(filename.rsplit("_", 1)[1].split(".")[0])
+        assert np.load(filename).shape == (size // 2, size, 3)
@@ -0,0 +1,54 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from image_io import write_png
+
+
+def read_png(filename):
+    """Decode the unfiltered PNGs write_png produces, checking every chunk CRC"""
+    with open(filename, "rb") as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    chunks, pos = [], 8
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos:pos + 4])
+        kind, body = data[pos + 4:pos + 8], data[pos + 8:pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])
+        assert crc == zlib.crc32(kind + body) & 0xFFFFFFFF
+        chunks.append((kind, body))
+        pos += 12 + length
+    assert [kind for kind, _ in chunks] == [b"IHDR", b"IDAT", b"IEND"]
+
+    width, height, bit_depth, color_type, _, _, _ = struct.unpack(">IIBBBBB", chunks[0][1])
+    channels = 3 if color_type == 2 else 1
+    dtype = np.uint8 if bit_depth == 8 else np.dtype(">u2")
+    raw = np.frombuffer(zlib.decompress(chunks[1][1]), dtype=np.uint8).reshape(height, -1)
+    assert (raw[:, 0] == 0).all()
+    pixels = np.frombuffer(raw[:, 1:].tobytes(), dtype=dtype).reshape(height, width, channels)
+    return pixels if channels == 3 else pixels[..., 0], bit_depth
+
+
+@pytest.mark.parametrize("shape", [(5, 7), (5, 7, 3), (1, 1), (64, 3, 3)])
+@pytest.mark.parametrize("bit_depth", [8, 16])
+def test_png_round_trip(tmp_path, shape, bit_depth):
+    image = np.random.default_rng(0).random(shape)
+    filename = tmp_path / "image.png"
+    write_png(filename, image, bit_depth)
+    pixels, depth = read_png(filename)
+    assert depth == bit_depth
+    assert np.array_equal(pixels, np.round(image * (2**bit_depth - 1)))
+
+
+def test_png_clips_out_of_range_values(tmp_path):
+    filename = tmp_path / "image.png"
+    write_png(filename, np.array([[-0.5, 0.0, 1.0, 2.0]]))
+    pixels, _ = read_png(filename)
+    assert pixels.tolist() == [[0, 0, 255, 255]]
+
+
+def test_png_rejects_other_bit_depths(tmp_path):
+    with pytest.raises(ValueError):
+        write_png(tmp_path / "image.png", np.zeros((2, 2)), bit_depth=4)
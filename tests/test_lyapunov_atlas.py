@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+import density
+from lyapunov_atlas import atlas_image, jacobians
+
+
+@pytest.mark.parametrize("attractor_type", sorted(jacobians))
+def test_jacobian_matches_finite_differences(attractor_type):
+    rng = np.random.default_rng(0)
+    step = density.maps[attractor_type]
+    x, y = rng.uniform(-2, 2, 50), rng.uniform(-2, 2, 50)
+    h = 1e-6
+    for params in density.map_params[attractor_type]:
+        dxx, dxy, dyx, dyy = jacobians[attractor_type](x, y, params)
+        fx_x = (step(x + h, y, params)[0] - step(x - h, y, params)[0]) / (2 * h)
+        fx_y = (step(x, y + h, params)[0] - step(x, y - h, params)[0]) / (2 * h)
+        fy_x = (step(x + h, y, params)[1] - step(x - h, y, params)[1]) / (2 * h)
+        fy_y = (step(x, y + h, params)[1] - step(x, y - h, params)[1]) / (2 * h)
+        for analytic, numeric in [(dxx, fx_x), (dxy, fx_y), (dyx, fy_x), (dyy, fy_y)]:
+            assert np.allclose(analytic, numeric, rtol=1e-5, atol=1e-6)
+
+
+def test_atlas_image_handles_zero_exponents():
+    image = atlas_image(np.array([[0.0, 0.0], [0.2, np.nan]]))
+    assert np.isfinite(image).all()
+    assert (image[1, 1] == 0).all()
@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+import pytest
+
+from metrics import dimensions_from_counts, fractal_dimensions, write_metadata
+
+
+def henon(n_points, n_walkers=1000, skip=100, seed=0):
+    """Points of the Henon attractor (a=1.4, b=0.3) from an ensemble of walkers"""
+    rng = np.random.default_rng(seed)
+    x, y = rng.uniform(-0.1, 0.1, (2, n_walkers))
+    xs, ys = [], []
+    for step in range(skip + n_points // n_walkers):
+        x, y = 1 - 1.4 * x * x + y, 0.3 * x
+        if step >= skip:
+            xs.append(x)
+            ys.append(y)
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+def test_henon_dimensions():
+    x, y = henon(1000000)
+    dims = fractal_dimensions(x, y)
+    assert abs(dims["box_dimension"] - 1.26) < 0.08
+    assert abs(dims["correlation_dimension"] - 1.22) < 0.08
+
+
+def test_uniform_noise_is_two_dimensional():
+    rng = np.random.default_rng(0)
+    dims = fractal_dimensions(*rng.random((2, 1000000)))
+    assert abs(dims["box_dimension"] - 2) < 0.05
+    assert abs(dims["correlation_dimension"] - 2) < 0.05
+
+
+def test_dimensions_from_counts_match_the_points():
+    x, y = henon(1000000)
+    counts, _, _ = np.histogram2d(y, x, bins=256)
+    dims = dimensions_from_counts(counts)
+    assert abs(dims["box_dimension"] - 1.26) < 0.1
+    assert abs(dims["correlation_dimension"] - 1.22) < 0.1
+
+
+@pytest.mark.parametrize("size", [4, 8, 16])
+def test_too_few_levels_give_nan(size):
+    dims = dimensions_from_counts(np.ones((size, size)))
+    assert np.isnan(dims["box_dimension"]) and np.isnan(dims["correlation_dimension"])
+
+
+def test_too_few_points_give_nan():
+    dims = fractal_dimensions(np.zeros(10), np.zeros(10))
+    assert np.isnan(dims["box_dimension"]) and dims["n_points"] == 10
+
+
+def test_write_metadata_converts_numpy(tmp_path):
+    write_metadata(tmp_path / "meta.json", params=(np.float64(1.5), 2), counts=np.arange(3), n=np.int64(4))
+    assert json.loads((tmp_path / "meta.json").read_text()) == {"params": [1.5, 2], "counts": [0, 1, 2], "n": 4}
@@ -0,0 +1,116 @@
+import socket
+import struct
+import threading
+
+import numpy as np
+import pytest
+
+from render_farm import Coordinator, pack_counts, recv_message, render_unit, run_worker, send_message
+
+
+def make_coordinator(**options):
+    jobs = [{"attractor_type": "clifford", "size": 32, "n_points": 500000}]
+    return Coordinator(jobs, unit_points=100000, n_walkers=256, skip_points=100, **options)
+
+
+def run_with(coordinator, *clients, n_workers=2):
+    """Run the coordinator, let the given fake clients take their units first, then finish with real workers"""
+    host, port = coordinator.address
+    results = []
+    runner = threading.Thread(target=lambda: results.extend(coordinator.run()), daemon=True)
+    runner.start()
+    for client in clients:
+        client(host, port)
+    workers = [threading.Thread(target=run_worker, args=(host, port), daemon=True) for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    runner.join(timeout=60)
+    assert not runner.is_alive()
+    return results
+
+
+def expected_counts(coordinator):
+    """Sum of every unit rendered directly, which any farm run must reproduce exactly"""
+    units = list(coordinator.pending)
+    return sum(render_unit(unit)[0] for unit in units)
+
+
+def take_unit(host, port):
+    sock = socket.create_connection((host, port))
+    send_message(sock, {"type": "ready"})
+    header, _ = recv_message(sock)
+    assert header["type"] == "work"
+    return sock, header["unit"]
+
+
+def test_render_unit_is_exact_and_seeded():
+    coordinator = make_coordinator()
+    unit = coordinator.pending[0]
+    counts, n_points = render_unit(unit)
+    assert n_points == unit["n_points"] == 100000
+    assert counts.sum() <= n_points
+    assert np.array_equal(render_unit(unit)[0], counts)
+    assert not np.array_equal(render_unit(coordinator.pending[1])[0], counts)
+    coordinator.server.server_close()
+
+
+def test_merged_result_matches_the_units_regardless_of_workers():
+    coordinator = make_coordinator()
+    expected = expected_counts(coordinator)
+    acc, = run_with(coordinator, n_workers=3)
+    assert acc.n_points == 500000
+    assert np.array_equal(acc.counts, expected)
+
+
+@pytest.mark.parametrize("bad_result", [
+    lambda unit: ({"n_points": unit["n_points"]}, pack_counts(np.zeros((16, 16)))),
+    lambda unit: ({"n_points": unit["n_points"]}, pack_counts(np.full((32, 32), -1.0))),
+    lambda unit: ({"n_points": unit["n_points"]}, pack_counts(np.full((32, 32), np.nan))),
+    lambda unit: ({"n_points": unit["n_points"] // 2}, pack_counts(render_unit(unit)[0])),
+    lambda unit: ({"n_points": unit["n_points"]}, b"not an npz file"),
+])
+def test_bad_results_are_rejected_and_requeued(bad_result):
+    coordinator = make_coordinator()
+    expected = expected_counts(coordinator)
+
+    def bad_worker(host, port):
+        sock, unit = take_unit(host, port)
+        header, payload = bad_result(unit)
+        send_message(sock, dict(header, type="result", unit_id=unit["unit_id"]), payload)
+        # The coordinator drops the connection instead of handing out more work
+        with pytest.raises(ConnectionError):
+            recv_message(sock)
+        sock.close()
+
+    acc, = run_with(coordinator, bad_worker)
+    assert acc.n_points == 500000
+    assert np.array_equal(acc.counts, expected)
+
+
+def test_malformed_header_requeues_the_unit():
+    coordinator = make_coordinator()
+
+    def garbled_worker(host, port):
+        sock, _ = take_unit(host, port)
+        data = b'["result"]'
+        sock.sendall(struct.pack("<I", len(data)) + data)
+        sock.recv(1)
+        sock.close()
+
+    acc, = run_with(coordinator, garbled_worker)
+    assert acc.n_points == 500000
+
+
+def test_unit_of_a_hung_worker_is_handed_out_again():
+    coordinator = make_coordinator(unit_timeout=0.5)
+    expected = expected_counts(coordinator)
+    hung = []
+
+    def hung_worker(host, port):
+        # Takes a unit and never answers, the connection stays open
+        hung.append(take_unit(host, port)[0])
+
+    acc, = run_with(coordinator, hung_worker)
+    assert acc.n_points == 500000
+    assert np.array_equal(acc.counts, expected)
+    hung[0].close()
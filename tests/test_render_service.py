@@ -0,0 +1,76 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from render_service import RenderService, job_key, make_handler, normalize_job, simulation_key
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = RenderService(str(tmp_path / "cache"), max_workers=2, max_pending=8)
+    yield service
+    service.pool.shutdown(cancel_futures=True)
+
+
+small = {"size": 32, "n_points": 200000}
+
+
+def test_equivalent_requests_share_a_key():
+    assert job_key(normalize_job({"supersample": "2", "size": 64.0})) == job_key(normalize_job({"supersample": 2, "size": 64}))
+    assert job_key(normalize_job({})) == job_key(normalize_job({"attractor_type": "clifford", "style": "default"}))
+
+
+@pytest.mark.parametrize("request_", [
+    {"style": "no-such-style"}, {"splat": "cubic"}, {"channel": "color"}, {"supersample": 0},
+    {"tolerance": -1}, {"params": [1, 2]}, {"attractor_type": "lorenz"}, {"wait": True},
+])
+def test_bad_jobs_are_rejected_up_front(request_):
+    with pytest.raises(ValueError):
+        normalize_job(request_)
+
+
+def test_style_is_not_part_of_the_simulation_key():
+    plain, sunset = normalize_job(small), normalize_job(dict(small, style="sunset"))
+    assert job_key(plain) != job_key(sunset)
+    assert simulation_key(plain) == simulation_key(sunset)
+
+
+def test_duplicate_submissions_run_once(service):
+    key = service.submit(small)
+    assert service.submit(dict(small)) == key
+    assert len(service.jobs) == 1
+    assert service.wait(key, timeout=60)["status"] == "done"
+    # Cached now, a resubmission does not queue anything
+    assert service.submit(small) == key
+    assert key not in service.jobs
+
+
+def test_style_variants_share_one_simulation(service):
+    keys = [service.submit(dict(small, style=style)) for style in ("default", "sunset", "ocean")]
+    assert len(service.simulations) == 1
+    statuses = [service.wait(key, timeout=60) for key in keys]
+    assert [status["status"] for status in statuses] == ["done"] * 3
+    densities = [np.load(f"{service.cache_dir}/{key}.npy") for key in keys]
+    assert all(np.array_equal(densities[0], other) for other in densities[1:])
+
+
+def test_http_rejects_bad_bodies(service):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/render"
+    try:
+        for body in [b"[1, 2]", b'{"size": "big"}', b'{"style": "nope"}']:
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(urllib.request.Request(url, data=body))
+            assert error.value.code == 400
+            assert "error" in json.loads(error.value.read())
+        response = urllib.request.urlopen(urllib.request.Request(url, data=json.dumps(dict(small, wait=True)).encode()))
+        assert json.loads(response.read())["status"] == "done"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,65 @@
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from results_db import ResultsDB
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = ResultsDB(str(tmp_path / "results.db"), cell_size=0.01)
+    yield db
+    db.close()
+
+
+def brute_force(stored, params, tolerance):
+    return sorted(i for i, s in enumerate(stored) if max(abs(a - b) for a, b in zip(s, params)) <= tolerance)
+
+
+def test_record_and_nearby_match_a_brute_force_search(db):
+    rng = np.random.default_rng(0)
+    stored = [tuple(rng.uniform(-0.1, 0.1, 2)) for _ in range(400)]
+    ids = [db.record("coaster", params, "interesting") for params in stored]
+    for params, tolerance in itertools.product(rng.uniform(-0.1, 0.1, (20, 2)), [0.005, 0.01, 0.03, 0.2]):
+        found = sorted(ids.index(row["id"]) for row in db.nearby("coaster", list(params), tolerance))
+        assert found == brute_force(stored, params, tolerance)
+
+
+def test_nearby_falls_back_to_a_box_query_for_wide_tolerances(db):
+    stored = [(0.1, 0.2, 0.3, 0.4), (0.5, 0.2, 0.3, 0.4), (2.0, 2.0, 2.0, 2.0)]
+    for params in stored:
+        db.record("clifford", params, "interesting")
+    # 4 parameters with a reach of 10 cells would need 21^4 cell keys
+    rows = db.nearby("clifford", [0.3, 0.2, 0.3, 0.4], tolerance=0.1)
+    assert len(rows) == 0
+    rows = db.nearby("clifford", [0.3, 0.2, 0.3, 0.4], tolerance=0.2)
+    assert sorted(json.loads(row["params"])[0] for row in rows) == [0.1, 0.5]
+
+
+def test_should_skip_only_near_bad_results_of_the_same_family(db):
+    db.record("coaster", (3.0, 4.0), "diverged", n_points=12)
+    db.record("coaster", (1.0, 1.0), "interesting", n_points=500000)
+    db.record("coaster1", (2.0, 2.0), "repetitive")
+    assert db.should_skip("coaster", (3.004, 3.996))
+    assert not db.should_skip("coaster", (3.02, 4.0))
+    assert not db.should_skip("coaster", (1.0, 1.0))
+    assert not db.should_skip("coaster", (2.0, 2.0))
+    assert db.should_skip("coaster1", (2.0, 2.0))
+    assert db.counts("coaster") == {"diverged": 1, "interesting": 1}
+
+
+def test_top_ranks_and_filters(db):
+    for i, dimension in enumerate([1.2, float("nan"), 1.8, 1.5]):
+        db.record("dejong", (i, 0.0, 0.0, 0.0), "interesting", dimension=dimension)
+    assert [row["dimension"] for row in db.top("dejong")] == [1.8, 1.5, 1.2]
+    assert [row["a"] for row in db.top("dejong", ranges={"a": (0, 2)})] == [2.0, 0.0]
+    with pytest.raises(ValueError):
+        db.top("dejong", by="params")
+
+
+def test_cell_size_is_fixed_by_the_first_writer(tmp_path):
+    path = str(tmp_path / "results.db")
+    ResultsDB(path, cell_size=0.05).close()
+    assert ResultsDB(path, cell_size=0.01).cell_size == 0.05
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import density
+from trajectory import Trajectory
+from trajectory_codec import TrajectoryCodec, TrajectoryReader, TrajectoryWriter, load_trajectory, save_trajectory
+
+
+@pytest.fixture(scope="module")
+def orbit():
+    x, y = Trajectory("clifford", density.map_params["clifford"][0], 0.1, 0.1).ensure(20000)
+    return np.array(x[100:]), np.array(y[100:])
+
+
+def max_error(x, y, bits):
+    """Half a quantization step over the bounds save_trajectory picks"""
+    return 0.5 * max(np.ptp(x), np.ptp(y)) / ((1 << bits) - 1) * (1 + 1e-9)
+
+
+@pytest.mark.parametrize("bits", [16, 12, 4])
+@pytest.mark.parametrize("use_map", [False, True])
+def test_round_trip_within_quantization(tmp_path, orbit, bits, use_map):
+    x, y = orbit
+    filename = tmp_path / "orbit.atrj"
+    if use_map:
+        save_trajectory(filename, x, y, bits=bits, chunk_size=1000,
+                        attractor_type="clifford", params=density.map_params["clifford"][0])
+    else:
+        save_trajectory(filename, x, y, bits=bits, chunk_size=1000)
+    rx, ry = load_trajectory(filename)
+    assert len(rx) == len(x)
+    assert np.abs(rx - x).max() <= max_error(x, y, bits)
+    assert np.abs(ry - y).max() <= max_error(x, y, bits)
+
+
+def test_partial_reads_match_full_read(tmp_path, orbit):
+    x, y = orbit
+    filename = tmp_path / "orbit.atrj"
+    save_trajectory(filename, x, y, chunk_size=1000, attractor_type="clifford", params=density.map_params["clifford"][0])
+    with TrajectoryReader(filename) as reader:
+        full_x, full_y = reader.read()
+        for start, stop in [(0, 1), (999, 1001), (5000, 12345), (len(x) - 3, len(x) + 10)]:
+            part_x, part_y = reader.read(start, stop)
+            assert np.array_equal(part_x, full_x[start:stop])
+            assert np.array_equal(part_y, full_y[start:stop])
+        empty_x, empty_y = reader.read(10, 10)
+        assert len(empty_x) == len(empty_y) == 0
+        assert len(reader.read_chunks(10**6, 10**6 + 1)[0]) == 0
+        streamed = np.concatenate([cx for cx, _ in reader.iter_chunks(batch=3)])
+        assert np.array_equal(streamed, full_x)
+
+
+def test_streamed_writes_match_one_write(tmp_path, orbit):
+    x, y = orbit
+    bounds = (x.min(), x.max() + 1e-12, y.min(), y.max() + 1e-12)
+    with TrajectoryWriter(tmp_path / "whole.atrj", bounds, chunk_size=700) as writer:
+        writer.write(x, y)
+    with TrajectoryWriter(tmp_path / "pieces.atrj", bounds, chunk_size=700) as writer:
+        for start in range(0, len(x), 333):
+            writer.write(x[start:start + 333], y[start:start + 333])
+    assert (tmp_path / "whole.atrj").read_bytes() == (tmp_path / "pieces.atrj").read_bytes()
+
+
+def test_checksum_mismatch_raises(tmp_path, orbit):
+    x, y = orbit
+    filename = tmp_path / "orbit.atrj"
+    save_trajectory(filename, x, y, chunk_size=1000)
+    with TrajectoryReader(filename) as reader:
+        reader.chunks[3][3] ^= 1
+        reader.read(0, 3000)
+        with pytest.raises(ValueError, match="checksum"):
+            reader.read(3000, 4000)
+
+
+def test_rejects_other_files(tmp_path):
+    filename = tmp_path / "points.csv"
+    filename.write_text("x,y\n0,0\n")
+    with pytest.raises(ValueError):
+        TrajectoryReader(filename)
+
+
+@pytest.mark.parametrize("bits", [0, 17])
+def test_rejects_unsupported_bits(bits):
+    with pytest.raises(ValueError):
+        TrajectoryCodec((0, 1, 0, 1), bits)
+
+
+def test_map_prediction_defaults_to_the_known_parameters(tmp_path, orbit):
+    x, y = orbit
+    save_trajectory(tmp_path / "default.atrj", x, y, attractor_type="clifford")
+    save_trajectory(tmp_path / "explicit.atrj", x, y, attractor_type="clifford", params=density.map_params["clifford"][0])
+    assert (tmp_path / "default.atrj").read_bytes() == (tmp_path / "explicit.atrj").read_bytes()
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf, -np.inf])
+def test_non_finite_points_are_rejected(tmp_path, orbit, bad):
+    x, y = orbit[0].copy(), orbit[1]
+    x[500] = bad
+    with pytest.raises(ValueError, match="finite"):
+        save_trajectory(tmp_path / "orbit.atrj", x, y)
+    with pytest.raises(ValueError, match="finite"):
+        with TrajectoryWriter(tmp_path / "stream.atrj", (-3, 3, -3, 3)) as writer:
+            writer.write(x, y)
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+import transient
+
+
+def cloud_after(n_transient, n_points=50000, seed=0):
+    """A uniform cloud on the unit square, preceded by n_transient points far outside it"""
+    rng = np.random.default_rng(seed)
+    x, y = rng.random((2, n_points))
+    x[:n_transient] = 5 + rng.random(n_transient)
+    return x, y
+
+
+def transient_length_of(x, y, **kwargs):
+    return transient.transient_length(x, y, run=32, **kwargs)
+
+
+def test_transient_length_finds_the_start_of_the_cloud():
+    x, y = cloud_after(500)
+    assert transient_length_of(x, y) == 500
+
+
+def test_no_transient():
+    x, y = cloud_after(0)
+    assert transient_length_of(x, y) == 0
+
+
+def test_transient_length_is_capped():
+    x, y = cloud_after(3000)
+    assert transient_length_of(x, y, max_steps=1000) == 1000
+
+
+def test_diverging_trajectory_raises():
+    x, y = cloud_after(0)
+    x[-10:] = np.inf
+    with pytest.raises(ValueError):
+        transient.transient_length(x, y)
+
+
+def test_fixed_point_settles():
+    # Spirals into (0.5, 0.5), the tail is far narrower than a grid cell without the floor
+    n = np.arange(20000)
+    x = 0.5 + 0.97 ** n * np.cos(n)
+    y = 0.5 + 0.97 ** n * np.sin(n)
+    length = transient_length_of(x, y)
+    assert 0 < length < 1000
+
+
+def test_detector_is_independent_of_chunking():
+    reference = np.ones(16 * 16, dtype=bool)
+    bounds = (0.0, 1.0, 0.0, 1.0)
+    rng = np.random.default_rng(0)
+    xs, ys = rng.random((2, 400, 8))
+    # Walker w spends its first 20 * w steps outside the reference
+    for w in range(8):
+        xs[:20 * w, w] = 2.0
+    whole = transient.TransientDetector(reference, bounds, 8, run=10)
+    mask = whole.keep(xs, ys)
+    chunked = transient.TransientDetector(reference, bounds, 8, run=10)
+    masks = [chunked.keep(xs[s:s + 7], ys[s:s + 7]) for s in range(0, 400, 7)]
+    np.testing.assert_array_equal(np.concatenate(masks), mask)
+    np.testing.assert_array_equal(whole.settled_at, chunked.settled_at)
+    np.testing.assert_array_equal(whole.settled_at, 20 * np.arange(8) + 10)
+    np.testing.assert_array_equal(mask.sum(axis=0), 400 - whole.settled_at + 1)
+
+
+def test_detector_gives_up_after_max_steps():
+    reference = np.zeros(16 * 16, dtype=bool)
+    detector = transient.TransientDetector(reference, (0.0, 1.0, 0.0, 1.0), 2, run=10, max_steps=50)
+    mask = detector.keep(np.full((100, 2), 0.5), np.full((100, 2), 0.5))
+    assert detector.settled.all()
+    np.testing.assert_array_equal(mask.sum(axis=0), [50, 50])
+
+
+def test_settle_probe_covers_the_attractor():
+    bounds, reference = transient.settle_probe("clifford", (-1.4, 1.6, 1.0, 0.7))
+    x_min, x_max, y_min, y_max = bounds
+    assert -3 < x_min < x_max < 3 and -3 < y_min < y_max < 3
+    assert 0.05 < reference.mean() < 0.9
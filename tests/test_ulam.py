@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import density
+import ulam
+
+
+def quiet(*args):
+    pass
+
+
+def test_stationary_distribution_of_a_small_chain():
+    # 0 -> 1, 1 -> 0 or 2 evenly, 2 -> 0: stationary (0.4, 0.4, 0.2)
+    src = np.array([0, 1, 1, 2])
+    dst = np.array([1, 0, 2, 0])
+    weight = np.array([1.0, 0.5, 0.5, 1.0])
+    p = ulam.stationary_distribution(src, dst, weight, 3, tolerance=1e-12, log=quiet)
+    np.testing.assert_allclose(p, [0.4, 0.4, 0.2], atol=1e-9)
+
+
+def test_periodic_chain_converges():
+    p = ulam.stationary_distribution(np.array([0, 1]), np.array([1, 0]), np.ones(2), 2,
+                                     p0=np.array([1.0, 0.0]), tolerance=1e-12, log=quiet)
+    np.testing.assert_allclose(p, [0.5, 0.5], atol=1e-9)
+
+
+def test_mass_leaving_the_grid_raises():
+    with pytest.raises(ValueError):
+        ulam.stationary_distribution(np.array([0]), np.array([1]), np.zeros(1), 2, log=quiet)
+
+
+def test_transfer_operator_rows_are_substochastic():
+    params = density.map_params["clifford"][0]
+    bounds = density.estimate_bounds("clifford", params)
+    seed_cells = np.arange(0, 64 * 64, 97)
+    cells, src, dst, weight = ulam.transfer_operator("clifford", params, bounds, 64, 64, seed_cells, log=quiet)
+    assert len(np.unique(cells)) == len(cells)
+    assert np.all(np.bincount(src, weights=weight, minlength=len(cells)) <= 1 + 1e-12)
+    assert src.max() < len(cells) and dst.max() < len(cells)
+
+
+def test_matches_a_long_iterated_render():
+    acc = ulam.render_ulam("clifford", None, 128, 128, total_counts=1000000, verbose=False)
+    assert acc.counts.shape == (128, 128)
+    assert acc.counts.sum() == pytest.approx(1000000)
+    reference = density.render_density("clifford", None, 128, 128, n_points=5000000,
+                                       bounds=acc.bounds, verbose=False)
+    p = acc.counts / acc.counts.sum()
+    q = reference.counts / reference.counts.sum()
+    # About what a 3-5M point render manages, a 50k point one is near 0.14
+    assert 0.5 * np.abs(p - q).sum() < 0.09
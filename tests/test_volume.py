@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import volume
+from density import DensityAccumulator
+
+
+@pytest.fixture(scope="module")
+def voxels():
+    return volume.render_volume("lorenz", resolution=48, n_points=100000, n_walkers=256, skip_steps=200, verbose=False)
+
+
+def test_voxels_match_a_dense_histogram():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1.2, 1.2, (3, 20000))
+    voxels = volume.VoxelAccumulator(8, (-1, 1, -1, 1, -1, 1))
+    for chunk in np.array_split(points, 7, axis=1):
+        voxels.add(*chunk)
+    dense, _ = np.histogramdd(points.T, bins=8, range=[(-1, 1)] * 3)
+    assert voxels.n_points == 20000
+    assert np.array_equal(voxels.counts, dense.ravel()[voxels.ids])
+    assert voxels.counts.sum() == dense.sum()
+
+
+def test_save_and_load_round_trip(tmp_path, voxels):
+    voxels.save(tmp_path / "voxels.npz")
+    loaded = volume.VoxelAccumulator.load(tmp_path / "voxels.npz")
+    assert np.array_equal(loaded.ids, voxels.ids)
+    assert np.array_equal(loaded.counts, voxels.counts)
+    assert loaded.bounds == voxels.bounds and loaded.n_points == voxels.n_points
+
+
+@pytest.mark.parametrize("splat", ["nearest", "bilinear", "gaussian"])
+@pytest.mark.parametrize("distance", [None, 3.0])
+@pytest.mark.parametrize("angles", [(0, 0), (35, -70), (200, 10)])
+def test_projection_keeps_every_count_in_view(voxels, splat, distance, angles):
+    acc = volume.project(voxels, 96, 64, volume.rotation_matrix(*angles), distance, splat=splat)
+    assert acc.counts.shape == (64, 96)
+    assert acc.counts.sum() == pytest.approx(voxels.counts.sum(), rel=1e-9)
+    depth = acc.channel("depth")[acc.counts > 0]
+    assert depth.min() >= 0 and depth.max() <= 1
+
+
+def test_projection_is_the_weighted_splat_of_the_voxel_centres(voxels):
+    # Repeating every voxel centre count times must give the same image as weighting it
+    rotation = volume.rotation_matrix(35, -70)
+    acc = volume.project(voxels, 64, 64, rotation, depth=False, splat="bilinear")
+    lows, highs = np.array(voxels.bounds[::2]), np.array(voxels.bounds[1::2])
+    points = ((voxels.centres() - (lows + highs) / 2) / (highs - lows)) @ rotation.T
+    repeats = voxels.counts.astype(np.intp)
+    plain = DensityAccumulator(64, 64, acc.bounds, splat="bilinear")
+    plain.add(np.repeat(points[:, 0], repeats), np.repeat(points[:, 1], repeats))
+    assert np.allclose(acc.counts, plain.counts)
+
+
+def test_half_turn_about_the_vertical_mirrors_the_view(voxels):
+    front = volume.project(voxels, 64, 64, volume.rotation_matrix(0, -90), splat="bilinear", depth=False)
+    back = volume.project(voxels, 64, 64, volume.rotation_matrix(180, -90), splat="bilinear", depth=False)
+    assert np.allclose(back.counts, front.counts[:, ::-1])
@@ -0,0 +1,82 @@
+import numpy as np
+
+import density
+
+class Trajectory:
+    """A single orbit of one of the density.maps that can be extended in place
+
+    The points live in arrays that double in size when full, so asking for
+    more points of an orbit that is already computed only costs the new
+    iterations. x and y are views of the points computed so far.
+    """
+
+    def __init__(self, attractor_type, params, x0=0.0, y0=0.0, capacity=1024):
+        self.attractor_type = attractor_type
+        self.step_fn = density.maps[attractor_type]
+        self.params = tuple(params)
+        self._x = np.empty(capacity)
+        self._y = np.empty(capacity)
+        self._x[0], self._y[0] = x0, y0
+        self.n = 1
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def x(self):
+        return self._x[:self.n]
+
+    @property
+    def y(self):
+        return self._y[:self.n]
+
+    def _reserve(self, total):
+        capacity = len(self._x)
+        if total <= capacity:
+            return
+        while capacity < total:
+            capacity *= 2
+        for name in ("_x", "_y"):
+            grown = np.empty(capacity)
+            grown[:self.n] = getattr(self, name)[:self.n]
+            setattr(self, name, grown)
+
+    def extend(self, n_steps):
+        """Iterate n_steps more points from where the orbit left off"""
+        self._reserve(self.n + n_steps)
+        xs, ys, params, step = self._x, self._y, self.params, self.step_fn
+        x, y = xs[self.n - 1], ys[self.n - 1]
+        with np.errstate(over="ignore", invalid="ignore"):
+            for i in range(self.n, self.n + n_steps):
+                x, y = step(x, y, params)
+                xs[i] = x
+                ys[i] = y
+        self.n += n_steps
+        return self
+
+    def ensure(self, n_points):
+        """Make sure at least n_points are computed, returns (x, y) of the first n_points"""
+        if n_points > self.n:
+            self.extend(n_points - self.n)
+        return self._x[:n_points], self._y[:n_points]
+
+def sliding_range(values, window):
+    """max - min of every run of window consecutive values, element k covers values[k:k + window]
+
+    Uses the van Herk/Gil-Werman running maxima within blocks of window, so
+    the cost does not grow with the window length.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values) - window + 1
+    if n <= 0:
+        return np.zeros(0)
+    blocks = -(-len(values) // window)
+    ranges = []
+    for sign in (1, -1):
+        padded = np.full(blocks * window, -np.inf)
+        padded[:len(values)] = sign * values
+        padded = padded.reshape(blocks, window)
+        prefix = np.maximum.accumulate(padded, axis=1).ravel()
+        suffix = np.maximum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+        ranges.append(np.maximum(suffix[:n], prefix[window - 1:window - 1 + n]))
+    return ranges[0] + ranges[1]
@@ -0,0 +1,286 @@
+import json
+import struct
+import zlib
+
+import numpy as np
+
+import density
+
+MAGIC = b"ATRJ1\n"
+
+def zigzag(values, bits):
+    """Residuals modulo 2^bits, folded so small magnitudes give small codes"""
+    half = 1 << (bits - 1)
+    signed = (values + half) % (1 << bits) - half
+    return ((signed << 1) ^ (signed >> 63)).astype(np.uint16)
+
+def unzigzag(codes):
+    codes = codes.astype(np.int64)
+    return (codes >> 1) ^ -(codes & 1)
+
+class TrajectoryCodec:
+    """Quantization and prediction shared by the writer and the reader
+
+    Coordinates are quantized to bits-bit integers over bounds. Each point is
+    predicted from the previous one, either as the previous point itself
+    (plain delta coding, works for any stream) or, when the map is known, by
+    applying the map to it. Only the zigzag-coded residuals are stored, and
+    with a map predictor they are almost all 0 or +-1.
+    """
+
+    def __init__(self, bounds, bits=16, predictor=None):
+        # Codes and checksums are stored as 16-bit words
+        if not 1 <= bits <= 16:
+            raise ValueError(f"bits must be between 1 and 16, got {bits}")
+        self.bounds = tuple(float(v) for v in bounds)
+        self.bits = bits
+        self.levels = (1 << bits) - 1
+        self.predictor = predictor
+        if predictor is not None:
+            self.step_fn = density.maps[predictor["attractor_type"]]
+            self.params = tuple(predictor["params"])
+
+    def quantize(self, x, y):
+        x_min, x_max, y_min, y_max = self.bounds
+        qx = np.round((x - x_min) / (x_max - x_min) * self.levels)
+        qy = np.round((y - y_min) / (y_max - y_min) * self.levels)
+        return (np.clip(np.nan_to_num(qx), 0, self.levels).astype(np.int64),
+                np.clip(np.nan_to_num(qy), 0, self.levels).astype(np.int64))
+
+    def dequantize(self, qx, qy):
+        x_min, x_max, y_min, y_max = self.bounds
+        return (x_min + qx / self.levels * (x_max - x_min),
+                y_min + qy / self.levels * (y_max - y_min))
+
+    def predict(self, qx, qy):
+        """Quantized prediction of the next point from the current quantized one"""
+        if self.predictor is None:
+            return qx, qy
+        with np.errstate(over="ignore", invalid="ignore"):
+            return self.quantize(*self.step_fn(*self.dequantize(qx, qy), self.params))
+
+    def encode_chunk(self, x, y):
+        """Compressed block for one chunk, the first point is stored against a zero prediction"""
+        qx, qy = self.quantize(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        px, py = np.zeros_like(qx), np.zeros_like(qy)
+        px[1:], py[1:] = self.predict(qx[:-1], qy[:-1])
+        codes = np.concatenate([zigzag(qx - px, self.bits), zigzag(qy - py, self.bits)])
+        # Byte planes first: the high bytes are nearly all zero and compress away
+        shuffled = codes.astype("<u2").view(np.uint8).reshape(-1, 2).T.tobytes()
+        crc = zlib.crc32(qx.astype("<u2").tobytes() + qy.astype("<u2").tobytes())
+        return zlib.compress(shuffled, 6), crc
+
+    def decode_chunks(self, blocks, lengths):
+        """Decode several chunks at once, stepping through them in lockstep
+
+        Map prediction is sequential within a chunk, so the loop runs over the
+        points of a chunk and is vectorized across chunks.
+        """
+        longest = max(lengths)
+        rx = np.zeros((len(blocks), longest), dtype=np.int64)
+        ry = np.zeros((len(blocks), longest), dtype=np.int64)
+        for i, (block, n) in enumerate(zip(blocks, lengths)):
+            planes = np.frombuffer(zlib.decompress(block), dtype=np.uint8).reshape(2, -1)
+            codes = (planes[0].astype(np.uint16) | (planes[1].astype(np.uint16) << 8))
+            rx[i, :n] = unzigzag(codes[:n])
+            ry[i, :n] = unzigzag(codes[n:])
+
+        modulus = 1 << self.bits
+        if self.predictor is None:
+            # Delta coding is a running sum
+            return np.cumsum(rx, axis=1) % modulus, np.cumsum(ry, axis=1) % modulus
+
+        qx = np.empty_like(rx)
+        qy = np.empty_like(ry)
+        qx[:, 0], qy[:, 0] = rx[:, 0] % modulus, ry[:, 0] % modulus
+        for i in range(1, longest):
+            px, py = self.predict(qx[:, i - 1], qy[:, i - 1])
+            qx[:, i] = (px + rx[:, i]) % modulus
+            qy[:, i] = (py + ry[:, i]) % modulus
+        return qx, qy
+
+class TrajectoryWriter:
+    """Streaming writer of the compact trajectory format
+
+    Points are buffered into chunks of chunk_size, each compressed on its own
+    so the reader can jump to any chunk. The chunk index and header go in a
+    JSON footer at the end of the file.
+    """
+
+    def __init__(self, filename, bounds, bits=16, chunk_size=4096, predictor=None):
+        self.codec = TrajectoryCodec(bounds, bits, predictor)
+        self.chunk_size = chunk_size
+        self.file = open(filename, "wb")
+        self.file.write(MAGIC)
+        self.index = []
+        self.pending_x = []
+        self.pending_y = []
+        self.pending = 0
+        self.n_points = 0
+
+    def write(self, x, y):
+        x = np.ravel(x)
+        y = np.ravel(y)
+        if not (np.isfinite(x).all() and np.isfinite(y).all()):
+            raise ValueError("Trajectory points must be finite, cut a diverged orbit before writing it")
+        self.pending_x.append(x)
+        self.pending_y.append(y)
+        self.pending += len(x)
+        if self.pending >= self.chunk_size:
+            self._flush(final=False)
+
+    def _flush(self, final):
+        if not self.pending:
+            return
+        x = np.concatenate(self.pending_x)
+        y = np.concatenate(self.pending_y)
+        usable = len(x) if final else len(x) - len(x) % self.chunk_size
+        for start in range(0, usable, self.chunk_size):
+            stop = min(start + self.chunk_size, usable)
+            block, crc = self.codec.encode_chunk(x[start:stop], y[start:stop])
+            self.index.append([self.file.tell(), len(block), stop - start, crc])
+            self.file.write(block)
+            self.n_points += stop - start
+        self.pending_x, self.pending_y = [x[usable:]], [y[usable:]]
+        self.pending = len(x) - usable
+
+    def close(self):
+        self._flush(final=True)
+        footer = json.dumps({
+            "bounds": self.codec.bounds, "bits": self.codec.bits, "predictor": self.codec.predictor,
+            "chunk_size": self.chunk_size, "n_points": self.n_points, "chunks": self.index,
+        }).encode()
+        offset = self.file.tell()
+        self.file.write(footer)
+        self.file.write(struct.pack("<Q", offset))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TrajectoryReader:
+    """Random access to a trajectory file written by TrajectoryWriter"""
+
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not a trajectory file")
+        self.file.seek(-8, 2)
+        footer_end = self.file.tell()
+        (offset,) = struct.unpack("<Q", self.file.read(8))
+        self.file.seek(offset)
+        header = json.loads(self.file.read(footer_end - offset))
+        self.bounds = tuple(header["bounds"])
+        self.chunk_size = header["chunk_size"]
+        self.n_points = header["n_points"]
+        self.chunks = header["chunks"]
+        self.codec = TrajectoryCodec(self.bounds, header["bits"], header["predictor"])
+
+    def __len__(self):
+        return self.n_points
+
+    def read_chunks(self, first, last):
+        """Coordinates of chunks first..last-1, decoded together"""
+        entries = self.chunks[first:last]
+        if not entries:
+            return np.zeros(0), np.zeros(0)
+        blocks = []
+        for offset, length, _, _ in entries:
+            self.file.seek(offset)
+            blocks.append(self.file.read(length))
+        lengths = [n for _, _, n, _ in entries]
+        qx, qy = self.codec.decode_chunks(blocks, lengths)
+        xs, ys = [], []
+        for i, (_, _, n, crc) in enumerate(entries):
+            if zlib.crc32(qx[i, :n].astype("<u2").tobytes() + qy[i, :n].astype("<u2").tobytes()) != crc:
+                raise ValueError(f"Chunk {first + i} failed its checksum, the map predictor "
+                                 "may not reproduce on this platform")
+            x, y = self.codec.dequantize(qx[i, :n], qy[i, :n])
+            xs.append(x)
+            ys.append(y)
+        return np.concatenate(xs), np.concatenate(ys)
+
+    def iter_chunks(self, batch=256):
+        """Yield (x, y) arrays of up to batch chunks at a time, e.g. to feed a DensityAccumulator"""
+        for first in range(0, len(self.chunks), batch):
+            yield self.read_chunks(first, min(first + batch, len(self.chunks)))
+
+    def read(self, start=0, stop=None):
+        """Points start..stop-1, only the chunks covering them are decoded"""
+        stop = self.n_points if stop is None else min(stop, self.n_points)
+        if start >= stop:
+            return np.zeros(0), np.zeros(0)
+        first = start // self.chunk_size
+        last = -(-stop // self.chunk_size)
+        x, y = self.read_chunks(first, last)
+        offset = first * self.chunk_size
+        return x[start - offset:stop - offset], y[start - offset:stop - offset]
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def save_trajectory(filename, x, y, bits=16, chunk_size=4096, attractor_type=None, params=None):
+    """Write a whole trajectory, bounds taken from the data
+
+    Pass the attractor_type and params of the map that made it to use map
+    prediction, which makes the file several times smaller still. params
+    defaults to the first known parameter set of the map. Raises ValueError
+    for NaN or infinite points, they can not be quantized.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if not (np.isfinite(x).all() and np.isfinite(y).all()):
+        raise ValueError("Trajectory points must be finite, cut a diverged orbit before saving it")
+    bounds = (x.min(), x.max() + 1e-12, y.min(), y.max() + 1e-12)
+    predictor = None
+    if attractor_type is not None:
+        if params is None:
+            params = density.map_params[attractor_type][0]
+        predictor = {"attractor_type": attractor_type, "params": [float(p) for p in params]}
+    with TrajectoryWriter(filename, bounds, bits, chunk_size, predictor) as writer:
+        writer.write(x, y)
+
+def load_trajectory(filename):
+    with TrajectoryReader(filename) as reader:
+        return reader.read()
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import time
+
+    parser = argparse.ArgumentParser(description="Convert point CSVs to and from the compact trajectory format")
+    parser.add_argument("input", help="a .csv with x,y columns or a .atrj file")
+    parser.add_argument("output", nargs="?", default=None)
+    parser.add_argument("--map", default=None, choices=sorted(density.maps),
+                        help="map that produced the points, enables map prediction")
+    parser.add_argument("--params", type=float, nargs="*", default=None,
+                        help="parameters of the map, the first known set by default")
+    parser.add_argument("--bits", type=int, default=16, help="quantization bits per coordinate, 1 to 16")
+    args = parser.parse_args()
+    if not 1 <= args.bits <= 16:
+        parser.error("--bits must be between 1 and 16")
+    if args.params and not args.map:
+        parser.error("--params needs --map")
+
+    base, ext = os.path.splitext(args.input)
+    start = time.time()
+    if ext == ".atrj":
+        output = args.output or base + ".csv"
+        x, y = load_trajectory(args.input)
+        np.savetxt(output, np.column_stack([x, y]), fmt="%.6f", delimiter=",", header="x,y", comments="")
+    else:
+        output = args.output or base + ".atrj"
+        x, y = np.loadtxt(args.input, delimiter=",", skiprows=1, unpack=True)
+        save_trajectory(output, x, y, args.bits, attractor_type=args.map, params=args.params)
+    print(f"{len(x)} points, {os.path.getsize(args.input)} -> {os.path.getsize(output)} bytes "
+          f"in {time.time() - start:.2f}s, saved as {output}")
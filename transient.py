@@ -0,0 +1,146 @@
+import numpy as np
+
+import density
+
+def _cells(x, y, bounds, grid):
+    """Flat cell index on a grid x grid occupancy grid, -1 outside bounds or not finite"""
+    x_min, x_max, y_min, y_max = bounds
+    with np.errstate(invalid="ignore"):
+        col = np.floor((x - x_min) / (x_max - x_min) * grid)
+        row = np.floor((y - y_min) / (y_max - y_min) * grid)
+        inside = (col >= 0) & (col < grid) & (row >= 0) & (row < grid)
+    return np.where(inside, row * grid + col, -1).astype(np.intp)
+
+def occupancy(x, y, bounds, grid=128):
+    """Normalized histogram of the points on the occupancy grid, flattened"""
+    cells = _cells(np.ravel(x), np.ravel(y), bounds, grid)
+    counts = np.bincount(cells[cells >= 0], minlength=grid * grid).astype(np.float64)
+    total = counts.sum()
+    return counts / total if total > 0 else counts
+
+def support(x, y, bounds, grid=128, dilate=1):
+    """Cells the points visit, grown by dilate cells so sparse regions of a finite sample still count"""
+    occupied = (occupancy(x, y, bounds, grid) > 0).reshape(grid, grid)
+    grown = occupied.copy()
+    for dr in range(-dilate, dilate + 1):
+        for dc in range(-dilate, dilate + 1):
+            grown |= np.roll(np.roll(occupied, dr, axis=0), dc, axis=1)
+    return grown.ravel()
+
+def _frame(lo, hi, margin, min_extent):
+    """Bounds of a point range, widened to at least min_extent and padded by margin of the width"""
+    grow = max(min_extent - (hi - lo), 0) / 2
+    pad = max(hi - lo + 2 * grow, 1e-9) * margin
+    return lo - grow - pad, hi + grow + pad
+
+def settle_probe(attractor_type, params, n_walkers=256, window=50, tolerance=0.02,
+                 max_steps=20000, reference_steps=400, grid=128, margin=0.05, min_extent=1e-3, seed=1):
+    """Bounds and reference support of an attractor from a probe that stops once settled
+
+    The probe walkers are iterated in windows of window steps. The occupancy
+    of half of the walkers in the latest window is compared with the same
+    walkers one window earlier and with the other half now, on a coarse grid
+    spanning all three. Once the change over time is within tolerance of the
+    sampling noise between the halves, the ensemble has forgotten its start
+    and reference_steps more steps give the bounds and the reference support.
+    The bounds are at least min_extent wide, otherwise a fixed point gets
+    a support of 1e-10 wide cells that walkers only ever approach.
+    Raises ValueError if the probe diverges.
+    """
+    probe = density.Ensemble(attractor_type, params, n_walkers=n_walkers, seed=seed)
+    half = n_walkers // 2
+    previous = None
+    while probe.steps < max_steps:
+        xs, ys = probe.advance(window)
+        if not (np.isfinite(xs) & np.isfinite(ys)).any():
+            raise ValueError(f"{attractor_type} with params {params} diverged during the probe run")
+        samples = [(xs[:, :half], ys[:, :half]), (xs[:, half:], ys[:, half:])]
+        if previous is not None:
+            samples.append(previous)
+            both_x = np.concatenate([sx[np.isfinite(sx)] for sx, _ in samples])
+            both_y = np.concatenate([sy[np.isfinite(sy)] for _, sy in samples])
+            box = (both_x.min(), both_x.max() + 1e-12, both_y.min(), both_y.max() + 1e-12)
+            now, other, before = (occupancy(sx, sy, box, 32) for sx, sy in samples)
+            drift = 0.5 * np.abs(now - before).sum()
+            noise = 0.5 * np.abs(now - other).sum()
+            if drift < noise + tolerance:
+                break
+        previous = samples[0]
+
+    xs, ys = probe.advance(reference_steps)
+    ok = np.isfinite(xs) & np.isfinite(ys)
+    if not ok.any():
+        raise ValueError(f"{attractor_type} with params {params} diverged during the probe run")
+    bounds = _frame(xs[ok].min(), xs[ok].max(), margin, min_extent) + _frame(ys[ok].min(), ys[ok].max(), margin, min_extent)
+    return bounds, support(xs[ok], ys[ok], bounds, grid)
+
+class TransientDetector:
+    """Per-walker detection of when a walker has settled onto the attractor
+
+    A walker counts as settled once run consecutive points of it have landed
+    in the reference support. From then on all of its points are kept, before
+    that they are masked out. Walkers settle independently, so a slow one
+    does not hold back the rest and nobody pays a fixed skip. A walker that
+    has not settled after max_steps is kept from there on anyway.
+    """
+
+    def __init__(self, reference, bounds, n_walkers, run=32, max_steps=5000):
+        self.reference = reference
+        self.grid = int(round(np.sqrt(len(reference))))
+        self.bounds = bounds
+        self.run = run
+        self.max_steps = max_steps
+        self.streak = np.zeros(n_walkers, dtype=np.int64)
+        self.settled = np.zeros(n_walkers, dtype=bool)
+        self.settled_at = np.full(n_walkers, -1, dtype=np.int64)
+        self.steps = 0
+
+    def keep(self, xs, ys):
+        """Mask of the points to accumulate in an (n_steps, n_walkers) chunk, updates the walker state"""
+        n_steps = xs.shape[0]
+        if self.settled.all():
+            self.steps += n_steps
+            return np.ones(xs.shape, dtype=bool)
+        cells = _cells(xs, ys, self.bounds, self.grid)
+        hit = (cells >= 0) & self.reference[np.maximum(cells, 0)]
+        # Streak at every step: steps since the last miss, continuing the previous chunk
+        t = np.arange(1, n_steps + 1)[:, None]
+        last_miss = np.maximum.accumulate(np.where(hit, 0, t), axis=0)
+        streak = np.where(last_miss == 0, self.streak + t, t - last_miss)
+        reached = (streak >= self.run) | (self.steps + t > self.max_steps)
+        first = np.where(reached.any(axis=0), reached.argmax(axis=0), n_steps)
+
+        newly = ~self.settled & (first < n_steps)
+        self.settled_at[newly] = self.steps + first[newly] + 1
+        keep = self.settled | (np.arange(n_steps)[:, None] >= first)
+        self.settled |= newly
+        self.streak = streak[-1]
+        self.steps += n_steps
+        return keep
+
+def transient_length(x, y, run=32, grid=128, max_steps=20000, min_extent=1e-3):
+    """Number of leading points of one stored trajectory to drop
+
+    The reference is the occupancy of the second half of the trajectory
+    itself, so no probe is needed. At most max_steps points and never more
+    than the first half are dropped, the second half is the reference.
+    Raises ValueError if the trajectory diverges.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    tail = slice(len(x) // 2, None)
+    if not (np.isfinite(x[tail]).all() and np.isfinite(y[tail]).all()):
+        raise ValueError("The trajectory diverges, there is no attractor to settle onto")
+    tx, ty = x[tail], y[tail]
+    bounds = _frame(tx.min(), tx.max(), 0, min_extent) + _frame(ty.min(), ty.max(), 0, min_extent)
+    bounds = (bounds[0], bounds[1] + 1e-12, bounds[2], bounds[3] + 1e-12)
+    limit = min(max_steps, len(x) // 2)
+    detector = TransientDetector(support(tx, ty, bounds, grid), bounds, 1, run, max_steps=limit)
+    # Transients are short, look at growing prefixes instead of the whole run
+    start, size = 0, 4096
+    while start <= limit and not detector.settled[0]:
+        detector.keep(x[start:start + size, None], y[start:start + size, None])
+        start += size
+        size *= 2
+    settled_at = int(detector.settled_at[0])
+    return settled_at - run if settled_at <= limit else limit
@@ -0,0 +1,302 @@
+import argparse
+import os
+import time
+import numpy as np
+
+from density import DensityAccumulator, save_density_image
+
+
+# Vector fields of the 3D flows, each one evaluates a whole array of walkers
+def lorenz_flow(x, y, z, params):
+    sigma, rho, beta = params[:3]
+    return sigma * (y - x), x * (rho - z) - y, x * y - beta * z
+
+def rossler_flow(x, y, z, params):
+    a, b, c = params[:3]
+    return -y - z, x + a * y, b + z * (x - c)
+
+def aizawa_flow(x, y, z, params):
+    a, b, c, d, e, f = params[:6]
+    return ((z - b) * x - d * y, d * x + (z - b) * y,
+            c + a * z - z**3 / 3 - (x * x + y * y) * (1 + e * z) + f * z * x**3)
+
+def thomas_flow(x, y, z, params):
+    b = params[0]
+    return np.sin(y) - b * x, np.sin(z) - b * y, np.sin(x) - b * z
+
+def halvorsen_flow(x, y, z, params):
+    a = params[0]
+    return (-a * x - 4 * y - 4 * z - y * y, -a * y - 4 * z - 4 * x - z * z,
+            -a * z - 4 * x - 4 * y - x * x)
+
+flows = {
+    "lorenz": lorenz_flow,
+    "rossler": rossler_flow,
+    "aizawa": aizawa_flow,
+    "thomas": thomas_flow,
+    "halvorsen": halvorsen_flow,
+}
+
+# Known good parameters and a time step that RK4 integrates stably
+flow_params = {
+    "lorenz": [(10.0, 28.0, 8 / 3)],
+    "rossler": [(0.2, 0.2, 5.7)],
+    "aizawa": [(0.95, 0.7, 0.6, 3.5, 0.25, 0.1)],
+    "thomas": [(0.208186,)],
+    "halvorsen": [(1.4,)],
+}
+flow_dt = {"lorenz": 0.01, "rossler": 0.03, "aizawa": 0.01, "thomas": 0.05, "halvorsen": 0.005}
+
+
+def rk4_step(flow, x, y, z, params, dt):
+    """One classic Runge-Kutta step of the flow for arrays of walkers"""
+    k1 = flow(x, y, z, params)
+    k2 = flow(x + 0.5 * dt * k1[0], y + 0.5 * dt * k1[1], z + 0.5 * dt * k1[2], params)
+    k3 = flow(x + 0.5 * dt * k2[0], y + 0.5 * dt * k2[1], z + 0.5 * dt * k2[2], params)
+    k4 = flow(x + dt * k3[0], y + dt * k3[1], z + dt * k3[2], params)
+    return tuple(v + dt / 6 * (a + 2 * b + 2 * c + d) for v, a, b, c, d in zip((x, y, z), k1, k2, k3, k4))
+
+
+class Ensemble3D:
+    """A batch of walkers integrating the same flow in lockstep, see density.Ensemble"""
+
+    def __init__(self, attractor_type, params, n_walkers=4096, seed=0, spread=0.5, dt=None):
+        self.attractor_type = attractor_type
+        self.flow = flows[attractor_type]
+        self.params = tuple(params)
+        self.dt = flow_dt[attractor_type] if dt is None else dt
+        self.rng = np.random.default_rng(seed)
+        self.x, self.y, self.z = (self.rng.uniform(-spread, spread, n_walkers) + 0.1 for _ in range(3))
+        self.steps = 0
+
+    def skip(self, n_steps):
+        """Integrate without keeping the points (transient removal)"""
+        x, y, z = self.x, self.y, self.z
+        for _ in range(n_steps):
+            x, y, z = rk4_step(self.flow, x, y, z, self.params, self.dt)
+        self.x, self.y, self.z = x, y, z
+        self.steps += n_steps
+
+    def advance(self, n_steps):
+        """Integrate n_steps and return the visited points as (n_steps, n_walkers) arrays"""
+        xs, ys, zs = (np.empty((n_steps, len(self.x))) for _ in range(3))
+        x, y, z = self.x, self.y, self.z
+        for i in range(n_steps):
+            x, y, z = rk4_step(self.flow, x, y, z, self.params, self.dt)
+            xs[i], ys[i], zs[i] = x, y, z
+        self.x, self.y, self.z = x, y, z
+        self.steps += n_steps
+        return xs, ys, zs
+
+
+def estimate_bounds_3d(attractor_type, params, n_walkers=1024, skip_steps=2000, probe_steps=500, margin=0.05, seed=1, dt=None):
+    """Axis-aligned extent (x_min, x_max, y_min, y_max, z_min, z_max) from a short probe run"""
+    probe = Ensemble3D(attractor_type, params, n_walkers=n_walkers, seed=seed, dt=dt)
+    probe.skip(skip_steps)
+    points = probe.advance(probe_steps)
+    ok = np.logical_and.reduce([np.isfinite(v) for v in points])
+    if not ok.any():
+        raise ValueError(f"{attractor_type} with params {params} diverged during the probe run")
+    bounds = []
+    for v in points:
+        low, high = v[ok].min(), v[ok].max()
+        pad = max(high - low, 1e-9) * margin
+        bounds += [low - pad, high + pad]
+    return tuple(bounds)
+
+
+class VoxelAccumulator:
+    """Sparse 3D histogram of attractor hits on a resolution^3 grid
+
+    Only occupied voxels are stored, as sorted flat ids with their counts,
+    so a 1024^3 grid costs memory in proportion to the attractor surface
+    instead of a dense cube. Each chunk is reduced with np.unique when it is
+    added, the reduced chunks are merged into the sorted arrays once they
+    outgrow them (and before the voxels are read).
+    """
+
+    def __init__(self, resolution, bounds):
+        self.resolution = resolution
+        self.bounds = tuple(bounds)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._counts = np.zeros(0, dtype=np.float64)
+        self._pending = []
+        self._pending_size = 0
+        self.n_points = 0
+
+    def voxel_index(self, x, y, z):
+        """Flat voxel id of every point, plus the mask of points that landed inside"""
+        n = self.resolution
+        cells = []
+        for v, (low, high) in zip((x, y, z), zip(self.bounds[::2], self.bounds[1::2])):
+            with np.errstate(invalid="ignore"):
+                cells.append(np.floor((v - low) / (high - low) * n))
+        inside = np.logical_and.reduce([(c >= 0) & (c < n) for c in cells])
+        i, j, k = (c[inside].astype(np.int64) for c in cells)
+        return (i * n + j) * n + k, inside
+
+    def add(self, x, y, z):
+        ids, _ = self.voxel_index(np.ravel(x), np.ravel(y), np.ravel(z))
+        ids, counts = np.unique(ids, return_counts=True)
+        self._pending.append((ids, counts))
+        self._pending_size += len(ids)
+        self.n_points += np.size(x)
+        if self._pending_size > max(len(self._ids), 1 << 20):
+            self.compact()
+
+    def compact(self):
+        """Merge the pending chunks into the sorted voxel arrays"""
+        if not self._pending:
+            return
+        ids = np.concatenate([self._ids] + [i for i, _ in self._pending])
+        counts = np.concatenate([self._counts] + [c for _, c in self._pending])
+        self._ids, inverse = np.unique(ids, return_inverse=True)
+        self._counts = np.bincount(inverse, weights=counts, minlength=len(self._ids))
+        self._pending = []
+        self._pending_size = 0
+
+    @property
+    def ids(self):
+        self.compact()
+        return self._ids
+
+    @property
+    def counts(self):
+        self.compact()
+        return self._counts
+
+    def centres(self):
+        """World coordinates of the occupied voxel centres as an (n, 3) array"""
+        n = self.resolution
+        i, rest = np.divmod(self.ids, n * n)
+        j, k = np.divmod(rest, n)
+        lows = np.array(self.bounds[::2])
+        sizes = (np.array(self.bounds[1::2]) - lows) / n
+        return lows + (np.stack([i, j, k], axis=1) + 0.5) * sizes
+
+    def save(self, filename):
+        np.savez_compressed(filename, ids=self.ids, counts=self.counts, bounds=np.array(self.bounds),
+                            resolution=self.resolution, n_points=self.n_points)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            voxels = cls(int(data["resolution"]), tuple(data["bounds"]))
+            voxels._ids, voxels._counts = data["ids"], data["counts"]
+            voxels.n_points = int(data["n_points"])
+        return voxels
+
+
+def render_volume(attractor_type="lorenz", params=None, resolution=512, n_points=10000000,
+                  n_walkers=4096, skip_steps=2000, dt=None, seed=0, check_every=1000000, verbose=True):
+    """Integrate an ensemble once and accumulate every visited point into a VoxelAccumulator"""
+    log = print if verbose else (lambda *args: None)
+    if params is None:
+        params = flow_params[attractor_type][0]
+    bounds = estimate_bounds_3d(attractor_type, params, skip_steps=skip_steps, dt=dt)
+    voxels = VoxelAccumulator(resolution, bounds)
+    walkers = Ensemble3D(attractor_type, params, n_walkers=n_walkers, seed=seed, dt=dt)
+    walkers.skip(skip_steps)
+
+    chunk_steps = max(1, check_every // n_walkers)
+    log(f"Integrating {attractor_type} with parameters {params} into {resolution}^3 voxels")
+    start = time.time()
+    while voxels.n_points < n_points:
+        steps = min(chunk_steps, -(-(n_points - voxels.n_points) // n_walkers))
+        voxels.add(*walkers.advance(steps))
+        log(f"Progress: {min(voxels.n_points / n_points, 1) * 100:.1f}%")
+    log(f"{len(voxels.ids)} occupied voxels in {time.time() - start:.1f}s")
+    return voxels
+
+
+def rotation_matrix(yaw=0.0, pitch=0.0, roll=0.0):
+    """Rotation about z (yaw), then x (pitch), then the view axis (roll), angles in degrees"""
+    yaw, pitch, roll = np.radians([yaw, pitch, roll])
+    rz = np.array([[np.cos(yaw), -np.sin(yaw), 0], [np.sin(yaw), np.cos(yaw), 0], [0, 0, 1]])
+    rx = np.array([[1, 0, 0], [0, np.cos(pitch), -np.sin(pitch)], [0, np.sin(pitch), np.cos(pitch)]])
+    ry = np.array([[np.cos(roll), 0, np.sin(roll)], [0, 1, 0], [-np.sin(roll), 0, np.cos(roll)]])
+    return ry @ rx @ rz
+
+
+def project(voxels, width=1024, height=1024, rotation=None, distance=None, splat="bilinear", depth=True):
+    """Render the voxels seen through a rotation into a DensityAccumulator
+
+    The voxel centres are rotated about the centre of the grid and dropped
+    onto the view plane with their counts as weights, y of the view being
+    up and z pointing at the camera. distance=None is an orthographic view,
+    otherwise the camera sits that many bounding radii away. The framing is
+    the bounding sphere of the grid, so every rotation of a turntable uses
+    the same scale. depth=True also sums the view depth as a "depth"
+    channel, shade(acc, style, channel="depth") colors by it.
+    """
+    rotation = np.eye(3) if rotation is None else np.asarray(rotation)
+    lows, highs = np.array(voxels.bounds[::2]), np.array(voxels.bounds[1::2])
+    centre = (lows + highs) / 2
+    # Scale the axes to the unit cube so flat attractors still fill the view
+    radius = np.sqrt(3) / 2
+    points = ((voxels.centres() - centre) / (highs - lows)) @ rotation.T
+    x, y, z = points[:, 0], points[:, 1], points[:, 2]
+    if distance is not None:
+        scale = distance * radius / (distance * radius - z)
+        x, y = x * scale, y * scale
+
+    aspect = width / height
+    half_w, half_h = radius * max(aspect, 1), radius * max(1 / aspect, 1)
+    acc = DensityAccumulator(width, height, (-half_w, half_w, -half_h, half_h),
+                             ("depth",) if depth else (), splat)
+    # The depth channel is the view depth scaled to [0, 1], 1 nearest the camera
+    acc.add(x, y, weights=voxels.counts, **({"depth": (z + radius) / (2 * radius)} if depth else {}))
+    acc.n_points = voxels.n_points
+    return acc
+
+
+def turntable(voxels, filename_base, n_frames=36, size=1024, pitch=20.0, style_name="default",
+              channel=None, distance=None):
+    """Write n_frames views rotating once about the vertical axis, all projected from the same voxels"""
+    filenames = []
+    start = time.time()
+    for frame in range(n_frames):
+        rotation = rotation_matrix(360.0 * frame / n_frames, pitch - 90.0)
+        acc = project(voxels, size, size, rotation, distance, depth=channel == "depth")
+        filename = f"{filename_base}_{frame:03d}.png"
+        save_density_image(acc, filename, style_name, channel)
+        filenames.append(filename)
+    print(f"{n_frames} frames in {time.time() - start:.1f}s")
+    return filenames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a 3D flow attractor from a sparse voxel density")
+    parser.add_argument("attractor_type", choices=sorted(flows))
+    parser.add_argument("params", type=float, nargs="*")
+    parser.add_argument("--style", default="default")
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--resolution", type=int, default=512, help="voxels along each axis")
+    parser.add_argument("--points", type=int, default=10000000)
+    parser.add_argument("--dt", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--yaw", type=float, default=30.0)
+    parser.add_argument("--pitch", type=float, default=20.0, help="elevation of the camera above the xy plane")
+    parser.add_argument("--distance", type=float, default=None, help="perspective camera distance in bounding radii")
+    parser.add_argument("--color-by-depth", action="store_true")
+    parser.add_argument("--frames", type=int, default=0, help="write a turntable of this many frames")
+    parser.add_argument("--voxels", default=None, help="voxel file to load if it exists, saved there otherwise")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.voxels and os.path.exists(args.voxels):
+        voxels = VoxelAccumulator.load(args.voxels)
+    else:
+        voxels = render_volume(args.attractor_type, args.params or None, args.resolution, args.points,
+                               dt=args.dt, seed=args.seed)
+        if args.voxels:
+            voxels.save(args.voxels)
+
+    channel = "depth" if args.color_by_depth else None
+    output = args.output or f"{args.attractor_type}_{args.style}_3d"
+    if args.frames:
+        turntable(voxels, output, args.frames, args.size, args.pitch, args.style, channel, args.distance)
+    else:
+        acc = project(voxels, args.size, args.size, rotation_matrix(args.yaw, args.pitch - 90.0), args.distance,
+                      depth=args.color_by_depth)
+        save_density_image(acc, f"{output}.png", args.style, channel)